@@ -1,10 +1,206 @@
 # RPG.py - Боевая система
 
+import json
+import os
 import random
-import time  # Для задержек в анимациях
+
+from combat_log import CombatEvent, ConsoleSink
+from effects import BURN, Effects, EffectScheduler
+from loot import LOOT_TABLES, WEAPON_EFFECTS
+
+# Генератор случайных чисел боевой системы.
+# Симуляции подменяют его своим (засеянным) экземпляром random.Random для воспроизводимости.
+rng = random.Random()
+
+# Получатели событий боя (см. combat_log). В интерактивной игре это консоль с "анимацией";
+# безголовые симуляции убирают всех получателей (см. simulation.headless).
+sinks = [ConsoleSink(delay=0.5)]
+
+
+def emit(kind, actor, target=None, value=None, detail=None):
+    """
+    Создаёт событие боя и передаёт его всем получателям. Возвращает событие.
+    """
+    event = CombatEvent(kind, actor, target, value, detail)
+    for sink in sinks:
+        sink.handle(event)
+    return event
+
+
+# Действия игрока в бою
+ACTIONS = {'1': 'attack', '2': 'heal', '3': 'shield', '4': 'equip'}
+ACTION_MENU = "1. Атака\n2. Использовать зелье (хилл)\n3. Активировать щит (временно +2 ловкости и атака)\n4. Сменить оружие"
+ACTION_PROMPT = "Выберите действие (1/2/3/4): "
+TARGET_PROMPT = "Выберите цель (номер): "
+SHIELD_TARGET_PROMPT = "Выберите цель для атаки с щитом (номер): "
+WEAPON_PROMPT = "Выберите оружие для экипировки (номер): "
+
+
+def weapon_list(weapons):
+    """
+    Текст списка оружий для выбора.
+    """
+    return "Доступные оружия:\n" + "\n".join(f"{i}. {w.name} (урон: {w.damage})" for i, w in enumerate(weapons, 1))
+
+
+def parse_choice(line):
+    """
+    Номер из ввода пользователя в индекс списка (None при неверном вводе).
+    """
+    try:
+        return int(line) - 1
+    except ValueError:
+        return None
+
+
+NO_ANSWER = object()  # Ответа нет (в отличие от None - неверного ввода, см. parse_choice)
+
+
+# Класс AnswerPolicy (Политика с заранее известными ответами)
+class AnswerPolicy:
+    """
+    Политика для случаев, когда решения игрока собираются снаружи (сессии сервера, повторы):
+    вызывающий кладёт ответ в weapon перед вызовом кода, который спросит оружие.
+    Без ответа (NO_ANSWER) выбирается самое сильное оружие; неверный ответ (None) оружие не меняет,
+    как неверный ввод в консоли.
+    """
+
+    def __init__(self):
+        self.weapon = NO_ANSWER
+
+    def choose_action(self, player, enemies):
+        return None
+
+    def choose_target(self, player, enemies, shield=False):
+        return None
+
+    def choose_weapon(self, player):
+        weapon, self.weapon = self.weapon, NO_ANSWER
+        if weapon is NO_ANSWER:
+            weapons = player.inventory['weapons']
+            return max(range(len(weapons)), key=lambda i: weapons[i].damage)
+        return weapon
+
+
+# Класс ConsolePolicy (Политика управления через консоль)
+class ConsolePolicy:
+    """
+    Политика игрока: принимает решения в бою, спрашивая пользователя через input().
+    Любая другая политика (для симуляций, ботов) реализует те же три метода.
+    """
+
+    def choose_action(self, player, enemies):
+        """
+        Выбор действия на ход.
+        - player: Объект Player.
+        - enemies: Список живых злодеев.
+
+        Возвращает 'attack', 'heal', 'shield', 'equip' или None (пропуск хода).
+        """
+        print(ACTION_MENU)
+        return ACTIONS.get(input(ACTION_PROMPT))
+
+    def choose_target(self, player, enemies, shield=False):
+        """
+        Выбор цели в групповом бою.
+        Возвращает индекс в списке enemies или None при неверном вводе.
+        """
+        return parse_choice(input(SHIELD_TARGET_PROMPT if shield else TARGET_PROMPT))
+
+    def choose_weapon(self, player):
+        """
+        Выбор оружия из инвентаря.
+        Возвращает индекс в player.inventory['weapons'] или None при неверном вводе.
+        """
+        print(weapon_list(player.inventory['weapons']))
+        return parse_choice(input(WEAPON_PROMPT))
+
+# Боевые формулы (общие для Character и пакетных симуляций)
+def crit_chance(focus):
+    """
+    Шанс крита: 5% за единицу фокуса (max 40%).
+    """
+    return min(focus * 5, 40) / 100
+
+
+def combo_chance(focus):
+    """
+    Шанс комбо: 3% за единицу фокуса (max 30%).
+    """
+    return min(focus * 3, 30) / 100
+
+
+def dodge_chance(dexterity):
+    """
+    Шанс уклонения: 5% за единицу ловкости (max 40%).
+    """
+    return min(dexterity * 5, 40) / 100
+
+
+def counter_chance(dexterity):
+    """
+    Шанс контратаки после уклонения: 3% за единицу ловкости (max 30%).
+    """
+    return min(dexterity * 3, 30) / 100
+
+
+# Шаги разрешения атаки (вместо рекурсии attack -> receive_damage -> attack)
+ATTACK = 0  # Атака: крит, урон, уклонение, контратака
+FINISH = 1  # После атаки: комбо, горение, опыт
+BURN_EXP = 2  # После комбо: горение и опыт
+
+
+# Кэш производных боевых вероятностей: (фокус, ловкость) -> (крит, комбо, уклонение, контратака)
+_combat_stats_cache = {}
+
+
+def combat_stats(focus, dexterity):
+    """
+    Производные боевые вероятности для пары характеристик (считаются один раз на пару).
+    """
+    stats = _combat_stats_cache.get((focus, dexterity))
+    if stats is None:
+        stats = (crit_chance(focus), combo_chance(focus), dodge_chance(dexterity), counter_chance(dexterity))
+        _combat_stats_cache[(focus, dexterity)] = stats
+    return stats
+
+
+# Таблица элементов: атакующий элемент -> {элемент цели: модификатор урона}.
+# Пары, которых нет в таблице, дают модификатор 1.0. Загружается из elements.json,
+# поэтому новые элементы и взаимодействия добавляются без правки кода.
+ELEMENTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'elements.json')
+ELEMENTS = []  # Известные элементы в порядке файла
+ELEMENT_MODIFIERS = {}
+_NO_MODIFIERS = {}
+
+
+def load_elements(path=ELEMENTS_FILE):
+    """
+    Загружает таблицу элементов из JSON-файла вида
+    {"elements": [...], "modifiers": {"fire": {"water": 0.5, ...}, ...}}.
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    ELEMENTS[:] = data['elements']
+    ELEMENT_MODIFIERS.clear()
+    for attacker, row in data['modifiers'].items():
+        ELEMENT_MODIFIERS[attacker] = {target: float(modifier) for target, modifier in row.items()}
+
+
+def element_modifier(attacker_element, target_element):
+    """
+    Модификатор урона от взаимодействия элементов атакующего и цели.
+    """
+    return ELEMENT_MODIFIERS.get(attacker_element, _NO_MODIFIERS).get(target_element, 1.0)
+
+
+load_elements()
+
 
 # Класс Weapon (Оружие)
 class Weapon:
+    __slots__ = ('name', 'damage')  # Без __dict__: оружий и персонажей в симуляциях создаются сотни тысяч
+
     def __init__(self, name, damage):
         """
         Инициализация оружия.
@@ -16,6 +212,8 @@ class Weapon:
 
 # Класс Character (Персонаж) - базовый класс
 class Character:
+    __slots__ = ('name', 'max_health', 'health', 'weapon', 'status', 'strength', 'dexterity', 'focus',
+                 'base_damage', 'level', 'experience', 'element', 'status_effects', 'combat_stats')
     alive_count = 0  # Статическая переменная: общее количество живых персонажей (включая наследников)
 
     def __init__(self, name, weapon, element='neutral', strength=5, dexterity=5, focus=5):
@@ -43,64 +241,85 @@ class Character:
         self.level = 1  # Начальный уровень
         self.experience = 0  # Начальный опыт
         self.element = element  # Элемент
-        self.status_effects = []  # Список эффектов, e.g., ['burn', 3] (3 тика)
+        self.status_effects = Effects()  # Статус-эффекты (горение и др., см. effects.py)
+        self.combat_stats = combat_stats(focus, dexterity)  # (крит, комбо, уклонение, контратака)
         Character.alive_count += 1  # Увеличиваем счётчик живых персонажей
 
+    def update_derived_stats(self):
+        """
+        Пересчёт производных характеристик после изменения силы, ловкости, фокуса или оружия
+        (повышение уровня, смена оружия, щит).
+        """
+        self.max_health = max(self.max_health, 100 + self.strength * 10)  # Обновляем max_hp если изменилась сила
+        self.base_damage = self.weapon.damage + self.strength * 2  # Обновляем урон
+        self.combat_stats = combat_stats(self.focus, self.dexterity)
+
     def attack(self, target):
         """
         Функция атаки: Атакует цель.
         - target: Цель атаки (другой объект Character или наследник).
 
         Рассчитывает урон с учётом возможного крита (на основе фокуса).
-        Затем применяет урон к цели через receive_damage.
+        Затем применяет урон к цели (уклонение, контратака - см. receive_damage).
         После успешной атаки проверяет шанс комбо-атаки (на основе фокуса).
         Если цель умерла, начисляет опыт атакующему.
-        """
-        if self.status == "dead":
-            print(f"{self.name} мёртв и не может атаковать.")
-            return
 
-        # Шанс крита: 5% за единицу фокуса (max 40%)
-        crit_chance = min(self.focus * 5, 40) / 100
-        is_crit = random.random() < crit_chance
-        damage = self.base_damage * (2 if is_crit else 1)  # Урон удваивается при крите
-        crit_msg = " (крит!)" if is_crit else ""
-
-        # Модификатор элементов
-        element_modifier = 1.0
-        if self.element == 'fire' and target.element == 'water':
-            element_modifier = 0.5
-        elif self.element == 'fire' and target.element == 'earth':
-            element_modifier = 1.5
-        elif self.element == 'water' and target.element == 'fire':
-            element_modifier = 1.5
-        # Добавьте больше взаимодействий по необходимости
-        damage *= element_modifier
-
-        print(f"{self.name} атакует {target.name} оружием {self.weapon.name} на {int(damage)} урона{crit_msg}.")
-        time.sleep(0.5)  # Задержка для "анимации"
-
-        # Применяем урон к цели
-        target.receive_damage(int(damage), self)
-
-        # Если атака успешна (не уклонена), проверяем комбо-атаку
-        if target.status != "dead":  # Комбо только если цель жива после атаки
-            combo_chance = min(self.focus * 3, 30) / 100  # Шанс комбо: 3% за фокус, max 30%
-            if random.random() < combo_chance:
-                print(f"{self.name} проводит комбо-атаку!")
-                time.sleep(0.5)
-                self.attack(target)  # Рекурсивно атакуем снова (комбо)
+        Комбо и контратаки не вызывают attack рекурсивно: вся цепочка разворачивается
+        в явном стеке шагов, поэтому её длина не ограничена глубиной стека Python.
+        Возвращает список событий боя (CombatEvent) в порядке их возникновения.
+        """
+        events = []
+        stack = [(ATTACK, self, target)]
+        while stack:
+            step, attacker, defender = stack.pop()
+            if step == ATTACK:
+                if attacker.status == "dead":
+                    emit('cant_attack', attacker)
+                    continue
+
+                is_crit = rng.random() < attacker.combat_stats[0]
+                damage = attacker.base_damage * (2 if is_crit else 1)  # Урон удваивается при крите
+
+                damage *= ELEMENT_MODIFIERS.get(attacker.element, _NO_MODIFIERS).get(defender.element, 1.0)  # Модификатор элементов
+                damage = int(damage)
+
+                events.append(emit('attack', attacker, defender, damage, is_crit))
+
+                # Применяем урон к цели; при контратаке она разрешается раньше продолжения этой атаки
+                if defender._take_hit(damage, attacker, events):
+                    stack.append((FINISH, attacker, defender))
+                    stack.append((ATTACK, defender, attacker))
+                    continue
+                step = FINISH
+
+            # Если атака успешна (не уклонена), проверяем комбо-атаку
+            if step == FINISH and defender.status != "dead":  # Комбо только если цель жива после атаки
+                if rng.random() < attacker.combat_stats[1]:
+                    events.append(emit('combo', attacker, defender))
+                    stack.append((BURN_EXP, attacker, defender))
+                    stack.append((ATTACK, attacker, defender))  # Атакуем снова (комбо)
+                    continue
+                step = BURN_EXP
 
             # Наложение статуса
-            if random.random() < 0.2:  # 20% шанс
-                target.status_effects.append(['burn', 3])  # 3 тика по 5 урона
-                print(f"{target.name} горит!")
-
-        # Если цель умерла после атаки, начислить опыт
-        if target.status == "dead":
-            # Опыт = геометрическое среднее урона и max_health цели: sqrt(damage * max_health)
-            exp_gained = int((target.base_damage * target.max_health) ** 0.5)
-            self.gain_experience(exp_gained)
+            if step == BURN_EXP:
+                if rng.random() < 0.2:  # 20% шанс
+                    # 3 тика по 5 урона (то же, что defender.add_effect('burn', attacker), без лишнего вызова)
+                    if defender.status != "dead" and defender.status_effects.stack(BURN):
+                        events.append(emit('burn', attacker, defender))
+                # Эффекты оружия при попадании (loot.json, weapon_effects); оружие без эффектов не бросает кости
+                on_hit = WEAPON_EFFECTS.get(attacker.weapon.name)
+                if on_hit is not None:
+                    for name, chance, on_self in on_hit:
+                        if rng.random() < chance:
+                            events.extend((attacker if on_self else defender).add_effect(name, attacker))
+
+            # Если цель умерла после атаки, начислить опыт
+            if defender.status == "dead":
+                # Опыт = геометрическое среднее урона и max_health цели: sqrt(damage * max_health)
+                exp_gained = int((defender.base_damage * defender.max_health) ** 0.5)
+                events.extend(attacker.gain_experience(exp_gained))
+        return events
 
     def receive_damage(self, damage, attacker):
         """
@@ -112,40 +331,44 @@ class Character:
         Если не уклон, применяет урон к здоровью.
         Если здоровье <=0, вызывает death().
         Если уклон, проверяет шанс контратаки (на основе ловкости).
+        Возвращает список событий боя.
         """
+        events = []
+        if self._take_hit(damage, attacker, events):
+            events.extend(self.attack(attacker))  # Контратака
+        return events
+
+    def _take_hit(self, damage, attacker, events):
+        # Уклонение или урон без самой контратаки. Возвращает True, если цель контратакует.
         if self.status == "dead":
-            return
+            return False
 
-        # Шанс уклонения: 5% за единицу ловкости (max 40%)
-        dodge_chance = min(self.dexterity * 5, 40) / 100
-        if random.random() < dodge_chance:
-            print(f"{self.name} уклоняется от атаки!")
-            time.sleep(0.5)
-            # Шанс контратаки после уклонения: 3% за ловкость (max 30%)
-            counter_chance = min(self.dexterity * 3, 30) / 100
-            if random.random() < counter_chance:
-                print(f"{self.name} проводит контратаку!")
-                time.sleep(0.5)
-                self.attack(attacker)  # Контратака
-            return
+        if rng.random() < self.combat_stats[2]:
+            events.append(emit('dodge', self, attacker))
+            if rng.random() < self.combat_stats[3]:
+                events.append(emit('counter', self, attacker))
+                return True
+            return False
 
         # Применяем урон
         self.health -= damage
-        print(f"{self.name} получает {damage} урона. Здоровье: {self.health}/{self.max_health}.")
-        time.sleep(0.5)
+        events.append(emit('damage', self, attacker, damage))
         if self.health <= 0:
-            self.death()
+            events.extend(self.death())
+        return False
 
     def death(self):
         """
         Функция смерти: Устанавливает статус "dead" и уменьшает счётчик живых.
+        Возвращает список событий боя.
         """
         if self.status == "dead":
-            return
+            return []
         self.status = "dead"
         self.health = 0
+        self.status_effects.clear()  # Мёртвые не горят
         Character.alive_count -= 1
-        print(f"{self.name} погибает!")
+        return [emit('death', self)]
 
     def gain_experience(self, exp):
         """
@@ -156,59 +379,59 @@ class Character:
         Порог для уровня: level * 100 (например, для lvl1 -> lvl2 нужно 100 exp).
         При leveling up: +1 к случайной характеристике (strength, dexterity, focus) или +10 к max_health.
         Обновляет характеристики (hp, damage).
+        Возвращает список событий боя.
         """
         self.experience += exp
-        print(f"{self.name} получает {exp} опыта. Текущий опыт: {self.experience}.")
-        time.sleep(0.5)
+        events = [emit('exp', self, value=exp)]
 
         # Проверяем leveling up
         exp_threshold = self.level * 100  # Порог для следующего уровня
         while self.experience >= exp_threshold:
             self.level += 1
             self.experience -= exp_threshold  # Снимаем потраченный опыт
-            print(f"{self.name} повышает уровень до {self.level}!")
-            time.sleep(0.5)
 
             # Рандомно улучшаем один параметр
-            upgrade = random.choice(["strength", "dexterity", "focus", "health"])
+            upgrade = rng.choice(["strength", "dexterity", "focus", "health"])
             if upgrade == "strength":
                 self.strength += 1
-                print("Сила увеличена!")
             elif upgrade == "dexterity":
                 self.dexterity += 1
-                print("Ловкость увеличена!")
             elif upgrade == "focus":
                 self.focus += 1
-                print("Фокус увеличен!")
             elif upgrade == "health":
                 self.max_health += 10  # Прямое улучшение здоровья
-                print("Максимальное здоровье увеличено!")
+            events.append(emit('level_up', self, value=self.level, detail=upgrade))
 
-            # Обновляем производные характеристики
-            self.max_health = max(self.max_health, 100 + self.strength * 10)  # Обновляем max_hp если изменилась сила
-            self.base_damage = self.weapon.damage + self.strength * 2  # Обновляем урон
+            self.update_derived_stats()  # Обновляем производные характеристики
             self.health = min(self.health + 20, self.max_health)  # Восстанавливаем немного здоровья при leveling up
             exp_threshold = self.level * 100  # Новый порог
+        return events
+
+    def add_effect(self, name, source=None):
+        """
+        Наложение статус-эффекта.
+        - name: Название эффекта (см. effects.EFFECTS).
+        - source: Кто наложил эффект (для события).
+
+        На мёртвых эффекты не накладываются. Повторные наложения - по правилу вида эффекта.
+        Возвращает список событий боя.
+        """
+        if self.status == "dead" or not self.status_effects.add(name):
+            return []
+        return [emit(name, source, self)]
 
     def apply_status_effects(self):
         """
-        Применение статус-эффектов в конце хода.
-        """
-        for effect in self.status_effects[:]:
-            if effect[0] == 'burn':
-                burn_damage = 5
-                self.health -= burn_damage
-                print(f"{self.name} получает {burn_damage} урона от горения! Здоровье: {self.health}/{self.max_health}")
-                time.sleep(0.5)
-                effect[1] -= 1
-                if effect[1] <= 0:
-                    self.status_effects.remove(effect)
-                    print(f"{self.name} больше не горит.")
-        if self.health <= 0:
-            self.death()
+        Применение статус-эффектов в конце хода (тик эффектов одного персонажа;
+        в бою все участники тикают разом - см. EffectScheduler).
+        Возвращает список событий боя.
+        """
+        return self.status_effects.tick(self, emit)
 
 # Класс Player (Игрок) - наследник от Character
 class Player(Character):
+    __slots__ = ('potions', 'inventory', 'policy')
+
     def __init__(self, name, weapon, element='neutral', potions=3, strength=5, dexterity=5, focus=5):
         """
         Инициализация игрока.
@@ -217,6 +440,7 @@ class Player(Character):
         super().__init__(name, weapon, element, strength, dexterity, focus)
         self.potions = potions  # Количество зелий
         self.inventory = {'potions': potions, 'weapons': [weapon]}  # Инвентарь
+        self.policy = ConsolePolicy()  # Кто принимает решения в бою (по умолчанию - пользователь)
 
     def heal_self(self):
         """
@@ -228,10 +452,9 @@ class Player(Character):
             self.health = min(self.health + heal_amount, self.max_health)
             self.potions -= 1
             self.inventory['potions'] = self.potions
-            print(f"{self.name} использует зелье и восстанавливает {heal_amount} здоровья. Зелий осталось: {self.potions}.")
-            time.sleep(0.5)
+            emit('heal', self, value=heal_amount)
         else:
-            print(f"{self.name} не может использовать зелье (нет зелий или мёртв).")
+            emit('heal_failed', self)
 
     def equip_weapon(self, new_weapon=None):
         """
@@ -239,21 +462,20 @@ class Player(Character):
         """
         if new_weapon:
             self.inventory['weapons'].append(new_weapon)
-            print(f"Вы нашли {new_weapon.name}! Добавлено в инвентарь.")
+            emit('weapon_found', self, detail=new_weapon)
         if len(self.inventory['weapons']) > 1:
-            print("Доступные оружия:")
-            for i, w in enumerate(self.inventory['weapons'], 1):
-                print(f"{i}. {w.name} (урон: {w.damage})")
-            choice = input("Выберите оружие для экипировки (номер): ")
+            choice = self.policy.choose_weapon(self)
             try:
-                self.weapon = self.inventory['weapons'][int(choice) - 1]
-                self.base_damage = self.weapon.damage + self.strength * 2  # Обновляем урон
-                print(f"{self.name} экипирует {self.weapon.name}.")
+                self.weapon = self.inventory['weapons'][choice]
+                self.update_derived_stats()  # Обновляем урон
+                emit('equip', self, detail=self.weapon)
             except:
-                print("Неверный выбор, оружие не изменено.")
+                emit('equip_failed', self)
 
 # Класс Villain (Злодей) - наследник от Character
 class Villain(Character):
+    __slots__ = ('potions', 'policy')
+
     def __init__(self, name, weapon, element='neutral', potions=0, strength=5, dexterity=5, focus=5):
         """
         Инициализация злодея.
@@ -261,6 +483,7 @@ class Villain(Character):
         """
         super().__init__(name, weapon, element, strength, dexterity, focus)
         self.potions = potions  # Количество зелий
+        self.policy = None  # Политика (см. ai.py); None - 10% шанс выпить зелье, иначе атака
 
     def heal_self(self):
         """
@@ -270,10 +493,338 @@ class Villain(Character):
             heal_amount = int(self.max_health * 0.5)
             self.health = min(self.health + heal_amount, self.max_health)
             self.potions -= 1
-            print(f"{self.name} использует зелье и восстанавливает {heal_amount} здоровья. Зелий осталось: {self.potions}.")
-            time.sleep(0.5)
+            emit('heal', self, value=heal_amount)
+        else:
+            emit('heal_failed', self)
+
+# Класс Roster (Живые злодеи группового боя)
+class Roster:
+    """
+    Живые злодеи группы, которые обновляются по событиям, а не пересчитываются каждый ход:
+    двусвязный список индексов (обход по порядку, удаление за O(1))
+    и дерево Фенвика (k-й живой злодей - цель игрока - за O(log n)).
+    Злодеев со статус-эффектами отслеживает планировщик эффектов боя (Battle.effects).
+    После каждого действия, которое могло убить злодея, вызывается update(i).
+    """
+
+    def __init__(self, villains):
+        n = len(villains)
+        self.villains = villains
+        self.alive = bytearray(n)
+        self.next = list(range(1, n + 2))  # Индексы сдвинуты на 1: 0 - голова списка, n + 1 - конец
+        self.prev = list(range(-1, n + 1))
+        self.tree = [0] * (n + 1)  # Дерево Фенвика по флагам alive
+        self.count = 0
+        for i, villain in enumerate(villains):
+            if villain.status == "alive":
+                self.alive[i] = 1
+                self.count += 1
+                self._add(i, 1)
+            else:
+                self._unlink(i)
+        self.view = AliveView(self)
+
+    def _add(self, i, delta):
+        tree = self.tree
+        i += 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def _unlink(self, i):
+        nxt, prv = self.next[i + 1], self.prev[i + 1]
+        self.next[prv] = nxt
+        self.prev[nxt] = prv
+
+    def update(self, i):
+        """
+        Учитывает смерть злодея номер i.
+        """
+        if self.alive[i] and self.villains[i].status != "alive":
+            self.alive[i] = 0
+            self.count -= 1
+            self._add(i, -1)
+            self._unlink(i)
+
+    def indices(self):
+        """
+        Индексы живых злодеев по порядку. Злодей, умерший во время обхода, корректно пропускается.
+        """
+        end = len(self.villains) + 1
+        i = self.next[0]
+        while i != end:
+            nxt = self.next[i]
+            if self.alive[i - 1]:
+                yield i - 1
+            i = nxt
+
+    def kth(self, k):
+        """
+        Индекс k-го (с нуля) живого злодея.
+        """
+        tree = self.tree
+        pos = 0
+        step = 1 << (len(tree) - 1).bit_length()
+        while step:
+            if pos + step < len(tree) and tree[pos + step] <= k:
+                pos += step
+                k -= tree[pos]
+            step >>= 1
+        return pos
+
+    def target(self, k):
+        """
+        Индекс злодея по номеру k среди живых (отрицательные номера - с конца, как у списка).
+        """
+        count = self.count
+        if k < 0:
+            k += count
+        if not 0 <= k < count:
+            raise IndexError("нет такой цели")
+        return self.kth(k)
+
+
+# Класс AliveView (Живые злодеи как список, без копирования)
+class AliveView:
+    """
+    Последовательность живых злодеев группового боя в порядке их индексов: len() за O(1),
+    доступ по номеру (включая отрицательные, как у списка) за O(log n).
+    """
+
+    def __init__(self, roster):
+        self.roster = roster
+
+    def __len__(self):
+        return self.roster.count
+
+    def __getitem__(self, k):
+        return self.roster.villains[self.roster.target(k)]
+
+    def __iter__(self):
+        villains = self.roster.villains
+        return (villains[i] for i in self.roster.indices())
+
+    def index(self, villain):
+        """
+        Номер живого злодея среди живых (для отображения).
+        """
+        for k, v in enumerate(self):
+            if v is villain:
+                return k
+        raise ValueError("злодей не в бою")
+
+
+# Класс Battle (Пошаговый бой)
+class Battle:
+    """
+    Бой игрока с одним или несколькими злодеями, разбитый на шаги:
+    - advance() проводит всё, что не требует решения игрока (статус-эффекты, ходы злодеев,
+      пропуск хода скованного игрока), и возвращает True, когда игрок должен выбрать действие, или False, когда бой окончен;
+    - player_turn(action, target) выполняет выбранное действие;
+    - finish() разыгрывает лут и возвращает результат боя.
+    simulate_battle и simulate_group_battle - это цикл по этим шагам с решениями от player.policy
+    (и villain.policy для злодеев, см. villain_turn);
+    сессии сервера вызывают те же шаги по мере поступления команд игрока.
+    """
+
+    def __init__(self, player, villains, group=True, loot=None, level=0):
+        """
+        - player: Объект Player.
+        - villains: Список объектов Villain.
+        - group: True - одновременный бой (раунд: ход игрока и ходы всех живых злодеев),
+          False - бой один на один (игрок и злодей ходят по очереди).
+        - loot: Таблица лута (loot.LootTable); по умолчанию - "battle" из loot.json.
+        - level: Уровень встречи (Room.level, в подземелье растёт с глубиной) - к нему добавляется уровень злодея при розыгрыше лута.
+        """
+        self.player = player
+        self.villains = villains
+        self.group = group
+        self.turn = 0  # Номер хода (в бою один на один ходы игрока - чётные)
+        self.roster = Roster(villains) if group else None  # Живые злодеи группового боя
+        self.effects = EffectScheduler([player] + villains)  # Статус-эффекты всех участников
+        self.loot = loot or LOOT_TABLES['battle']
+        self.level = level
+        self.drops = []  # Оружие, выпавшее из злодеев (см. finish)
+
+    @property
+    def alive_villains(self):
+        """
+        Живые злодеи группового боя (AliveView - без копирования списка).
+        """
+        return self.roster.view if self.group else []
+
+    def start(self):
+        if self.group:
+            emit('battle_start', self.player, detail=self.villains)
+        else:
+            emit('battle_start', self.player, self.villains[0])
+
+    def targets(self):
+        """
+        Злодеи, из которых игрок выбирает цель.
+        """
+        return self.alive_villains if self.group else self.villains
+
+    def advance(self):
+        """
+        Проводит бой до следующего решения игрока.
+        Возвращает True, если игрок должен выбрать действие, False - если бой окончен.
+        """
+        player = self.player
+        if self.group:
+            roster = self.roster
+            while player.status == "alive" and roster.count:
+                # Тик статус-эффектов всех участников, у которых они есть (в том числе смерть злодеев от них)
+                effects = self.effects
+                if effects.active:
+                    ticked = sorted(effects.active)
+                    effects.tick(emit)
+                    for slot in ticked:
+                        if slot:
+                            roster.update(slot - 1)
+                if player.status_effects.held and player.status_effects.hold(player, emit):
+                    self._villain_turns()  # Скованный игрок пропускает ход, злодеи ходят
+                    continue
+                emit('turn', player, detail=roster.view)
+                return True
+            return False
+
+        villain = self.villains[0]
+        effects = self.effects
+        while player.status == "alive" and villain.status == "alive":
+            if effects.active:
+                effects.tick(emit)
+            if player.status == "dead" or villain.status == "dead":
+                break
+
+            if self.turn % 2 == 0:  # Ход игрока
+                if player.status_effects.held and player.status_effects.hold(player, emit):
+                    self.turn += 1  # Скованный игрок пропускает ход
+                    continue
+                emit('turn', player, villain)
+                return True
+            self.villain_turn(villain)  # Ход злодея
+            self.turn += 1
+        return False
+
+    def player_turn(self, action, target=None):
+        """
+        Ход игрока.
+        - action: 'attack', 'heal', 'shield', 'equip' или None (пропуск хода).
+        - target: Индекс цели в targets() (только для группового боя).
+        """
+        player = self.player
+        if action in ('attack', 'shield'):
+            if self.group:
+                roster = self.roster
+                if roster.count:
+                    try:
+                        i = roster.target(target)
+                    except (TypeError, IndexError):
+                        emit('skip', player)
+                    else:
+                        self._attack(player, self.villains[i], shield=action == 'shield')
+                        roster.update(i)
+            else:
+                self._attack(player, self.villains[0], shield=action == 'shield')
+        elif action == 'heal':
+            player.heal_self()
+        elif action == 'equip':
+            player.equip_weapon()
         else:
-            print(f"{self.name} не может использовать зелье (нет зелий или мёртв).")
+            emit('skip', player)
+
+        if self.group:
+            self._villain_turns()
+        else:
+            self.turn += 1
+
+    def _villain_turns(self):
+        # Ходы злодеев группового боя: каждый живой злодей атакует игрока
+        roster = self.roster
+        for i in roster.indices():
+            self.villain_turn(self.villains[i])
+            roster.update(i)
+
+    def _attack(self, attacker, defender, shield=False):
+        if not shield:
+            attacker.attack(defender)
+            return
+        # Специальная способность: временно повысить уклонение
+        attacker.dexterity += 2  # Временный буст
+        attacker.update_derived_stats()
+        emit('shield', attacker, value=2)
+        attacker.attack(defender)
+        attacker.dexterity -= 2  # Сброс после хода
+        attacker.update_derived_stats()
+
+    def villain_turn(self, villain):
+        """
+        Ход злодея: решение принимает villain.policy (см. ai.py), без политики - 10% шанс на хилл, иначе атака.
+        Политике злодея противник - игрок: choose_action(villain, [player]) -> 'attack', 'heal', 'shield' или None.
+        Скованный злодей (заморозка, оглушение) пропускает ход.
+        """
+        if villain.status_effects.held and villain.status_effects.hold(villain, emit):
+            return
+        policy = villain.policy
+        if policy is None:
+            if rng.random() < 0.1 and villain.potions > 0:  # 10% шанс на хилл для злодея
+                villain.heal_self()
+            else:
+                villain.attack(self.player)
+            return
+        action = policy.choose_action(villain, [self.player])
+        if action == 'heal':
+            villain.heal_self()
+        elif action in ('attack', 'shield'):
+            self._attack(villain, self.player, shield=action == 'shield')
+        else:
+            emit('skip', villain)
+
+    def finish(self):
+        """
+        После боя: лут от всех побеждённых злодеев по таблице self.loot
+        (уровень лута - уровень встречи self.level плюс рост уровня злодея в бою).
+        Зелья достаются сразу, выпавшее оружие складывается в drops (его предлагают игроку вызывающие).
+        Возвращает True, если игрок выиграл.
+        """
+        player = self.player
+        roll = self.loot.roll
+        level = self.level - 1
+        self.effects.close()
+        for villain in self.villains:
+            if villain.status == "dead":
+                weapon, potion = roll(rng, level + villain.level)
+                if weapon is not None:
+                    self.drops.append(weapon)
+                if potion:
+                    player.potions += 1
+                    emit('potion_found', player, value=player.potions)
+        if self.group:
+            return player.status == "alive" and not self.roster.count
+        return player.status == "alive"
+
+
+def run_battle(battle):
+    """
+    Проводит бой целиком, спрашивая решения у battle.player.policy.
+    Возвращает True, если игрок выиграл.
+    """
+    player = battle.player
+    policy = player.policy
+    battle.start()
+    while battle.advance():
+        targets = battle.targets()
+        action = policy.choose_action(player, targets)
+        target = None
+        if battle.group and action in ('attack', 'shield') and targets:
+            target = policy.choose_target(player, targets, shield=action == 'shield')
+        battle.player_turn(action, target)
+    won = battle.finish()
+    for weapon in battle.drops:
+        player.equip_weapon(weapon)
+    return won
+
 
 # Функция для симуляции боя между игроком и одним злодеем
 def simulate_battle(player, villain):
@@ -285,50 +836,7 @@ def simulate_battle(player, villain):
     По очереди атакуют, с выбором действий для игрока.
     Возвращает True, если игрок выиграл, False если проиграл.
     """
-    print(f"\nНачинается бой: {player.name} vs {villain.name}")
-    turn = 0
-    while player.status == "alive" and villain.status == "alive":
-        player.apply_status_effects()
-        villain.apply_status_effects()
-        if player.status == "dead" or villain.status == "dead":
-            break
-
-        if turn % 2 == 0:  # Ход игрока
-            print(f"\nВаш ход ({player.name}): Здоровье {player.health}/{player.max_health}, Зелий: {player.potions}")
-            print("1. Атака\n2. Использовать зелье (хилл)\n3. Активировать щит (временно +2 ловкости и атака)\n4. Сменить оружие")
-            choice = input("Выберите действие (1/2/3/4): ")
-            if choice == '1':
-                player.attack(villain)
-            elif choice == '2':
-                player.heal_self()
-            elif choice == '3':
-                # Специальная способность: временно повысить уклонение
-                player.dexterity += 2  # Временный буст
-                print(f"{player.name} активирует щит! Ловкость повышена на 2 на этот ход.")
-                time.sleep(0.5)
-                player.attack(villain)
-                player.dexterity -= 2  # Сброс после хода
-            elif choice == '4':
-                player.equip_weapon()
-            else:
-                print("Неверный выбор, пропуск хода.")
-        else:  # Ход злодея
-            if random.random() < 0.1 and villain.potions > 0:  # 10% шанс на хилл для злодея
-                villain.heal_self()
-            else:
-                villain.attack(player)
-        turn += 1
-
-    # После боя: лут
-    if villain.status == "dead":
-        if random.random() < 0.25:
-            new_weapon = Weapon("Магический " + random.choice(["меч", "топор", "кинжал"]), random.randint(10, 30))
-            player.equip_weapon(new_weapon)
-        if random.random() < 0.4:
-            player.potions += 1
-            print(f"{player.name} находит зелье! Зелий теперь: {player.potions}")
-
-    return player.status == "alive"
+    return run_battle(Battle(player, [villain], group=False))
 
 # Функция для симуляции одновременного боя между игроком и несколькими злодеями
 def simulate_group_battle(player, villains):
@@ -341,65 +849,4 @@ def simulate_group_battle(player, villains):
     затем все живые злодеи атакуют игрока по очереди.
     Возвращает True, если игрок выиграл (все злодеи мертвы), False если проиграл.
     """
-    print(f"\nНачинается групповой бой: {player.name} vs {', '.join(v.name for v in villains)}")
-
-    while player.status == "alive" and any(v.status == "alive" for v in villains):
-        # Применение статусов
-        player.apply_status_effects()
-        for villain in villains:
-            villain.apply_status_effects()
-
-        # Ход игрока
-        print(f"\nВаш ход ({player.name}): Здоровье {player.health}/{player.max_health}, Зелий: {player.potions}")
-        alive_villains_str = ', '.join(f"{i+1}. {v.name} (HP: {v.health}/{v.max_health})" for i, v in enumerate([v for v in villains if v.status == "alive"]))
-        print(f"Живые враги: {alive_villains_str if alive_villains_str else 'Нет врагов'}")
-        print("1. Атака (выберите цель)\n2. Использовать зелье (хилл)\n3. Активировать щит (временно +2 ловкости и атака на цель)\n4. Сменить оружие")
-        choice = input("Выберите действие (1/2/3/4): ")
-        alive_villains = [v for v in villains if v.status == "alive"]
-        if choice == '1':
-            if alive_villains:
-                target_num = input("Выберите цель (номер): ")
-                try:
-                    target = alive_villains[int(target_num) - 1]
-                    player.attack(target)
-                except:
-                    print("Неверный выбор, пропуск хода.")
-        elif choice == '2':
-            player.heal_self()
-        elif choice == '3':
-            if alive_villains:
-                target_num = input("Выберите цель для атаки с щитом (номер): ")
-                try:
-                    target = alive_villains[int(target_num) - 1]
-                    player.dexterity += 2
-                    print(f"{player.name} активирует щит! Ловкость повышена на 2 на этот ход.")
-                    time.sleep(0.5)
-                    player.attack(target)
-                    player.dexterity -= 2
-                except:
-                    print("Неверный выбор, пропуск хода.")
-        elif choice == '4':
-            player.equip_weapon()
-        else:
-            print("Неверный выбор, пропуск хода.")
-
-        # Ходы злодеев: каждый живой злодей атакует игрока
-        for villain in alive_villains:
-            if villain.status == "alive":
-                if random.random() < 0.1 and villain.potions > 0:
-                    villain.heal_self()
-                else:
-                    villain.attack(player)
-
-    # После боя: лут от всех
-    for villain in villains:
-        if villain.status == "dead":
-            if random.random() < 0.25:
-                new_weapon = Weapon("Магический " + random.choice(["меч", "топор", "кинжал"]), random.randint(10, 30))
-                player.equip_weapon(new_weapon)
-            if random.random() < 0.4:
-                player.potions += 1
-                print(f"{player.name} находит зелье! Зелий теперь: {player.potions}")
-
-    all_villains_dead = all(v.status == "dead" for v in villains)
-    return player.status == "alive" and all_villains_dead
\ No newline at end of file
+    return run_battle(Battle(player, villains, group=True))
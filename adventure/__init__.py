@@ -0,0 +1,79 @@
+# adventure - Игра как пакет: ленивый доступ к модулям и командная строка
+#
+#   python -m adventure play [--world МИР] [--record ФАЙЛ]   - играть (МИР - как в replay.py: файл мира или dungeon:N)
+#   python -m adventure simulate [ВРАГИ ...] [--fights N]     - безголовая серия боёв и сводка
+#   python -m adventure timing                               - время запуска: пакет, игра, воркеры пула
+#
+# Модули игры лежат рядом с пакетом (RPG.py, text_adventure.py, ...) и по-прежнему запускаются по отдельности.
+# Они импортируются по своим именам, поэтому корень репозитория (ROOT) должен быть в sys.path: так и есть
+# при запуске из корня (python -m adventure) или с PYTHONPATH=<корень>. Без этого обращение к модулю игры -
+# ImportError с объяснением, а python -m adventure сразу завершается с ошибкой (см. cli.py).
+# Пакет ничего из них не импортирует заранее: имя из EXPORTS (или модуль из MODULES) загружается
+# при первом обращении - adventure.Player, from adventure import run_batch, adventure.metrics.enable().
+# Поэтому import adventure и запуск python -m adventure стоят почти как голый интерпретатор,
+# а каждая команда загружает только то, что ей нужно.
+
+import importlib
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # Корень репозитория с модулями игры
+
+# Имя -> модуль, из которого оно берётся
+EXPORTS = {
+    'Weapon': 'RPG', 'Character': 'RPG', 'Player': 'RPG', 'Villain': 'RPG', 'Battle': 'RPG',
+    'simulate_battle': 'RPG', 'simulate_group_battle': 'RPG',
+    'Room': 'text_adventure', 'Adventure': 'text_adventure', 'create_rooms': 'text_adventure',
+    'play_game': 'text_adventure',
+    'headless': 'simulation', 'simulate_fight': 'simulation', 'run_batch': 'simulation',
+    'AggressivePolicy': 'simulation', 'BatchResult': 'simulation',
+    'run_parallel': 'parallel', 'run_sweep': 'parallel',
+    'RandomPolicy': 'ai', 'GreedyPolicy': 'ai', 'ExpectimaxPolicy': 'ai',
+    'fight_odds': 'odds', 'describe_room': 'odds',
+    'Dungeon': 'dungeon',
+    'World': 'world', 'load_world': 'world', 'compile_file': 'world',
+    'Recording': 'replay', 'Replay': 'replay', 'record': 'replay',
+}
+
+# Модули игры, доступные как adventure.<модуль>
+MODULES = ('RPG', 'ai', 'batch_combat', 'bench', 'combat_log', 'compact', 'dungeon', 'effects', 'loot',
+           'metrics', 'odds', 'parallel', 'replay', 'server', 'simulation', 'snapshot', 'text_adventure', 'world')
+
+__all__ = sorted(EXPORTS)
+
+
+def root_on_path():
+    """
+    Есть ли корень репозитория в sys.path ('' - текущий каталог).
+    """
+    return any(os.path.abspath(path or os.curdir) == ROOT for path in sys.path)
+
+
+def require_root():
+    """
+    ImportError, если модули игры не импортировать: пакет лежит не в корне репозитория
+    или корня нет в sys.path.
+    """
+    if not os.path.isfile(os.path.join(ROOT, 'RPG.py')):
+        raise ImportError(f"рядом с пакетом adventure ({ROOT}) нет модулей игры: "
+                          f"пакет работает только из корня репозитория, вместе с RPG.py и остальными модулями")
+    if not root_on_path():
+        raise ImportError(f"модули игры лежат в {ROOT}, но этого каталога нет в sys.path: "
+                          f"запускайте из него (python -m adventure) или задайте PYTHONPATH={ROOT}")
+
+
+def __getattr__(name):
+    if name in EXPORTS:
+        require_root()
+        value = getattr(importlib.import_module(EXPORTS[name]), name)
+    elif name in MODULES:
+        require_root()
+        value = importlib.import_module(name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value  # Следующие обращения - без __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(EXPORTS) | set(MODULES))
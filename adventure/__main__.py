@@ -0,0 +1,8 @@
+# python -m adventure - см. adventure/cli.py
+
+import sys
+
+from adventure.cli import main
+
+if __name__ == "__main__":  # Воркеры пула (spawn) импортируют этот модуль заново - без запуска команды
+    sys.exit(main())
@@ -0,0 +1,226 @@
+# adventure/cli.py - Командная строка игры (python -m adventure ...)
+#
+# Команды загружают модули игры внутри себя, поэтому разбор аргументов и --help не трогают боевую систему,
+# а каждая команда платит только за свои модули: play - бой и сценарий, simulate - ещё симуляции,
+# timing - ничего, кроме subprocess (замеры идут в новых интерпретаторах).
+
+import argparse
+import os
+import sys
+import time
+
+from adventure import ROOT, require_root
+CAVE = os.path.join(ROOT, 'cave.json')
+POLICIES = {'aggressive': ('simulation', 'AggressivePolicy'), 'random': ('ai', 'RandomPolicy'),
+            'greedy': ('ai', 'GreedyPolicy'), 'expectimax': ('ai', 'ExpectimaxPolicy')}
+
+# Замеры запуска: цель -> код, который выполняет новый интерпретатор
+STARTUP_TARGETS = {
+    'python': "pass",  # Голый интерпретатор - база для остальных
+    'package': "import adventure",
+    'cli': "import adventure.cli",  # То, что загружает python -m adventure до выбора команды
+    'play': "import text_adventure",  # Всё, что нужно для старта игры
+    'worker': "import parallel",  # Что загружает воркер пула parallel.py ради своего первого боя
+    'everything': "import " + ", ".join(('RPG', 'ai', 'batch_combat', 'compact', 'dungeon', 'metrics', 'odds',
+                                         'parallel', 'replay', 'server', 'simulation', 'snapshot', 'world')),
+}
+
+
+def _enemies(world, keys):
+    # Враги по ключам из исходного JSON мира: кортежи в формате Room.enemies (оружия общие, как в world.WorldData)
+    import json
+    from world import WorldData, compile_world
+    with open(world, encoding='utf-8') as f:
+        source = json.load(f)
+    known = list(source.get('enemies', {}))
+    data = WorldData(compile_world(source))
+    enemies = []
+    for key in keys:
+        if key not in known:
+            raise ValueError(f"неизвестный враг {key!r} (в {os.path.basename(world)}: {', '.join(known)})")
+        enemies.append(data.enemies[known.index(key)])
+    return enemies
+
+
+# Команды
+def play(args):
+    """
+    Интерактивная игра (с записью сессии, если задан --record).
+    """
+    import RPG
+    if args.record:
+        from replay import record
+        recording = record(args.record, args.world, seed=args.seed)
+        print(f"Записано ходов: {recording.turns} (зерно {recording.seed}) -> {args.record}")
+        return 0
+    from text_adventure import play_game
+    if args.seed is not None:
+        RPG.rng.seed(args.seed)
+    start_room = None
+    if args.world:
+        from replay import open_world
+        start_room = open_world(args.world)().start_room()
+    try:
+        play_game(start_room)
+    except (EOFError, KeyboardInterrupt):
+        print()
+    return 0
+
+
+def simulate(args):
+    """
+    Безголовая серия боёв стартового игрока против врагов из мира и сводка.
+    """
+    import importlib
+    enemies = _enemies(args.world, args.enemies or ['goblin'])
+    module, name = POLICIES[args.policy]
+    policy = getattr(importlib.import_module(module), name)()
+    start = time.perf_counter()
+    if args.workers == 1:
+        from simulation import run_batch
+        batch = run_batch(enemies, args.fights, args.seed, policy=policy)
+    else:
+        from parallel import run_parallel
+        batch = run_parallel(enemies, args.fights, args.seed, policy=policy, workers=args.workers)
+    elapsed = time.perf_counter() - start
+    summary = batch.summary()
+    if args.json:
+        import json
+        print(json.dumps(dict(summary, seconds=elapsed), ensure_ascii=False))
+        return 0
+    print(f"Враги: {', '.join(enemy[0] for enemy in enemies)}; политика {args.policy}, зерно {args.seed}")
+    print(f"Побед: {summary['wins']} из {summary['fights']} ({summary['win_rate']:.2%})")
+    for key, title in (('turns', "Ходов"), ('damage_dealt', "Нанесено урона"), ('damage_taken', "Получено урона"),
+                       ('exp', "Опыта")):
+        d = summary[key]
+        if d:
+            print(f"{title}: в среднем {d['mean']:.1f}, медиана {d['median']:.1f}, 10-90% {d['p10']:.1f}..{d['p90']:.1f}")
+    print(f"{summary['fights']} боёв за {elapsed:.2f} с ({summary['fights'] / elapsed:.0f} боёв в секунду)")
+    return 0
+
+
+def startup_benchmark(runs=10, targets=None):
+    """
+    Время запуска нового интерпретатора, выполняющего код каждой цели STARTUP_TARGETS (лучшее из runs, мс).
+    Цели чередуются в каждом прогоне, чтобы фоновая нагрузка сказывалась на всех одинаково.
+    Сначала обновляется байт-код модулей игры: иначе (например, при PYTHONDONTWRITEBYTECODE)
+    каждый запуск заново компилирует изменённые модули.
+    Возвращает {цель: мс}.
+    """
+    import compileall
+    import subprocess
+    compileall.compile_dir(ROOT, quiet=1)
+    targets = list(targets or STARTUP_TARGETS)
+    best = {}
+    for _ in range(runs):
+        for name in targets:
+            start = time.perf_counter()
+            subprocess.run([sys.executable, '-c', STARTUP_TARGETS[name]], cwd=ROOT, check=True)
+            elapsed = (time.perf_counter() - start) * 1000
+            best[name] = min(best.get(name, elapsed), elapsed)
+    return best
+
+
+def spawn_benchmark(workers=4, runs=3):
+    """
+    Пул из workers процессов методом spawn (как на macOS и Windows): время от создания пула до конца
+    первого боя в каждом воркере (лучшее из runs, мс). Каждый воркер - новый интерпретатор,
+    который импортирует simulation и главный модуль родителя.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from simulation import default_player, run_range
+    from RPG import Weapon
+    goblin = [("Гоблин", Weapon("Гоблинский топор", 15), 'neutral', 0, 3, 1, 5)]
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            list(pool.map(run_range, [goblin] * workers, range(workers), range(1, workers + 1),
+                          [0] * workers, [None] * workers, [default_player] * workers))
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def import_profile(code, top=8):
+    """
+    Самые дорогие импорты кода code в новом интерпретаторе (python -X importtime):
+    список (модуль, собственное время мкс, с вложенными мкс) по убыванию собственного времени.
+    """
+    import subprocess
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, check=True,
+                            capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        fields = line.partition(':')[2].split('|')
+        if len(fields) == 3 and fields[0].strip().isdigit():
+            rows.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+    return sorted(rows, key=lambda row: -row[1])[:top]
+
+
+def timing(args):
+    """
+    Замеры запуска: интерпретатор с загрузкой пакета, игры, воркера; пул воркеров методом spawn.
+    """
+    results = startup_benchmark(args.runs)
+    base = results['python']
+    for name, ms in results.items():
+        extra = f" (+{ms - base:.1f} мс к интерпретатору)" if name != 'python' else ""
+        print(f"{name:>10}: {ms:7.1f} мс{extra}   [{STARTUP_TARGETS[name]}]")
+    if args.workers:
+        print(f"Пул из {args.workers} воркеров (spawn) до первого боя в каждом: {spawn_benchmark(args.workers):.0f} мс")
+    if args.imports:
+        for name in ('play', 'worker'):
+            print(f"Самые дорогие импорты '{name}':")
+            for module, own, total in import_profile(STARTUP_TARGETS[name]):
+                print(f"  {module:<28} {own / 1000:6.2f} мс (с вложенными {total / 1000:.2f} мс)")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m adventure', description="Текстовая RPG: игра, симуляции и замеры.")
+    commands = parser.add_subparsers(dest='command', metavar='КОМАНДА')
+
+    p = commands.add_parser('play', help="играть (по умолчанию)")
+    p.add_argument('--world', default='', help="мир: файл (JSON или скомпилированный, см. world.py) или dungeon:N")
+    p.add_argument('--record', metavar='ФАЙЛ', help="записать сессию (см. replay.py)")
+    p.add_argument('--seed', type=int, help="зерно генератора боя")
+    p.set_defaults(handler=play)
+
+    p = commands.add_parser('simulate', help="безголовая серия боёв и сводка")
+    p.add_argument('enemies', nargs='*', metavar='ВРАГ', help="ключи врагов из мира (по умолчанию goblin)")
+    p.add_argument('--world', default=CAVE, help="исходный JSON мира с врагами (по умолчанию cave.json)")
+    p.add_argument('--fights', type=int, default=1000)
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--policy', choices=list(POLICIES), default='aggressive', help="политика игрока")
+    p.add_argument('--workers', type=int, default=1, help="процессов (1 - без пула)")
+    p.add_argument('--json', action='store_true', help="сводка одной JSON-строкой")
+    p.set_defaults(handler=simulate)
+
+    p = commands.add_parser('timing', help="замеры времени запуска")
+    p.add_argument('--runs', type=int, default=10, help="прогонов на цель (берётся лучший)")
+    p.add_argument('--workers', type=int, default=4, help="воркеров в замере пула (0 - без него)")
+    p.add_argument('--imports', action='store_true', help="показать самые дорогие импорты игры и воркера")
+    p.set_defaults(handler=timing)
+    return parser
+
+
+def main(argv=None):
+    """
+    Разбирает аргументы и выполняет команду. Возвращает код выхода.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        args = parser.parse_args(['play'])
+    try:
+        require_root()
+    except ImportError as error:
+        print(f"Ошибка: {error}", file=sys.stderr)
+        return 2
+    try:
+        return args.handler(args)
+    except ValueError as error:
+        print(f"Ошибка: {error}", file=sys.stderr)
+        return 2
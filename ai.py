@@ -0,0 +1,377 @@
+# ai.py - Политики боя: боты для игроков и поведение злодеев
+#
+# Политика - объект с тремя методами (как ConsolePolicy в RPG.py):
+#   choose_action(me, enemies) -> 'attack', 'heal', 'shield', 'equip' или None
+#   choose_target(me, enemies, shield=False) -> индекс в enemies
+#   choose_weapon(me) -> индекс в me.inventory['weapons']
+# Игроку её назначают через player.policy, злодею - через villain.policy (для злодея enemies - это [игрок]).
+#
+# RandomPolicy - случайные допустимые действия, GreedyPolicy - лучшее действие по ожидаемому урону за ход,
+# ExpectimaxPolicy - поиск на несколько ходов вперёд по боевым формулам с кэшем позиций.
+# `python ai.py` - сравнение политик на врагах из create_rooms и статистика кэша.
+
+import math
+import sys
+import time
+
+import RPG
+from RPG import element_modifier
+
+
+def attack_outcomes(attacker, defender):
+    """
+    Исходы одной атаки attacker по defender по формулам RPG.py: [(вероятность, урон), ...] -
+    уклонение (0), обычный удар и крит (урон x2). Комбо (повторная атака после попадания) учтено
+    как ожидаемый множитель урона; контратаки и горение модель не учитывает.
+    """
+    crit, combo, _, _ = attacker.combat_stats
+    dodge = defender.combat_stats[2]
+    damage = attacker.base_damage * element_modifier(attacker.element, defender.element)
+    combo_factor = 1 / (1 - (1 - dodge) * combo)  # Серия комбо - геометрический ряд
+    return [
+        (dodge, 0),
+        ((1 - dodge) * (1 - crit), round(damage * combo_factor)),
+        ((1 - dodge) * crit, round(2 * damage * combo_factor)),
+    ]
+
+
+def expected_damage(attacker, defender):
+    """
+    Ожидаемый урон одного хода attacker по defender (среднее по attack_outcomes).
+    """
+    return sum(p * damage for p, damage in attack_outcomes(attacker, defender))
+
+
+def _best_weapon(me):
+    weapons = me.inventory['weapons']
+    return max(range(len(weapons)), key=lambda i: weapons[i].damage)
+
+
+def _can_upgrade(me):
+    # Есть ли в инвентаре (только у игрока) оружие сильнее текущего
+    inventory = getattr(me, 'inventory', None)
+    return inventory is not None and max(w.damage for w in inventory['weapons']) > me.weapon.damage
+
+
+# Класс RandomPolicy (Случайные допустимые действия)
+class RandomPolicy:
+    """
+    Случайное действие из допустимых и случайная цель. Случайность берётся из RPG.rng,
+    поэтому засеянные симуляции с этой политикой воспроизводимы.
+    """
+
+    def choose_action(self, me, enemies):
+        actions = ['attack', 'shield']
+        if me.potions > 0 and me.health < me.max_health:
+            actions.append('heal')
+        if len(getattr(me, 'inventory', {}).get('weapons', ())) > 1:
+            actions.append('equip')
+        return RPG.rng.choice(actions)
+
+    def choose_target(self, me, enemies, shield=False):
+        return RPG.rng.randrange(len(enemies))
+
+    def choose_weapon(self, me):
+        return RPG.rng.randrange(len(me.inventory['weapons']))
+
+
+# Класс GreedyPolicy (Лучшее действие на один ход вперёд)
+class GreedyPolicy:
+    """
+    Жадная политика по ожидаемому урону:
+    - пьёт зелье, если ожидаемый урон от врагов за danger ходов убьёт;
+    - берёт оружие сильнее текущего, если оно есть в инвентаре;
+    - бьёт врага, убийство которого быстрее всего снижает входящий урон
+      (ожидаемый урон врага / число ударов, нужных, чтобы его убить).
+    """
+
+    def __init__(self, danger=2):
+        """
+        - danger: На сколько ходов вперёд оценивается опасность (сколько ходов нужно продержаться).
+        """
+        self.danger = danger
+
+    def choose_action(self, me, enemies):
+        if me.potions > 0:
+            incoming = sum(expected_damage(enemy, me) for enemy in enemies)
+            if me.health <= incoming * self.danger and me.health <= me.max_health // 2:
+                return 'heal'
+        if _can_upgrade(me):
+            return 'equip'
+        return 'attack'
+
+    def choose_target(self, me, enemies, shield=False):
+        best, best_score = 0, None
+        for k, enemy in enumerate(enemies):
+            hit = expected_damage(me, enemy)
+            hits_to_kill = math.ceil(enemy.health / hit) if hit > 0 else math.inf
+            score = (expected_damage(enemy, me) / hits_to_kill, -enemy.health)
+            if best_score is None or score > best_score:
+                best, best_score = k, score
+        return best
+
+    def choose_weapon(self, me):
+        return _best_weapon(me)
+
+
+LOSS = -2.0  # Оценка поражения; победа - 2 + оставшееся здоровье с зельями в долях max_health
+WIN = 2.0
+TEMPO = 1e-6  # Штраф за зелье при равной оценке
+
+
+# Класс ExpectimaxPolicy (Поиск на несколько ходов вперёд)
+class ExpectimaxPolicy:
+    """
+    Поиск expectimax по упрощённой модели боя: ход - атака одной из целей (узел случая по
+    attack_outcomes) или зелье, затем ответ врагов (узел случая по их суммарному урону). На глубине depth
+    позиция оценивается "гонкой": сколько ходов нужно, чтобы убить цели, и сколько - чтобы
+    враги убили нас (с учётом оставшихся зелий).
+
+    В модель попадают max_targets самых выгодных целей (по оценке GreedyPolicy); остальные живые
+    враги учитываются только своим ожидаемым уроном. Позиции (здоровье, зелья, здоровье целей)
+    кэшируются: одна и та же позиция, достигнутая разными путями, и позиции следующих ходов
+    того же боя не пересчитываются.
+    """
+
+    def __init__(self, depth=3, max_targets=4, spread=3, cache_size=200000):
+        """
+        - depth: Глубина поиска в ходах.
+        - max_targets: Сколько целей рассматривается в групповом бою.
+        - spread: На сколько исходов сжимается распределение урона врагов за ход.
+        - cache_size: Предел числа позиций в кэше (при превышении кэш очищается).
+        """
+        self.depth = depth
+        self.max_targets = max_targets
+        self.spread = spread
+        self.cache_size = cache_size
+        self.greedy = GreedyPolicy()
+        self.tables = {}  # Сигнатура боя (характеристики сторон) -> {позиция: оценка}
+        self.entries = 0
+        self.hits = 0
+        self.misses = 0
+        self.planned = None  # Цель, выбранная вместе с действием (номер в enemies)
+
+    def choose_action(self, me, enemies):
+        self.planned = None
+        if _can_upgrade(me):
+            return 'equip'
+        if not len(enemies):
+            return 'attack'
+        action, target = self.search(me, enemies)
+        self.planned = target
+        return action
+
+    def choose_target(self, me, enemies, shield=False):
+        target, self.planned = self.planned, None
+        if target is None or target >= len(enemies):
+            return self.greedy.choose_target(me, enemies, shield)
+        return target
+
+    def choose_weapon(self, me):
+        return _best_weapon(me)
+
+    def _candidates(self, me, enemies):
+        # Номера max_targets лучших целей по оценке GreedyPolicy и суммарный ожидаемый урон остальных врагов
+        scored = []
+        rest = 0.0
+        for k, enemy in enumerate(enemies):
+            hit = expected_damage(me, enemy)
+            incoming = expected_damage(enemy, me)
+            hits_to_kill = math.ceil(enemy.health / hit) if hit > 0 else math.inf
+            scored.append(((incoming / hits_to_kill, -enemy.health), k, incoming))
+            rest += incoming
+        scored.sort(reverse=True)
+        chosen = scored[:self.max_targets]
+        rest -= sum(incoming for _, _, incoming in chosen)
+        return [k for _, k, _ in chosen], rest
+
+    def search(self, me, enemies):
+        """
+        Лучшее действие: ('attack', номер цели в enemies) или ('heal', None).
+        """
+        indices, rest = self._candidates(me, enemies)
+        targets = [enemies[k] for k in indices]
+        outcomes = tuple(tuple(attack_outcomes(me, enemy)) for enemy in targets)
+        threats = tuple(tuple(attack_outcomes(enemy, me)) for enemy in targets)
+        heal = int(me.max_health * 0.5)
+        signature = (me.max_health, heal, round(rest), outcomes, threats)
+        table = self.tables.get(signature)
+        if table is None:
+            table = self.tables[signature] = {}
+        hits = tuple(sum(p * damage for p, damage in outcome) for outcome in outcomes)
+        incoming = tuple(sum(p * damage for p, damage in threat) for threat in threats)
+        model = (table, outcomes, incoming, round(rest), heal, me.max_health, hits, threats, {})
+
+        state = (me.health, me.potions, tuple(enemy.health for enemy in targets))
+        best, best_value = ('attack', indices[0]), None
+        for action, k in self._moves(state):
+            value = self._act(model, state, action, k, self.depth)
+            if action == 'heal':
+                # Зелье сейчас и зелье позже часто равноценны в модели; позже - лучше (бой может кончиться раньше)
+                value -= TEMPO
+            if best_value is None or value > best_value:
+                best, best_value = (action, indices[k] if k is not None else None), value
+        if self.entries > self.cache_size:
+            self.tables.clear()
+            self.entries = 0
+        return best
+
+    @staticmethod
+    def _moves(state):
+        health, potions, hps = state
+        moves = [('attack', k) for k, hp in enumerate(hps) if hp > 0]
+        if potions > 0:
+            moves.append(('heal', None))
+        return moves
+
+    def _act(self, model, state, action, k, depth):
+        # Ожидаемая оценка хода action (по цели k) из позиции state
+        table, outcomes, incoming, rest, heal, max_health, hits, threats, responses = model
+        health, potions, hps = state
+        if action == 'heal':
+            return self._respond(model, (min(health + heal, max_health), potions - 1, hps), depth)
+        value = 0.0
+        for p, damage in outcomes[k]:
+            if p:
+                after = hps[:k] + (max(hps[k] - damage, 0),) + hps[k + 1:]
+                value += p * self._respond(model, (health, potions, after), depth)
+        return value
+
+    def _respond(self, model, state, depth):
+        # Ответ живых врагов (узел случая по их суммарному урону) и оценка позиции на следующем ходу
+        table, outcomes, incoming, rest, heal, max_health, hits, threats, responses = model
+        health, potions, hps = state
+        if not any(hps) and not rest:
+            return WIN + (health + potions * heal) / max_health
+        alive = tuple(hp > 0 for hp in hps)
+        response = responses.get(alive)
+        if response is None:
+            response = responses[alive] = self._response(threats, alive, rest)
+        value = 0.0
+        for p, damage in response:
+            if health <= damage:
+                value += p * LOSS
+            else:
+                value += p * self._value(model, (health - damage, potions, hps), depth - 1)
+        return value
+
+    def _response(self, threats, alive, rest):
+        # Распределение суммарного урона живых целей (свёртка их attack_outcomes) плюс ожидаемый урон
+        # остальных врагов, сжатое до spread исходов (по группам равной вероятности - их средний урон)
+        distribution = {0: 1.0}
+        for threat, living in zip(threats, alive):
+            if living:
+                combined = {}
+                for total, p in distribution.items():
+                    for q, damage in threat:
+                        combined[total + damage] = combined.get(total + damage, 0.0) + p * q
+                distribution = combined
+        points = sorted(distribution.items())
+        compressed = []
+        share = 1.0 / self.spread
+        mass = weighted = 0.0
+        for damage, p in points:
+            mass += p
+            weighted += p * damage
+            if mass >= share - 1e-12:
+                compressed.append((mass, round(weighted / mass) + rest))
+                mass = weighted = 0.0
+        if mass > 1e-12:
+            compressed.append((mass, round(weighted / mass) + rest))
+        return compressed
+
+    def _value(self, model, state, depth):
+        table = model[0]
+        key = (depth, state)
+        value = table.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        health, potions, hps = state
+        if depth == 0:
+            value = self._estimate(model, state)
+        else:
+            value = max(self._act(model, state, action, k, depth) for action, k in self._moves(state))
+        table[key] = value
+        self.entries += 1
+        return value
+
+    @staticmethod
+    def _estimate(model, state):
+        # Оценка позиции "гонкой": за сколько ходов мы убьём цели и за сколько ходов убьют нас
+        # (здоровье плюс все зелья против ожидаемого урона врагов). Результат - от -1 до 1
+        table, outcomes, incoming, rest, heal, max_health, hits, threats, responses = model
+        health, potions, hps = state
+        to_kill = sum(hp / hit if hit else 1e9 for hp, hit in zip(hps, hits) if hp > 0)
+        damage = rest + sum(d for d, hp in zip(incoming, hps) if hp > 0)
+        if not damage:
+            return 1.0
+        to_die = (health + potions * heal) / damage
+        return (to_die - to_kill) / (to_die + to_kill)
+
+
+# Политики для сравнения: название -> фабрика
+POLICIES = {
+    'random': RandomPolicy,
+    'greedy': GreedyPolicy,
+    'expectimax': ExpectimaxPolicy,
+}
+
+
+def compare_policies(fights=300, seed=0):
+    """
+    Процент побед и средние ходы политик игрока против врагов из create_rooms (стартовый игрок);
+    в последней строке злодеи тоже играют жадно. Возвращает список строк.
+    """
+    from simulation import AggressivePolicy, run_batch
+    from text_adventure import create_rooms
+
+    encounters = {}
+    room = create_rooms()
+    seen = set()
+    stack = [room]
+    while stack:
+        room = stack.pop()
+        if id(room) in seen:
+            continue
+        seen.add(id(room))
+        if room.enemies:
+            encounters[room.name] = room.enemies
+        stack.extend(room.exits.values())
+
+    lines = []
+    players = dict(aggressive=AggressivePolicy, **POLICIES)
+    for name, enemies in encounters.items():
+        for policy_name, factory in players.items():
+            policy = factory()
+            start = time.perf_counter()
+            summary = run_batch(enemies, fights, seed, policy=policy).summary()
+            elapsed = time.perf_counter() - start
+            lines.append(f"{name:>18} {policy_name:>11}: побед {summary['win_rate']:6.1%}, "
+                         f"ходов {summary['turns']['mean']:5.1f}, {elapsed / fights * 1000:6.2f} мс/бой")
+        summary = run_batch(enemies, fights, seed, policy=ExpectimaxPolicy(), villain_policy=GreedyPolicy()).summary()
+        lines.append(f"{name:>18} {'expectimax':>11}: побед {summary['win_rate']:6.1%} против жадных злодеев")
+    return lines
+
+
+def cache_statistics(depth=4, fights=100, seed=0):
+    """
+    Работа кэша позиций ExpectimaxPolicy: боёв против трёх гоблинов-стражей при глубине depth.
+    Возвращает (попаданий, промахов, секунд).
+    """
+    from simulation import run_batch
+    guard = ("Гоблин", RPG.Weapon("Гоблинский топор", 15), 'neutral', 0, 2, 6, 1)
+    policy = ExpectimaxPolicy(depth=depth)
+    start = time.perf_counter()
+    run_batch([guard] * 3, fights, seed, policy=policy)
+    return policy.hits, policy.misses, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    fights = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    print("\n".join(compare_policies(fights)))
+    for depth in (2, 3, 4):
+        hits, misses, elapsed = cache_statistics(depth, fights // 3)
+        print(f"Глубина {depth}: позиций посчитано {misses}, из кэша {hits} "
+              f"({hits / max(hits + misses, 1):.0%}), {elapsed:.2f} с")
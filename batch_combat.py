@@ -0,0 +1,358 @@
+# batch_combat.py - Пакетный боевой движок для массового перебора характеристик
+#
+# Вместо объектов Character здесь хранится популяция боёв в виде "структуры массивов":
+# у каждого бойца есть индекс, а его здоровье, урон, шансы и т.д. лежат в отдельных списках.
+# Все бои популяции идут синхронно, раунд за раундом. Правила совпадают с Character.attack /
+# receive_damage / apply_status_effects / gain_experience и циклами simulate_battle /
+# simulate_group_battle (игрок действует как simulation.AggressivePolicy). Из статус-эффектов - только горение:
+# враги с оружием, у которого есть эффекты при попадании (loot.WEAPON_EFFECTS), не поддерживаются (ValueError).
+#
+# Каждый шаг раунда проходит по столбцам сразу для всех идущих боёв (маски, срезы hp[j::size], пакеты ударов),
+# но это чистый Python: столбцы обходятся генераторами списков, а не векторными инструкциями. Выигрыш - от того,
+# что нет вызовов и стеков на каждого бойца. Замер (сетка 512 точек x 200 боёв, см. __main__): против босса
+# ~1.35x к прежнему ядру с циклом по бойцам (3.0 с -> 2.25 с), против трёх гоблинов - не быстрее, чем
+# прежнее ядро; быстрее объектной боевой системы (simulation.run_batch) в ~3.5 раза.
+
+import math
+import random
+import time
+from itertools import compress
+
+from RPG import (Weapon, ATTACK, FINISH, BURN_EXP,
+                 crit_chance, combo_chance, dodge_chance, counter_chance, element_modifier)
+from loot import WEAPON_EFFECTS
+from simulation import BatchResult, FightResult, run_batch
+
+BURN_DAMAGE = 5  # Урон от горения за тик
+BURN_CHANCE = 0.2  # Шанс поджечь цель
+VILLAIN_HEAL_CHANCE = 0.1  # Шанс злодея выпить зелье вместо атаки
+UPGRADES = ["strength", "dexterity", "focus", "health"]
+COMPACT_SHARE = 0.5  # Доля законченных боёв в столбцах, после которой они убираются (сжатие)
+NO_TARGET = 1 << 62  # Ключ цели для мёртвого злодея
+
+
+# Класс Population (Популяция боёв)
+class Population:
+    def __init__(self, player_stats, enemies, weapon_damage=5, element='neutral', potions=3, heal_threshold=0.3):
+        """
+        Популяция одинаковых по составу врагов боёв.
+        - player_stats: Список кортежей (strength, dexterity, focus) - по одному бою на кортеж.
+        - enemies: Состав врагов в формате Room.enemies (имя, оружие, элемент, potions, strength, dexterity, focus).
+        - weapon_damage, element, potions: Оружие, элемент и зелья игрока (как у стартового игрока play_game()).
+        - heal_threshold: Порог лечения игрока (доля max_health), как в AggressivePolicy.
+        """
+        for name, weapon, *_ in enemies:
+            if weapon.name in WEAPON_EFFECTS:
+                raise ValueError(f"Пакетный движок не знает эффектов оружия: {name} ({weapon.name})")
+        self.fights = len(player_stats)
+        self.group = len(enemies) > 1
+        self.size = len(enemies) + 1  # Бойцов в одном бою: игрок и злодеи
+        self.heal_threshold = heal_threshold
+
+        self.hp = []
+        self.max_hp = []
+        self.weapon_damage = []
+        self.base = []
+        self.strength = []
+        self.dexterity = []
+        self.focus = []
+        self.element = []
+        self.potions = []
+        self.level = []
+        self.exp = []
+        self.burn1 = []  # Горение: наложения, которым остался 1 тик,
+        self.burn2 = []  # 2 тика
+        self.burn3 = []  # и 3 тика
+        for strength, dexterity, focus in player_stats:
+            self._add(weapon_damage, element, potions, strength, dexterity, focus)
+            for _, weapon, v_element, v_potions, v_strength, v_dexterity, v_focus in enemies:
+                self._add(weapon.damage, v_element, v_potions, v_strength, v_dexterity, v_focus)
+
+        self.crit = [crit_chance(f) for f in self.focus]
+        self.combo = [combo_chance(f) for f in self.focus]
+        self.dodge = [dodge_chance(d) for d in self.dexterity]
+        self.counter = [counter_chance(d) for d in self.dexterity]
+
+    def _add(self, weapon_damage, element, potions, strength, dexterity, focus):
+        self.hp.append(100 + strength * 10)
+        self.max_hp.append(100 + strength * 10)
+        self.weapon_damage.append(weapon_damage)
+        self.base.append(weapon_damage + strength * 2)
+        self.strength.append(strength)
+        self.dexterity.append(dexterity)
+        self.focus.append(focus)
+        self.element.append(element)
+        self.potions.append(potions)
+        self.level.append(1)
+        self.exp.append(0)
+        self.burn1.append(0)
+        self.burn2.append(0)
+        self.burn3.append(0)
+
+    def _columns(self):
+        # Все столбцы бойцов: при сжатии из них вместе убираются законченные бои
+        return (self.hp, self.max_hp, self.weapon_damage, self.base, self.strength, self.dexterity, self.focus,
+                self.element, self.potions, self.level, self.exp, self.burn1, self.burn2, self.burn3,
+                self.crit, self.combo, self.dodge, self.counter)
+
+    def run(self, seed=0, max_rounds=10000):
+        """
+        Проводит все бои популяции.
+        - seed: Зерно генератора (один поток случайных чисел на всю популяцию).
+        - max_rounds: Предохранитель от бесконечных боёв (недоигранный бой считается поражением).
+
+        Каждый шаг раунда (горение, выбор действий, удары, проверка конца боя) проходит по столбцам сразу
+        для всех идущих боёв; удары - пакетами пар (атакующий, цель), контратаки и комбо - пакетами поменьше.
+        Законченные бои отмечаются в маске live, а когда их набирается COMPACT_SHARE, убираются из столбцов.
+
+        Возвращает список FightResult - по одному на бой, в порядке player_stats.
+        """
+        rng = random.Random(seed)
+        rand = rng.random
+        hp, max_hp, base, potions = self.hp, self.max_hp, self.base, self.potions
+        burn1, burn2, burn3 = self.burn1, self.burn2, self.burn3
+        crit, combo, dodge, counter = self.crit, self.combo, self.dodge, self.counter
+        size, group, threshold = self.size, self.group, self.heal_threshold
+        gain = self._gain_experience
+        # Элементы одинаковы во всех боях популяции: модификатор урона зависит только от мест бойцов в бою
+        elements = self.element[:size]
+        modifiers = [[element_modifier(a, t) for t in elements] for a in elements]
+        n = self.fights  # Боёв в столбцах (включая законченные, ещё не убранные сжатием)
+        fight_ids = list(range(n))  # Номер боя в порядке player_stats для каждого боя в столбцах
+        turns = [0] * n
+        start_hp = hp[0::size]
+        start_exp = [self._total_exp(p) for p in range(0, n * size, size)]
+        live = [True] * n
+        results = [None] * n
+
+        def strike(attackers, targets, a_slot, t_slot):
+            # Шаги ATTACK, FINISH и BURN_EXP Character.attack для пакета: столбцы атакующих и целей с одними
+            # и теми же местами в бою. Контратаки и комбо - вложенные пакеты: в каждом бою они разбираются
+            # раньше его FINISH и BURN_EXP, как в стеке Character.attack
+            able = [hp[a] > 0 for a in attackers]
+            if not all(able):
+                attackers, targets = list(compress(attackers, able)), list(compress(targets, able))
+            modifier = modifiers[a_slot][t_slot]
+            if modifier == 1:  # Без элементов урон целый и так - без int() на каждый удар
+                damage = [base[a] * 2 if rand() < crit[a] else base[a] for a in attackers]
+            else:
+                damage = [int(base[a] * (2 if rand() < crit[a] else 1) * modifier) for a in attackers]
+            dodged = [hp[t] > 0 and rand() < dodge[t] for t in targets]
+            for t, d, miss in zip(targets, damage, dodged):
+                if not miss:
+                    h = hp[t]
+                    if h > 0:
+                        hp[t] = h - d if h > d else 0
+            if any(dodged):
+                countered = [miss and rand() < counter[t] for t, miss in zip(targets, dodged)]
+                if any(countered):
+                    strike(list(compress(targets, countered)), list(compress(attackers, countered)), t_slot, a_slot)
+            combos = [hp[t] > 0 and rand() < combo[a] for a, t in zip(attackers, targets)]
+            if any(combos):
+                strike(list(compress(attackers, combos)), list(compress(targets, combos)), a_slot, t_slot)
+            for t in compress(targets, [rand() < BURN_CHANCE for _ in targets]):
+                burn3[t] += 1
+            for a, t in zip(attackers, targets):
+                if hp[t] <= 0:
+                    gain(a, int((base[t] * max_hp[t]) ** 0.5), rng)
+
+        def heal(c):
+            hp[c] = min(hp[c] + int(max_hp[c] * 0.5), max_hp[c])
+            potions[c] -= 1
+
+        def record(f):
+            p = f * size
+            villains = range(p + 1, p + size)
+            results[fight_ids[f]] = FightResult(
+                won=hp[p] > 0 and not any(hp[v] > 0 for v in villains),
+                turns=turns[f],
+                damage_dealt=sum(max_hp[v] - hp[v] for v in villains),
+                damage_taken=start_hp[f] - hp[p],
+                exp=self._total_exp(p) - start_exp[f],
+            )
+
+        active = n
+        rounds = 0
+        while active and rounds < max_rounds:
+            total = n * size
+            # Горение: все наложения тикают одновременно, затем сдвигаются на тик вниз (мёртвые не горят -
+            # здоровье не уходит ниже 0). Тикают и законченные бои: их итог уже записан
+            if any(burn1) or any(burn2) or any(burn3):
+                ticks = [BURN_DAMAGE * (x + y + z) for x, y, z in zip(burn1, burn2, burn3)]
+                hp[:] = [h - d if h > d else 0 for h, d in zip(hp, ticks)]
+                burn1[:] = burn2
+                burn2[:] = burn3
+                burn3[:] = [0] * total
+            players = range(0, total, size)
+            if group:
+                # Групповой бой: раунд = ход игрока и ходы всех злодеев, живых после горения
+                turns = [t + 1 if now else t for t, now in zip(turns, live)]
+                alive = [None] + [[now and h > 0 for now, h in zip(live, hp[j::size])] for j in range(1, size)]
+                healing = [now and h > 0 and k > 0 and h < m * threshold
+                           for now, h, k, m in zip(live, hp[0::size], potions[0::size], max_hp[0::size])]
+                for p in compress(players, healing):
+                    heal(p)
+                # Цель игрока - живой злодей с наименьшим здоровьем (первый из равных): ключ здоровье * size + место,
+                # поэлементный минимум по местам злодеев (map(min, ...))
+                keys = map(min, *([h * size + j if h > 0 else NO_TARGET for h in hp[j::size]] for j in range(1, size)))
+                target = [key % size if key < NO_TARGET and now and h > 0 and not heals else 0
+                          for key, now, h, heals in zip(keys, live, hp[0::size], healing)]
+                for j in range(1, size):
+                    attackers = [p for p, slot in zip(players, target) if slot == j]
+                    if attackers:
+                        strike(attackers, [p + j for p in attackers], 0, j)
+                for j in range(1, size):
+                    villains = [p + j for p, now in zip(players, alive[j]) if now and hp[p + j] > 0]
+                    healing = [rand() < VILLAIN_HEAL_CHANCE and potions[v] > 0 for v in villains]
+                    for v in compress(villains, healing):
+                        heal(v)
+                    attackers = [v for v, heals in zip(villains, healing) if not heals]
+                    if attackers:
+                        strike(attackers, [v - j for v in attackers], j, 0)
+                ongoing = [h > 0 and v > 0 for h, v in zip(hp[0::size], map(max, *(hp[j::size] for j in range(1, size))))]
+            else:
+                # Одиночный бой: в раунде ходит только одна сторона (игрок на чётных ходах)
+                acting = [a > 0 and b > 0 for a, b in zip(hp[0::2], hp[1::2])]  # Законченные бои не проходят
+                if rounds % 2 == 0:
+                    turns = [t + 1 if now else t for t, now in zip(turns, acting)]
+                    healing = [now and k > 0 and h < m * threshold
+                               for now, h, k, m in zip(acting, hp[0::2], potions[0::2], max_hp[0::2])]
+                    for p in compress(players, healing):
+                        heal(p)
+                    attackers = [p for p, now, heals in zip(players, acting, healing) if now and not heals]
+                    strike(attackers, [p + 1 for p in attackers], 0, 1)
+                else:
+                    villains = [p + 1 for p in compress(players, acting)]
+                    healing = [rand() < VILLAIN_HEAL_CHANCE and potions[v] > 0 for v in villains]
+                    for v in compress(villains, healing):
+                        heal(v)
+                    attackers = [v for v, heals in zip(villains, healing) if not heals]
+                    strike(attackers, [v - 1 for v in attackers], 1, 0)
+                ongoing = [a > 0 and b > 0 for a, b in zip(hp[0::2], hp[1::2])]
+            rounds += 1
+
+            finished = [f for f, (was, now) in enumerate(zip(live, ongoing)) if was and not now]
+            if not finished:
+                continue
+            for f in finished:
+                record(f)
+            active -= len(finished)
+            live = [was and now for was, now in zip(live, ongoing)]
+            if active <= n * (1 - COMPACT_SHARE):
+                # Сжатие: законченные бои убираются из всех столбцов
+                keep = list(compress(range(n), live))
+                fighters = [f * size + j for f in keep for j in range(size)]
+                for column in self._columns():
+                    column[:] = [column[c] for c in fighters]
+                fight_ids = [fight_ids[f] for f in keep]
+                turns = [turns[f] for f in keep]
+                start_hp = [start_hp[f] for f in keep]
+                start_exp = [start_exp[f] for f in keep]
+                n = len(keep)
+                live = [True] * n
+
+        for f in compress(range(n), live):
+            record(f)  # Недоигранные за max_rounds раундов бои
+        return results
+
+    def _gain_experience(self, c, exp, rng):
+        """
+        Начисление опыта и повышение уровня (как Character.gain_experience).
+        """
+        self.exp[c] += exp
+        threshold = self.level[c] * 100
+        while self.exp[c] >= threshold:
+            self.level[c] += 1
+            self.exp[c] -= threshold
+            upgrade = rng.choice(UPGRADES)
+            if upgrade == "strength":
+                self.strength[c] += 1
+            elif upgrade == "dexterity":
+                self.dexterity[c] += 1
+                self.dodge[c] = dodge_chance(self.dexterity[c])
+                self.counter[c] = counter_chance(self.dexterity[c])
+            elif upgrade == "focus":
+                self.focus[c] += 1
+                self.crit[c] = crit_chance(self.focus[c])
+                self.combo[c] = combo_chance(self.focus[c])
+            elif upgrade == "health":
+                self.max_hp[c] += 10
+            self.max_hp[c] = max(self.max_hp[c], 100 + self.strength[c] * 10)
+            self.base[c] = self.weapon_damage[c] + self.strength[c] * 2
+            if self.hp[c] > 0:
+                self.hp[c] = min(self.hp[c] + 20, self.max_hp[c])
+            threshold = self.level[c] * 100
+
+    def _total_exp(self, c):
+        return sum(level * 100 for level in range(1, self.level[c])) + self.exp[c]
+
+
+def sweep(enemies, strengths, dexterities, foci, fights_per_point=1000, seed=0, **player):
+    """
+    Перебор сетки характеристик игрока против одного состава врагов.
+    - enemies: Состав врагов в формате Room.enemies.
+    - strengths, dexterities, foci: Значения силы, ловкости и фокуса для перебора.
+    - fights_per_point: Боёв на каждую точку сетки.
+    - player: Остальные параметры игрока для Population (weapon_damage, element, potions).
+
+    Возвращает словарь {(strength, dexterity, focus): BatchResult}.
+    """
+    grid = [(s, d, f) for s in strengths for d in dexterities for f in foci]
+    population = Population([point for point in grid for _ in range(fights_per_point)], enemies, **player)
+    results = population.run(seed)
+    sweep_results = {}
+    for i, point in enumerate(grid):
+        batch = BatchResult()
+        for result in results[i * fights_per_point:(i + 1) * fights_per_point]:
+            batch.add(result)
+        sweep_results[point] = batch
+    return sweep_results
+
+
+def cross_check(enemies, fights=20000, seed=0, sigmas=4.0):
+    """
+    Сверка пакетного движка с объектной боевой системой (simulation.run_batch) на стартовом игроке.
+    Процент побед и средний урон должны совпадать в пределах sigmas стандартных ошибок.
+
+    Возвращает словарь с обеими оценками и флагом ok.
+    """
+    reference = run_batch(enemies, fights, seed=seed).summary()
+    batch = BatchResult()
+    for result in Population([(5, 5, 5)] * fights, enemies).run(seed):
+        batch.add(result)
+    kernel = batch.summary()
+
+    p = (reference['win_rate'] + kernel['win_rate']) / 2
+    win_tolerance = sigmas * math.sqrt(2 * p * (1 - p) / fights) + 1e-9
+    mc_damage, kernel_damage = reference['damage_dealt']['mean'], kernel['damage_dealt']['mean']
+    damage_tolerance = sigmas * math.sqrt(2 / fights) * max(1.0, _stdev(batch.damage_dealt))
+    return {
+        'reference_win_rate': reference['win_rate'],
+        'kernel_win_rate': kernel['win_rate'],
+        'reference_damage': mc_damage,
+        'kernel_damage': kernel_damage,
+        'ok': abs(reference['win_rate'] - kernel['win_rate']) <= win_tolerance
+              and abs(mc_damage - kernel_damage) <= damage_tolerance,
+    }
+
+
+def _stdev(values):
+    mean = sum(values) / len(values)
+    return math.sqrt(sum((v - mean) ** 2 for v in values) / len(values))
+
+
+if __name__ == "__main__":
+    goblin_axe = Weapon("Гоблинский топор", 15)
+    boss_hammer = Weapon("Молот босса", 30)
+    goblin = ("Гоблин", goblin_axe, 'neutral', 0, 3, 1, 5)
+    goblin_trio = [("Гоблин", goblin_axe, 'neutral', 0, 2, 6, 1)] * 3
+    boss = ("Главный Босс", boss_hammer, 'fire', 2, 8, 4, 7)
+
+    for name, enemies in (("Гоблин", [goblin]), ("Три гоблина", goblin_trio), ("Босс", [boss])):
+        print(name, cross_check(enemies, fights=20000, seed=1))
+
+    start = time.perf_counter()
+    grid = sweep([boss], range(3, 11), range(3, 11), range(3, 11), fights_per_point=200, seed=7)
+    elapsed = time.perf_counter() - start
+    best = max(grid, key=lambda point: grid[point].win_rate)
+    print(f"Сетка {len(grid)} точек x 200 боёв против босса за {elapsed:.2f} с, лучшая точка {best}: {grid[best].win_rate:.2%}")
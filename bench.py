@@ -0,0 +1,348 @@
+# bench.py - Замеры производительности боевой системы
+#
+# Горячие места RPG.py под фиксированными зёрнами, без вывода и задержек (simulation.headless):
+# атака, получение урона, статус-эффекты, длинные цепочки повышения уровня, бой один на один,
+# большой групповой бой и лут. Итог - JSON; сравнение с сохранённым базовым файлом отмечает регрессии.
+#
+#   python bench.py --output bench_baseline.json    - замерить и сохранить базу (в репозитории - bench_baseline.json)
+#   python bench.py --baseline [base.json]          - замерить и сравнить с базой (по умолчанию bench_baseline.json)
+#   python bench.py --baseline --strict             - то же, но код выхода 1 при регрессии (для CI на одной машине)
+#   python bench.py --quick --only attack,group_500 - быстрый прогон выбранных замеров
+#
+# Кроме скорости каждый замер считает контрольную сумму (урон, ходы, уровни...). При тех же зёрнах
+# она меняется, только если изменились правила боя, - сравнение сообщает и об этом.
+# Скорость сравнивается не в абсолютных оп/с, а в долях калибровочного цикла, который идёт рядом
+# с каждым замером в том же процессе: база с одной машины годится для другой и для загруженной.
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+import RPG
+from RPG import Character, Weapon, Player, Villain, simulate_battle, simulate_group_battle
+from combat_log import CounterSink
+from effects import Effects
+from simulation import AggressivePolicy, headless, simulate_fight
+
+SEED = 12345
+TOLERANCE = 0.25  # Допустимое замедление относительно базы (доля, после поправки на калибровку)
+CALIBRATION = 200000  # Шагов калибровочного цикла (см. _calibration)
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')  # База в репозитории
+
+
+def _hero(strength=5, dexterity=5, focus=5):
+    return Player("Герой", Weapon("Меч", 20), 'neutral', 3, strength, dexterity, focus)
+
+
+def _dummy():
+    # Злодей, который почти не умирает: на нём меряются атаки
+    return Villain("Манекен", Weapon("Палка", 5), 'neutral', 0, 200, 5, 5)
+
+
+def bench_attack(n):
+    """
+    n атак героя по манекену (с уклонениями, контратаками, комбо и горением).
+    Контрольная сумма - урон, нанесённый манекену.
+    """
+    hero, dummy = _hero(focus=8), _dummy()
+    total = 0
+    for _ in range(n):
+        before = dummy.health
+        hero.attack(dummy)
+        total += before - dummy.health
+        dummy.health = dummy.max_health
+        dummy.status_effects.clear()
+        if hero.status == "dead":
+            hero.status, hero.health = "alive", hero.max_health
+            Character.alive_count += 1
+        hero.health = hero.max_health
+    return n, total
+
+
+def bench_receive_damage(n):
+    """
+    n ударов по манекену через receive_damage. Контрольная сумма - полученный урон.
+    """
+    hero, dummy = _hero(), _dummy()
+    total = 0
+    for _ in range(n):
+        dummy.receive_damage(10, hero)
+        total += dummy.max_health - dummy.health
+        dummy.health = dummy.max_health
+        dummy.status_effects.clear()
+        hero.health = hero.max_health
+    return n, total
+
+
+def bench_status_effects(n):
+    """
+    n применений статус-эффектов к персонажам с тремя наложениями горения.
+    Контрольная сумма - урон от горения.
+    """
+    villains = [_dummy() for _ in range(100)]
+    total = 0
+    for i in range(n):
+        villain = villains[i % 100]
+        if not villain.status_effects:
+            villain.status_effects = Effects([['burn', 3], ['burn', 2], ['burn', 1]])
+            total += villain.max_health - villain.health
+            villain.health = villain.max_health
+        villain.apply_status_effects()
+    return n, total
+
+
+def bench_level_chain(n):
+    """
+    Цепочка из n повышений уровня за одно начисление опыта (порог уровня level * 100).
+    Контрольная сумма - итоговые сила + ловкость + фокус + max_health.
+    """
+    hero = _hero()
+    hero.gain_experience(50 * n * (n + 1))
+    return hero.level - 1, hero.strength + hero.dexterity + hero.focus + hero.max_health
+
+
+def bench_single_fight(n):
+    """
+    n боёв один на один против гоблина (simulation.simulate_fight, зерно боя - его номер).
+    Контрольная сумма - число побед и ходов.
+    """
+    goblin = [("Гоблин", Weapon("Гоблинский топор", 15), 'neutral', 0, 3, 1, 5)]
+    total = 0
+    for i in range(n):
+        result = simulate_fight(goblin, f"{SEED}:{i}")
+        total += result.won * 1000 + result.turns
+    return n, total
+
+
+def bench_loot(n):
+    """
+    Лут с n побеждённых злодеев: Battle.finish на бою со 100 мёртвыми злодеями.
+    Контрольная сумма - урон выпавшего оружия и найденные зелья.
+    """
+    hero = _hero()
+    dead = [_dummy() for _ in range(100)]
+    for villain in dead:
+        villain.death()
+    total = 0
+    for _ in range(n // 100):
+        hero.potions = 0
+        battle = RPG.Battle(hero, dead, group=False)
+        battle.finish()
+        total += sum(weapon.damage for weapon in battle.drops) + hero.potions
+    return n // 100 * 100, total
+
+
+def _group_fights(villains, n):
+    # n групповых боёв: герой против villains крыс. Герой убивает крысу за удар и почти бессмертен,
+    # поэтому бой идёт до последней крысы. Операции - ходы злодеев, контрольная сумма - потерянное здоровье
+    turns = 0
+    lost = 0
+    counter = CounterSink()
+    RPG.sinks = [counter]
+    for _ in range(n):
+        hero = _hero(strength=50)
+        hero.max_health = hero.health = 10 ** 9
+        hero.policy = AggressivePolicy(heal_threshold=0.0)
+        rats = [Villain("Крыса", Weapon("Зубы", 1), 'neutral', 0, 0, 5, 1) for _ in range(villains)]
+        simulate_group_battle(hero, rats)
+        lost += hero.max_health - hero.health
+    return counter.counts['attack'], lost
+
+
+def bench_group_100(n):
+    """
+    n групповых боёв 1 против 100 злодеев. Операции - атаки.
+    """
+    return _group_fights(100, n)
+
+
+def bench_group_500(n):
+    """
+    n групповых боёв 1 против 500 злодеев. Операции - атаки.
+    """
+    return _group_fights(500, n)
+
+
+def bench_duel_chain(n):
+    """
+    n боёв simulate_battle подряд одним героем: опыт и уровни копятся от боя к бою.
+    Контрольная сумма - уровень героя и число побед.
+    """
+    hero = _hero()
+    hero.policy = AggressivePolicy()
+    wins = 0
+    for _ in range(n):
+        hero.health, hero.potions = hero.max_health, 3
+        if hero.status == "dead":
+            hero.status = "alive"
+            Character.alive_count += 1
+        hero.status_effects.clear()
+        wins += simulate_battle(hero, Villain("Гоблин", Weapon("Гоблинский топор", 15), 'neutral', 0, 3, 1, 5))
+    return n, hero.level * 100000 + wins
+
+
+def _calibration(n):
+    # Калибровка: обычный питоновский код без игры (вызовы, словари, арифметика, random).
+    # Идёт рядом с каждым замером в том же процессе; замер в долях калибровки почти не зависит
+    # от машины и от того, насколько она сейчас загружена
+    rng = random.Random(SEED)
+    counts = {}
+    total = 0
+    for i in range(n):
+        key = i & 255
+        counts[key] = counts.get(key, 0) + 1
+        total += int(rng.random() * 10) + len(str(key))
+    return n, total
+
+
+def _timed(func, size):
+    # Один прогон func(size) с зерна SEED, без вывода и сборщика мусора. Возвращает (секунд, операций, контрольная сумма)
+    saved_rng, alive_count = RPG.rng, Character.alive_count
+    RPG.rng = random.Random(SEED)
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with headless():
+            start = time.perf_counter()
+            ops, checksum = func(size)
+            elapsed = time.perf_counter() - start
+    finally:
+        if gc_enabled:
+            gc.enable()
+        RPG.rng, Character.alive_count = saved_rng, alive_count
+    return elapsed, ops, checksum
+
+
+# Замеры: название -> (функция, размер, размер в быстром режиме)
+BENCHMARKS = {
+    'attack': (bench_attack, 50000, 5000),
+    'receive_damage': (bench_receive_damage, 100000, 10000),
+    'status_effects': (bench_status_effects, 100000, 10000),
+    'level_chain': (bench_level_chain, 30000, 3000),
+    'single_fight': (bench_single_fight, 2000, 200),
+    'duel_chain': (bench_duel_chain, 3000, 300),
+    'group_100': (bench_group_100, 50, 5),
+    'group_500': (bench_group_500, 10, 1),
+    'loot': (bench_loot, 200000, 20000),
+}
+
+
+def run_benchmark(name, quick=False, repeat=5):
+    """
+    Запускает один замер repeat раз (лучшее время), перед каждым прогоном - калибровочный цикл.
+    Каждый прогон начинается с того же зерна, без вывода и задержек; сборщик мусора на время
+    замера выключен (как в timeit).
+    Возвращает {'ops', 'seconds', 'ops_per_second', 'checksum', 'calibration'} (calibration - лучшее время
+    калибровочного цикла рядом с этим замером, секунд).
+    """
+    func, size, quick_size = BENCHMARKS[name]
+    best = calibration = None
+    for _ in range(repeat):
+        calibration_seconds = _timed(_calibration, CALIBRATION)[0]
+        elapsed, ops, checksum = _timed(func, quick_size if quick else size)
+        best = elapsed if best is None else min(best, elapsed)
+        calibration = calibration_seconds if calibration is None else min(calibration, calibration_seconds)
+    return {'ops': ops, 'seconds': best, 'ops_per_second': ops / best, 'checksum': checksum,
+            'calibration': calibration}
+
+
+def run_suite(names=None, quick=False, repeat=5):
+    """
+    Все (или выбранные) замеры. Возвращает словарь для JSON: {'meta': {...}, 'results': {название: ...}}.
+    У каждого результата relative - скорость в долях скорости калибровочного цикла (лучшее время калибровки
+    за весь прогон: одна мерка на все замеры); её и сравнивает compare.
+    """
+    suite = {
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'quick': quick,
+            'repeat': repeat,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': {name: run_benchmark(name, quick, repeat) for name in names or BENCHMARKS},
+    }
+    calibration = min(result['calibration'] for result in suite['results'].values())
+    for result in suite['results'].values():
+        result['relative'] = result['ops_per_second'] * calibration / CALIBRATION
+    return suite
+
+
+def load_baseline(path=BASELINE):
+    """
+    База из JSON-файла (по умолчанию - bench_baseline.json из репозитория).
+    """
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare(current, baseline=None, tolerance=TOLERANCE):
+    """
+    Сравнивает результаты с базой (словарь run_suite или None - bench_baseline.json из репозитория).
+    Возвращает список строк отчёта и список регрессий (замеров, которые медленнее базы больше чем на tolerance).
+    Скорости сравниваются в долях калибровочного цикла (relative), если они есть и в базе, и в замере:
+    так база с одной машины годится на другой, а фоновая нагрузка сказывается на обоих одинаково.
+    Изменившаяся контрольная сумма отмечается отдельно: значит, изменилось поведение боя.
+    """
+    if baseline is None:
+        baseline = load_baseline()
+    report = []
+    regressions = []
+    if current['meta'].get('quick') != baseline['meta'].get('quick'):
+        report.append("Внимание: база и замер сделаны в разных режимах (--quick)")
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            report.append(f"{name:>15}: {result['ops_per_second']:12.0f} оп/с (нет в базе)")
+            continue
+        key, unit = ('relative', "калибровки") if 'relative' in result and 'relative' in base else ('ops_per_second', "оп/с")
+        ratio = result[key] / base[key]
+        mark = ""
+        if ratio < 1 - tolerance:
+            mark = "  РЕГРЕССИЯ"
+            regressions.append(name)
+        if result['checksum'] != base['checksum']:
+            mark += "  поведение изменилось (контрольная сумма)"
+        report.append(f"{name:>15}: {result['ops_per_second']:12.0f} оп/с, {result[key]:10.4g} {unit}, "
+                      f"база {base[key]:10.4g}, {ratio:6.2f}x{mark}")
+    return report, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры производительности боевой системы")
+    parser.add_argument('--only', help="Замеры через запятую: " + ", ".join(BENCHMARKS))
+    parser.add_argument('--quick', action='store_true', help="Уменьшенные размеры")
+    parser.add_argument('--repeat', type=int, default=5, help="Повторов каждого замера (берётся лучший)")
+    parser.add_argument('--output', help="Сохранить результаты в JSON-файл")
+    parser.add_argument('--baseline', nargs='?', const=BASELINE,
+                        help="Сравнить с базовым JSON-файлом (без имени - с bench_baseline.json)")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help="Допустимое замедление (доля)")
+    parser.add_argument('--strict', action='store_true', help="Код выхода 1 при регрессии (без него - только отчёт)")
+    args = parser.parse_args(argv)
+
+    names = args.only.split(',') if args.only else None
+    for name in names or []:
+        if name not in BENCHMARKS:
+            parser.error(f"неизвестный замер {name!r}")
+    current = run_suite(names, args.quick, args.repeat)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        report, regressions = compare(current, load_baseline(args.baseline), args.tolerance)
+        print("\n".join(report))
+        return 1 if regressions and args.strict else 0
+
+    print(json.dumps(current, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+# combat_log.py - События боя и их получатели (sinks)
+#
+# Боевая система не печатает сама: каждое событие (атака, уклонение, урон, смерть...)
+# передаётся всем подключённым получателям. Консоль - лишь один из них.
+
+import json
+import sys
+import time
+from collections import Counter
+from itertools import islice
+
+
+# Класс CombatEvent (Событие боя)
+class CombatEvent:
+    """
+    Событие боя: что произошло (kind), с кем (actor) и по отношению к кому (target).
+    Виды событий и их текст в консоли - см. MESSAGES. Событие 'text' - просто текст игры (detail), без actor.
+    - value: Числовое значение (урон, опыт, лечение, новый уровень...).
+    - detail: Уточнение (крит для 'attack', улучшенная характеристика для 'level_up', список врагов для 'turn').
+    """
+    __slots__ = ('kind', 'actor', 'target', 'value', 'detail')
+
+    def __init__(self, kind, actor, target=None, value=None, detail=None):
+        self.kind = kind
+        self.actor = actor
+        self.target = target
+        self.value = value
+        self.detail = detail
+
+    def __repr__(self):
+        actor = self.actor.name if self.actor is not None else None
+        return f"CombatEvent({self.kind!r}, {actor!r}, value={self.value!r})"
+
+
+UPGRADE_MESSAGES = {
+    "strength": "Сила увеличена!",
+    "dexterity": "Ловкость увеличена!",
+    "focus": "Фокус увеличен!",
+    "health": "Максимальное здоровье увеличено!",
+}
+
+
+ROSTER_PAGE = 10  # Сколько врагов показывать в списке; об остальных - только их число
+
+
+def _roster(villains):
+    # Первая страница живых врагов с номерами для выбора цели
+    roster = ', '.join(f"{i + 1}. {v.name} (HP: {v.health}/{v.max_health})"
+                       for i, v in enumerate(islice(villains, ROSTER_PAGE)))
+    if len(villains) > ROSTER_PAGE:
+        roster += f" ... и ещё {len(villains) - ROSTER_PAGE} (всего {len(villains)})"
+    return roster or 'Нет врагов'
+
+
+def _names(villains):
+    names = ', '.join(v.name for v in islice(villains, ROSTER_PAGE))
+    if len(villains) > ROSTER_PAGE:
+        names += f" и ещё {len(villains) - ROSTER_PAGE}"
+    return names
+
+
+# Почему персонаж пропускает ход (событие 'held', detail - блокирующий эффект)
+HELD_REASONS = {'freeze': "заморожен", 'stun': "оглушён"}
+
+
+# Текст событий для консоли
+MESSAGES = {
+    'text': lambda e: e.detail,
+    'battle_start': lambda e: (f"\nНачинается групповой бой: {e.actor.name} vs {_names(e.detail)}"
+                               if e.detail is not None else f"\nНачинается бой: {e.actor.name} vs {e.target.name}"),
+    'turn': lambda e: (f"\nВаш ход ({e.actor.name}): Здоровье {e.actor.health}/{e.actor.max_health}, Зелий: {e.actor.potions}"
+                       + (f"\nЖивые враги: {_roster(e.detail)}" if e.detail is not None else "")),
+    'skip': lambda e: "Неверный выбор, пропуск хода.",
+    'shield': lambda e: f"{e.actor.name} активирует щит! Ловкость повышена на {e.value} на этот ход.",
+    'cant_attack': lambda e: f"{e.actor.name} мёртв и не может атаковать.",
+    'attack': lambda e: (f"{e.actor.name} атакует {e.target.name} оружием {e.actor.weapon.name} на {e.value} урона"
+                         f"{' (крит!)' if e.detail else ''}."),
+    'dodge': lambda e: f"{e.actor.name} уклоняется от атаки!",
+    'counter': lambda e: f"{e.actor.name} проводит контратаку!",
+    'damage': lambda e: f"{e.actor.name} получает {e.value} урона. Здоровье: {e.actor.health}/{e.actor.max_health}.",
+    'combo': lambda e: f"{e.actor.name} проводит комбо-атаку!",
+    'burn': lambda e: f"{e.target.name} горит!",
+    'burn_tick': lambda e: (f"{e.actor.name} получает {e.value} урона от горения! "
+                            f"Здоровье: {e.actor.health}/{e.actor.max_health}"),
+    'burn_end': lambda e: f"{e.actor.name} больше не горит.",
+    'poison': lambda e: f"{e.target.name} отравлен!",
+    'poison_tick': lambda e: (f"{e.actor.name} получает {e.value} урона от яда! "
+                              f"Здоровье: {e.actor.health}/{e.actor.max_health}"),
+    'poison_end': lambda e: f"{e.actor.name} больше не отравлен.",
+    'regen': lambda e: f"{e.target.name} восстанавливается!",
+    'regen_tick': lambda e: (f"{e.actor.name} восстанавливает {e.value} здоровья. "
+                             f"Здоровье: {e.actor.health}/{e.actor.max_health}"),
+    'regen_end': lambda e: f"{e.actor.name} больше не восстанавливается.",
+    'freeze': lambda e: f"{e.target.name} заморожен!",
+    'freeze_end': lambda e: f"{e.actor.name} оттаивает.",
+    'stun': lambda e: f"{e.target.name} оглушён!",
+    'stun_end': lambda e: f"{e.actor.name} приходит в себя.",
+    'held': lambda e: f"{e.actor.name} пропускает ход ({HELD_REASONS.get(e.detail, e.detail)}).",
+    'death': lambda e: f"{e.actor.name} погибает!",
+    'exp': lambda e: f"{e.actor.name} получает {e.value} опыта. Текущий опыт: {e.actor.experience}.",
+    'level_up': lambda e: f"{e.actor.name} повышает уровень до {e.value}!\n{UPGRADE_MESSAGES[e.detail]}",
+    'heal': lambda e: (f"{e.actor.name} использует зелье и восстанавливает {e.value} здоровья. "
+                       f"Зелий осталось: {e.actor.potions}."),
+    'heal_failed': lambda e: f"{e.actor.name} не может использовать зелье (нет зелий или мёртв).",
+    'weapon_found': lambda e: f"Вы нашли {e.detail.name}! Добавлено в инвентарь.",
+    'equip': lambda e: f"{e.actor.name} экипирует {e.detail.name}.",
+    'equip_failed': lambda e: "Неверный выбор, оружие не изменено.",
+    'potion_found': lambda e: f"{e.actor.name} находит зелье! Зелий теперь: {e.value}",
+}
+
+# События, после которых консоль делает паузу для "анимации"
+ANIMATED = frozenset(['shield', 'attack', 'dodge', 'counter', 'damage', 'combo', 'burn_tick', 'poison_tick',
+                     'regen_tick', 'held', 'exp', 'level_up', 'heal'])
+
+
+def format_event(event):
+    """
+    Текст события для человека.
+    """
+    return MESSAGES[event.kind](event)
+
+
+# Класс ConsoleSink (Вывод в консоль с "анимацией")
+class ConsoleSink:
+    def __init__(self, delay=0.5, stream=None):
+        """
+        - delay: Задержка после анимируемых событий в секундах (0 - без задержек).
+        - stream: Куда писать (по умолчанию sys.stdout).
+        """
+        self.delay = delay
+        self.stream = stream
+
+    def handle(self, event):
+        print(format_event(event), file=self.stream or sys.stdout)
+        if self.delay and event.kind in ANIMATED:
+            time.sleep(self.delay)
+
+
+# Класс NullSink (Ничего не делает - для симуляций)
+class NullSink:
+    def handle(self, event):
+        pass
+
+
+# Класс JsonlSink (Буферизованный журнал событий в формате JSON Lines)
+class JsonlSink:
+    """
+    Пишет по одной JSON-строке на событие: для повторов и аналитики.
+    Строки копятся в буфере и сбрасываются в файл пачками.
+    """
+
+    def __init__(self, file, buffer_size=1000):
+        """
+        - file: Путь к файлу или открытый текстовый файл.
+        - buffer_size: Сколько строк копить перед записью.
+        """
+        self._own = isinstance(file, str)
+        self.file = open(file, 'a', encoding='utf-8') if self._own else file
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.seq = 0
+
+    def handle(self, event):
+        self.buffer.append(json.dumps(event_record(event, self.seq), ensure_ascii=False))
+        self.seq += 1
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.file.write('\n'.join(self.buffer) + '\n')
+            self.buffer.clear()
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        if self._own:
+            self.file.close()
+
+
+def event_record(event, seq=None):
+    """
+    Событие в виде словаря из простых типов (для JSON).
+    """
+    detail = event.detail
+    if isinstance(detail, list):
+        detail = [v.name for v in detail]
+    elif detail is not None and not isinstance(detail, (bool, int, float, str)):
+        # Оружие - по названию; живые враги группового боя (RPG.AliveView) - их числом, без перечисления
+        detail = detail.name if hasattr(detail, 'name') else len(detail)
+    return {
+        'seq': seq,
+        'kind': event.kind,
+        'actor': event.actor.name if event.actor is not None else None,
+        'target': event.target.name if event.target is not None else None,
+        'value': event.value,
+        'detail': detail,
+        'health': event.actor.health if event.actor is not None else None,
+    }
+
+
+# Класс CounterSink (Счётчики событий)
+class CounterSink:
+    def __init__(self):
+        self.counts = Counter()  # Количество событий по видам
+        self.totals = Counter()  # Сумма value по видам (урон, опыт, лечение...)
+
+    def handle(self, event):
+        self.counts[event.kind] += 1
+        if isinstance(event.value, int):
+            self.totals[event.kind] += event.value
@@ -0,0 +1,207 @@
+# compact.py - Компактное хранение большого числа злодеев
+#
+# Числовые коды статуса (Status) и элемента (element_code) - формат хранения VillainPool, и только его:
+# Character по-прежнему хранит status и element строками, а коды переводятся в строки и обратно
+# при villain() и store(). Боевая система, снимки и журнал боя о кодах не знают.
+
+import tracemalloc
+from array import array
+from enum import IntEnum
+from types import SimpleNamespace
+
+import RPG
+from RPG import Character, Weapon, Villain
+from effects import BURN, Effects
+
+
+# Статус персонажа в виде числа (в столбце VillainPool.status)
+class Status(IntEnum):
+    ALIVE = 0
+    DEAD = 1
+
+
+STATUS_NAMES = {Status.ALIVE: "alive", Status.DEAD: "dead"}  # Код -> строковый статус Character.status
+
+# Реестр элементов: код элемента - его позиция в списке (сначала элементы из elements.json).
+# Неизвестные элементы добавляются в конец.
+ELEMENTS = list(RPG.ELEMENTS)
+_element_codes = {name: code for code, name in enumerate(ELEMENTS)}
+
+
+def element_code(name):
+    """
+    Числовой код элемента (неизвестный элемент регистрируется).
+    """
+    code = _element_codes.get(name)
+    if code is None:
+        code = _element_codes[name] = len(ELEMENTS)
+        ELEMENTS.append(name)
+    return code
+
+
+# Класс VillainPool (Пул злодеев в виде структуры массивов)
+class VillainPool:
+    """
+    Хранит злодеев не объектами, а столбцами: по одному array на каждую характеристику.
+    Имена и оружия интернируются (одинаковые хранятся один раз и адресуются индексом).
+    Горение хранится счётчиками наложений по числу оставшихся тиков (1, 2, 3) вместо списков ['burn', n];
+    остальные эффекты (яд, заморозка и т.п.) редки и хранятся отдельно: номер злодея -> [[эффект, тики], ...].
+    Объект Villain с теми же публичными атрибутами создаётся по требованию (villain) и сохраняется обратно (store).
+    """
+
+    def __init__(self):
+        self.names = []  # Интернированные имена
+        self.weapons = []  # Интернированные оружия
+        self._name_index = {}
+        self._weapon_index = {}
+
+        self.name = array('H')  # Индекс имени
+        self.weapon = array('H')  # Индекс оружия
+        self.element = array('B')  # Код элемента
+        self.status = array('B')  # Status
+        self.health = array('i')
+        self.max_health = array('i')
+        self.strength = array('H')
+        self.dexterity = array('H')
+        self.focus = array('H')
+        self.base_damage = array('i')
+        self.level = array('H')
+        self.experience = array('i')
+        self.potions = array('H')
+        self.burn = [array('H'), array('H'), array('H')]  # Наложения горения с 1, 2 и 3 оставшимися тиками
+        self.effects = {}  # Номер злодея -> прочие эффекты (кроме горения)
+
+    def __len__(self):
+        return len(self.health)
+
+    def _intern(self, value, values, index, key):
+        i = index.get(key)
+        if i is None:
+            i = index[key] = len(values)
+            values.append(value)
+        return i
+
+    def add(self, name, weapon, element='neutral', potions=0, strength=5, dexterity=5, focus=5):
+        """
+        Добавляет злодея (аргументы как у Villain). Возвращает его индекс в пуле.
+        """
+        self.name.append(self._intern(name, self.names, self._name_index, name))
+        self.weapon.append(self._intern(weapon, self.weapons, self._weapon_index, id(weapon)))
+        self.element.append(element_code(element))
+        self.status.append(Status.ALIVE)
+        self.max_health.append(100 + strength * 10)
+        self.health.append(100 + strength * 10)
+        self.strength.append(strength)
+        self.dexterity.append(dexterity)
+        self.focus.append(focus)
+        self.base_damage.append(weapon.damage + strength * 2)
+        self.level.append(1)
+        self.experience.append(0)
+        self.potions.append(potions)
+        for bucket in self.burn:
+            bucket.append(0)
+        return len(self) - 1
+
+    def extend(self, enemies):
+        """
+        Добавляет злодеев из кортежей в формате Room.enemies.
+        """
+        for enemy in enemies:
+            self.add(*enemy)
+
+    def is_alive(self, i):
+        return self.status[i] == Status.ALIVE
+
+    def villain(self, i):
+        """
+        Создаёт объект Villain с состоянием злодея номер i.
+        """
+        villain = Villain(self.names[self.name[i]], self.weapons[self.weapon[i]], ELEMENTS[self.element[i]],
+                          self.potions[i], self.strength[i], self.dexterity[i], self.focus[i])
+        villain.health = self.health[i]
+        villain.max_health = self.max_health[i]
+        villain.base_damage = self.base_damage[i]
+        villain.level = self.level[i]
+        villain.experience = self.experience[i]
+        villain.status_effects = Effects([['burn', ticks] for ticks in (1, 2, 3) for _ in range(self.burn[ticks - 1][i])]
+                                         + self.effects.get(i, []))
+        if self.status[i] == Status.DEAD:
+            villain.status = STATUS_NAMES[Status.DEAD]
+            Character.alive_count -= 1
+        return villain
+
+    def store(self, i, villain):
+        """
+        Записывает состояние объекта Villain обратно в пул под номером i.
+        """
+        self.name[i] = self._intern(villain.name, self.names, self._name_index, villain.name)
+        self.weapon[i] = self._intern(villain.weapon, self.weapons, self._weapon_index, id(villain.weapon))
+        self.element[i] = element_code(villain.element)
+        self.status[i] = Status.DEAD if villain.status == "dead" else Status.ALIVE
+        self.health[i] = villain.health
+        self.max_health[i] = villain.max_health
+        self.strength[i] = villain.strength
+        self.dexterity[i] = villain.dexterity
+        self.focus[i] = villain.focus
+        self.base_damage[i] = villain.base_damage
+        self.level[i] = villain.level
+        self.experience[i] = villain.experience
+        self.potions[i] = villain.potions
+        for bucket in self.burn:
+            bucket[i] = 0
+        for ticks, stacks in villain.status_effects.remaining('burn'):
+            if 1 <= ticks <= 3:
+                self.burn[ticks - 1][i] += stacks
+        effects = villain.status_effects
+        if effects.held or any(entry[0] is not BURN for entry in effects.entries):
+            self.effects[i] = [effect for effect in effects.state() if effect[0] != 'burn']
+        else:
+            self.effects.pop(i, None)
+
+
+def _dict_backed_villain(name, weapon, element='neutral', potions=0, strength=5, dexterity=5, focus=5):
+    # Злодей с теми же атрибутами в __dict__ - так хранились персонажи до перехода на __slots__
+    max_health = 100 + strength * 10
+    return SimpleNamespace(name=name, max_health=max_health, health=max_health, weapon=weapon, status="alive",
+                           strength=strength, dexterity=dexterity, focus=focus,
+                           base_damage=weapon.damage + strength * 2, level=1, experience=0, element=element,
+                           status_effects=[], potions=potions)
+
+
+def _measure(build, count):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    keep = build(count)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del keep
+    return (after - before) / count
+
+
+def memory_benchmark(count=100000):
+    """
+    Память на одного злодея (в байтах) при разных представлениях.
+    Возвращает словарь {представление: байт на злодея}.
+    """
+    axe = Weapon("Гоблинский топор", 15)
+    enemy = ("Гоблин", axe, 'neutral', 0, 3, 1, 5)
+    alive_count = Character.alive_count
+
+    def build_pool(n):
+        pool = VillainPool()
+        for _ in range(n):
+            pool.add(*enemy)
+        return pool
+
+    results = {
+        'dict': _measure(lambda n: [_dict_backed_villain(*enemy) for _ in range(n)], count),
+        'slots': _measure(lambda n: [Villain(*enemy) for _ in range(n)], count),
+        'pool': _measure(build_pool, count),
+    }
+    Character.alive_count = alive_count
+    return results
+
+
+if __name__ == "__main__":
+    for kind, size in memory_benchmark().items():
+        print(f"{kind:>6}: {size:7.1f} байт на злодея")
@@ -0,0 +1,283 @@
+# dungeon.py - Процедурное подземелье
+#
+# Бесконечная сетка комнат, которая строится по мере того, как игрок идёт по выходам.
+# Всё содержимое комнаты (описание, выходы, враги, лут, секретный выход) выводится из зерна
+# подземелья и координат комнаты, поэтому одно и то же зерно всегда даёт одну и ту же карту,
+# в каком бы порядке комнаты ни посещались. Нетронутые комнаты вытесняются из памяти (LRU)
+# и при возвращении строятся заново; комнаты, где что-то изменилось, остаются в памяти.
+#
+# Связность: каждая комната соединена с "родителем" - соседом на шаг ближе ко входу (0, 0),
+# так что до любой комнаты есть путь от входа. Остальные проходы между соседями открыты случайно.
+
+import hashlib
+import random
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict
+
+from loot import ENCOUNTER_TABLES, LOOT_TABLES
+from text_adventure import Room
+from world import Exits
+
+DIRECTIONS = {'север': (0, 1), 'юг': (0, -1), 'восток': (1, 0), 'запад': (-1, 0)}
+SECRET = 'секрет'
+
+MASK = (1 << 64) - 1
+COORD_BITS = 32
+LIMIT = 2 ** 31 - 1  # Координаты от -LIMIT до LIMIT
+MAX_LEVEL = 30  # Уровень злодеев и лута растёт на 1 каждые 5 шагов глубины, но не выше
+VERSION = 3  # Версия правил подземелья: растёт, когда то же зерно даёт другую игру (2 - лут боя по уровню комнаты,
+#   3 - эффекты оружия при попадании: яд, оглушение, заморозка, регенерация)
+
+ADJECTIVES = ["Сырой", "Тёмный", "Заброшенный", "Холодный", "Узкий", "Просторный", "Затхлый", "Гулкий"]
+PLACES = ["коридор", "зал", "склеп", "грот", "тоннель", "погреб", "проход", "чертог"]
+DETAILS = ["С потолка капает вода.", "На стенах - следы когтей.", "Пахнет дымом.", "Под ногами хрустят кости.",
+           "Где-то вдали слышны шаги.", "Факелы давно погасли.", "Пол покрыт мхом.", "Тишина давит на уши."]
+
+
+def _seed_int(seed):
+    # Зерно любого вида -> 64-битное число (одинаково во всех процессах, в отличие от hash())
+    return int.from_bytes(hashlib.sha256(str(seed).encode()).digest()[:8], 'little')
+
+
+def _mix(a, b):
+    # Перемешивание splitmix64: быстрый детерминированный хеш пары чисел
+    z = (a * 0x9E3779B97F4A7C15 + b + 0x632BE59BD9B4E5B9) & MASK
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK
+    return z ^ (z >> 31)
+
+
+def _zigzag(n):
+    return n * 2 if n >= 0 else -n * 2 - 1
+
+
+def _unzigzag(n):
+    return n >> 1 if not n & 1 else -(n >> 1) - 1
+
+
+def room_key(x, y):
+    """
+    Номер комнаты (Room.key) по координатам.
+    """
+    return _zigzag(x) << COORD_BITS | _zigzag(y)
+
+
+def room_coords(key):
+    """
+    Координаты комнаты по номеру.
+    """
+    return _unzigzag(key >> COORD_BITS), _unzigzag(key & ((1 << COORD_BITS) - 1))
+
+
+def _clamp(n):
+    return max(-LIMIT, min(LIMIT, n))
+
+
+def depth(x, y):
+    """
+    Глубина комнаты - число шагов от входа по кратчайшему пути через "родителей".
+    """
+    return abs(x) + abs(y)
+
+
+def _parent(x, y):
+    # Сосед на шаг ближе ко входу
+    if abs(x) >= abs(y) and x:
+        return x - (1 if x > 0 else -1), y
+    if y:
+        return x, y - (1 if y > 0 else -1)
+    return None
+
+
+# Класс Dungeon (Процедурное подземелье одной игры)
+class Dungeon:
+    """
+    Мир с тем же интерфейсом, что world.World (start_room, room(key)), но бесконечный.
+    Злодеи и лут берутся из таблиц loot.py и усиливаются с глубиной (таблицы интернируют злодеев и оружия).
+    """
+
+    def __init__(self, seed=0, loops=0.35, secret_chance=0.04, cache_size=4096, encounters=None, loot=None):
+        """
+        - seed: Зерно подземелья (любой объект со стабильным str()).
+        - loops: Вероятность лишнего прохода между соседями (кроме обязательного к "родителю").
+        - secret_chance: Вероятность секретного выхода из комнаты вглубь подземелья.
+        - cache_size: Сколько нетронутых комнат держать в памяти.
+        - encounters: Таблица встреч (loot.EncounterTable); по умолчанию - "dungeon" из loot.json.
+        - loot: Таблица лута комнат (loot.LootTable); по умолчанию - "dungeon" из loot.json.
+        """
+        self.seed = seed
+        self._seed = _seed_int(seed)
+        self.loops = loops
+        self.secret_chance = secret_chance
+        self.cache_size = cache_size
+        self.encounters = encounters or ENCOUNTER_TABLES['dungeon']
+        self.loot = loot or LOOT_TABLES['dungeon']
+        self.cache = OrderedDict()  # Нетронутые комнаты: номер -> Room (в порядке последнего обращения)
+        self.kept = {}  # Изменённые комнаты (враги побеждены, лут взят, отложенное сохранение): номер -> Room
+        self._counts = {}  # Сколько врагов и лута было в построенной комнате (по ним видно, менялась ли она)
+        self.generated = 0  # Сколько раз строились комнаты (включая повторные)
+
+    def start_room(self):
+        return self.room(room_key(0, 0))
+
+    def room(self, key):
+        """
+        Комната номер key (строится при обращении, если её нет в памяти).
+        """
+        room = self.kept.get(key)
+        if room is not None:
+            return room
+        cache = self.cache
+        room = cache.get(key)
+        if room is not None:
+            cache.move_to_end(key)
+            return room
+        room = cache[key] = self.generate(*room_coords(key))
+        if len(cache) > self.cache_size:
+            self._evict()
+        return room
+
+    def _evict(self):
+        old_key, old = self.cache.popitem(last=False)
+        enemies, loot = self._counts[old_key]
+        if old.saved is not None or len(old.enemies) != enemies or len(old.loot) != loot:
+            self.kept[old_key] = old  # Состояние изменилось - заново её не построить
+        del self._counts[old_key]
+
+    def _open(self, x, y, dx, dy):
+        # Открыт ли проход между (x, y) и соседом: одинаково с обеих сторон
+        nx, ny = x + dx, y + dy
+        if _parent(x, y) == (nx, ny) or _parent(nx, ny) == (x, y):
+            return True
+        a, b = room_key(x, y), room_key(nx, ny)
+        edge = _mix(_mix(self._seed, min(a, b)), max(a, b))
+        return edge < self.loops * MASK
+
+    def generate(self, x, y):
+        """
+        Строит комнату (x, y) заново из зерна подземелья.
+        """
+        self.generated += 1
+        key = room_key(x, y)
+        rng = random.Random(_mix(self._seed, key))
+        d = depth(x, y)
+        level = min(d // 5, MAX_LEVEL)
+
+        targets = {direction: room_key(x + dx, y + dy) for direction, (dx, dy) in DIRECTIONS.items()
+                   if self._open(x, y, dx, dy)}
+        enemies = []
+        loot = []
+        if d == 0:
+            name = "Вход в подземелье"
+            description = "Каменная лестница уходит вниз, в темноту. Дальше - только вглубь."
+        else:
+            name = f"{rng.choice(ADJECTIVES)} {rng.choice(PLACES)}"
+            description = rng.choice(DETAILS)
+            if rng.random() < min(0.8, 0.3 + d * 0.02):
+                enemies = self.encounters.draws(rng, rng.randint(1, min(4, 1 + d // 8)), d, level)
+            item, _ = self.loot.roll(rng, level)
+            if item is not None:
+                loot.append(item)
+            if d >= 3 and rng.random() < self.secret_chance:
+                # Секретный ход: на 5-15 комнат глубже в том же направлении
+                jump = rng.randint(5, 15)
+                targets[SECRET] = room_key(_clamp(x + jump * ((x > 0) - (x < 0))),
+                                           _clamp(y + jump * ((y > 0) - (y < 0))))
+        exits = [direction for direction in targets if direction != SECRET]
+        description += f" Выходы: {', '.join(exits)}." if exits else ""
+
+        room = Room(name, description, enemies, loot, Exits(self, targets), key=key, level=level)
+        self._counts[key] = (len(enemies), len(loot))
+        return room
+
+    def layout(self, x, y):
+        """
+        Описание комнаты без учёта её текущего состояния - для проверки воспроизводимости.
+        """
+        room = self.generate(x, y)
+        if room.key not in self.cache:  # У комнаты в кэше счётчик тот же (комната строится одинаково), он нужен _evict
+            del self._counts[room.key]
+        return (room.name, room.description, sorted(room.exits.targets.items()),
+                [(e[0], e[1].name, e[1].damage) + e[2:] for e in room.enemies],
+                [(w.name, w.damage) for w in room.loot])
+
+
+# Проверка и замеры
+def verify_reproducible(seed=0, radius=20, cache_size=64):
+    """
+    Одно зерно - одна карта: два подземелья с разным размером кэша и разным порядком обхода
+    дают одинаковые комнаты. Возвращает True при совпадении.
+    """
+    coords = [(x, y) for x in range(-radius, radius + 1) for y in range(-radius, radius + 1)]
+    first = Dungeon(seed)
+    second = Dungeon(seed, cache_size=cache_size)
+    forward = [first.layout(x, y) for x, y in coords]
+    backward = [second.layout(x, y) for x, y in reversed(coords)]
+    return forward == backward[::-1]
+
+
+def generation_benchmark(rooms=50000, seed=0):
+    """
+    Скорость построения комнат (комнат в секунду) на спирали вокруг входа.
+    """
+    dungeon = Dungeon(seed, cache_size=1024)
+    side = int(rooms ** 0.5) // 2 + 1
+    start = time.perf_counter()
+    count = 0
+    for x in range(-side, side + 1):
+        for y in range(-side, side + 1):
+            dungeon.room(room_key(x, y))
+            count += 1
+            if count >= rooms:
+                break
+        if count >= rooms:
+            break
+    return count / (time.perf_counter() - start)
+
+
+def _random_walk(dungeon, steps, seed):
+    rng = random.Random(seed)
+    room = dungeon.start_room()
+    deepest = 0
+    for _ in range(steps):
+        room = room.exits[rng.choice(list(room.exits))]
+        deepest = max(deepest, depth(*room_coords(room.key)))
+    return deepest
+
+
+def walk_benchmark(steps=(10000, 100000, 300000), seed=0, cache_size=4096):
+    """
+    Случайная прогулка по выходам подземелья разной длины: пик памяти (КБ, под tracemalloc)
+    и скорость (шагов и построенных комнат в секунду, отдельный прогон без tracemalloc).
+    Возвращает {шагов: {'peak_kb', 'max_depth', 'steps_per_second', 'rooms_per_second'}}.
+    """
+    results = {}
+    for count in steps:
+        dungeon = Dungeon(seed, cache_size=cache_size)
+        start = time.perf_counter()
+        deepest = _random_walk(dungeon, count, seed)
+        elapsed = time.perf_counter() - start
+
+        tracemalloc.start()
+        _random_walk(Dungeon(seed, cache_size=cache_size), count, seed)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results[count] = {'peak_kb': peak / 1024, 'max_depth': deepest, 'steps_per_second': count / elapsed,
+                          'rooms_per_second': dungeon.generated / elapsed}
+    return results
+
+
+if __name__ == "__main__":
+    # python dungeon.py          - проверка воспроизводимости и замеры
+    # python dungeon.py play [N] - сыграть в подземелье с зерном N
+    if len(sys.argv) > 1 and sys.argv[1] == 'play':
+        from text_adventure import play_game
+        play_game(Dungeon(sys.argv[2] if len(sys.argv) > 2 else 0).start_room())
+    else:
+        print("Одно зерно - одна карта:", verify_reproducible())
+        print(f"Построение: {generation_benchmark():.0f} комнат в секунду")
+        for count, result in walk_benchmark().items():
+            print(f"Прогулка {count:>7} шагов: пик памяти {result['peak_kb']:6.0f} КБ, глубина до {result['max_depth']}, "
+                  f"{result['steps_per_second']:.0f} шагов/с, {result['rooms_per_second']:.0f} новых комнат/с")
@@ -0,0 +1,467 @@
+# effects.py - Статус-эффекты: виды эффектов, эффекты персонажа и планировщик тиков боя
+#
+# Эффект описывается видом (EffectType): урон или лечение за тик на одно наложение, длительность и
+# правило повторного наложения. Эффекты персонажа (Effects) хранятся не списком [имя, тики], а по виду:
+# число наложений и "лента" - счётчики наложений по оставшимся тикам, упакованные в одно целое число
+# (поле FIELD_BITS бит на тик). Повторные наложения сливаются в счётчики, тик - это урон за все наложения
+# сразу, одно событие и сдвиг ленты на поле; ни списков, ни удалений из них.
+# Блокирующие эффекты (заморозка, оглушение) не тикают: они лишают персонажа действий и расходуются
+# пропущенными действиями (Effects.hold).
+# Планировщик боя (EffectScheduler) тикает за один проход только тех участников, у кого есть тикающие
+# эффекты; персонажи без эффектов не просматриваются.
+#
+# Модуль не зависит от RPG: события передаются функцией emit (RPG.emit), которую передаёт вызывающий.
+
+FIELD_BITS = 32  # Бит на счётчик наложений с одним сроком в ленте эффекта
+FIELD_MASK = (1 << FIELD_BITS) - 1
+
+# Правила повторного наложения
+STACK = 'stack'  # Каждое наложение - отдельный стак со своим сроком (наложения с одним сроком сливаются)
+INTENSIFY = 'intensify'  # Ещё один стак (до max_stacks), срок всех стаков обновляется
+REFRESH = 'refresh'  # Один стак, срок обновляется
+IGNORE = 'ignore'  # Пока эффект действует, повторное наложение ничего не делает
+
+
+# Класс EffectType (Вид статус-эффекта)
+class EffectType:
+    __slots__ = ('name', 'duration', 'damage', 'stacking', 'max_stacks', 'blocking', 'step',
+                 'tick_event', 'end_event')
+
+    def __init__(self, name, duration, damage=0, stacking=STACK, max_stacks=None, blocking=False):
+        """
+        - name: Название (оно же вид события наложения).
+        - duration: Длительность в тиках; для блокирующих эффектов - в пропущенных действиях.
+        - damage: Урон за тик на одно наложение (отрицательный - лечение).
+        - stacking: Правило повторного наложения (STACK, INTENSIFY, REFRESH, IGNORE).
+        - max_stacks: Предел наложений для INTENSIFY.
+        - blocking: Эффект лишает персонажа действий (заморозка, оглушение); такие эффекты не тикают,
+          а расходуются пропущенными действиями (см. Effects.hold).
+        """
+        self.name = name
+        self.duration = duration
+        self.damage = damage
+        self.stacking = stacking
+        self.max_stacks = max_stacks
+        self.blocking = blocking
+        self.step = 1 << FIELD_BITS * (duration - 1)  # Новое наложение в ленте
+        self.tick_event = name + '_tick'
+        self.end_event = name + '_end'
+
+
+EFFECTS = {}  # Название -> EffectType
+
+
+def register_effect(effect):
+    """
+    Добавляет вид эффекта в EFFECTS. Возвращает его.
+    """
+    if effect.name in EFFECTS:
+        raise ValueError(f"статус-эффект уже есть: {effect.name!r}")
+    EFFECTS[effect.name] = effect
+    return effect
+
+
+# Известные эффекты. Горение: 5 урона за тик 3 тика, наложения независимы.
+BURN = register_effect(EffectType('burn', 3, damage=5))
+register_effect(EffectType('poison', 4, damage=3, stacking=INTENSIFY, max_stacks=5))
+register_effect(EffectType('regen', 3, damage=-8, stacking=REFRESH))
+register_effect(EffectType('freeze', 2, stacking=REFRESH, blocking=True))
+register_effect(EffectType('stun', 1, stacking=IGNORE, blocking=True))
+
+
+def effect_type(name):
+    """
+    Вид эффекта по названию (ValueError для неизвестного).
+    """
+    effect = EFFECTS.get(name)
+    if effect is None:
+        raise ValueError(f"неизвестный статус-эффект: {name!r}")
+    return effect
+
+
+# Класс Effects (Статус-эффекты персонажа)
+class Effects:
+    """
+    Эффекты одного персонажа: entries - по записи [вид, наложений, лента] на действующий тикающий вид эффекта.
+    Поле k ленты (биты k * FIELD_BITS ...) - сколько наложений истекает через k + 1 тиков.
+    held - блокирующие эффекты: вид -> сколько действий ещё пропустить.
+    Сохраняется и загружается в прежнем виде - списком [эффект, оставшиеся тики] на каждое наложение
+    (см. state), поэтому старые сохранения читаются без изменений.
+    """
+    __slots__ = ('entries', 'held', 'scheduler', 'slot')
+
+    def __init__(self, state=()):
+        """
+        - state: Эффекты в виде [[эффект, оставшиеся тики], ...] (как в state()).
+        """
+        self.entries = []
+        self.held = {}
+        self.scheduler = None  # Планировщик боя, в котором участвует персонаж, и номер персонажа в нём
+        self.slot = 0
+        for name, ticks in state:
+            effect = effect_type(name)
+            ticks = min(max(ticks, 1), effect.duration)
+            if effect.blocking:
+                self.held[effect] = max(self.held.get(effect, 0), ticks)
+            else:
+                self._put(effect, 1 << FIELD_BITS * (ticks - 1))
+
+    def __bool__(self):
+        return bool(self.entries or self.held)
+
+    def _put(self, effect, bit):
+        # Одно наложение: bit - его место в ленте
+        for entry in self.entries:
+            if entry[0] is effect:
+                entry[1] += 1
+                entry[2] += bit
+                break
+        else:
+            self.entries.append([effect, 1, bit])
+        if self.scheduler is not None:
+            self.scheduler.active.add(self.slot)
+
+    def stack(self, effect):
+        """
+        Ещё одно наложение эффекта (EffectType) на полную длительность. Возвращает True.
+        """
+        for entry in self.entries:  # То же, что _put: самый частый путь боя, без лишнего вызова
+            if entry[0] is effect:
+                entry[1] += 1
+                entry[2] += effect.step
+                break
+        else:
+            self.entries.append([effect, 1, effect.step])
+        if self.scheduler is not None:
+            self.scheduler.active.add(self.slot)
+        return True
+
+    def add(self, name):
+        """
+        Накладывает эффект по правилу его вида. Возвращает True, если эффект наложен
+        (False для IGNORE, пока эффект действует).
+        """
+        effect = effect_type(name)
+        stacking = effect.stacking
+        if effect.blocking:
+            held = self.held
+            if stacking is IGNORE and effect in held:
+                return False
+            held[effect] = effect.duration  # Срок обновляется (наложения не копятся)
+            return True
+        if stacking is STACK:
+            return self.stack(effect)
+        for entry in self.entries:
+            if entry[0] is effect:
+                if stacking is IGNORE:
+                    return False
+                count = entry[1] + 1 if stacking is INTENSIFY else 1
+                if effect.max_stacks and count > effect.max_stacks:
+                    count = effect.max_stacks
+                entry[1] = count
+                entry[2] = count * effect.step  # Все стаки истекают вместе, через duration тиков
+                return True
+        self.entries.append([effect, 1, effect.step])
+        if self.scheduler is not None:
+            self.scheduler.active.add(self.slot)
+        return True
+
+    def hold(self, character, emit):
+        """
+        Если персонаж скован блокирующими эффектами, тратит на них его действие:
+        каждый блокирующий эффект теряет одно действие. Возвращает True, если действие пропущено.
+        """
+        held = self.held
+        if not held:
+            return False
+        effects = list(held)
+        emit('held', character, detail=effects[0].name)
+        for effect in effects:
+            left = held[effect] - 1
+            if left:
+                held[effect] = left
+            else:
+                del held[effect]
+                emit(effect.end_event, character)
+        return True
+
+    def tick(self, character, emit):
+        """
+        Тик эффектов персонажа: урон и лечение всех тикающих эффектов, затем истечение сроков.
+        - character: Персонаж, которому принадлежат эффекты.
+        - emit: Функция событий боя (RPG.emit).
+        Возвращает список событий боя.
+        """
+        events = []
+        _tick(self, character, emit, events)
+        return events
+
+    def remaining(self, name):
+        """
+        Наложения эффекта по оставшимся тикам: отсортированный список (тиков, наложений).
+        """
+        effect = effect_type(name)
+        if effect.blocking:
+            return [(self.held[effect], 1)] if effect in self.held else []
+        for kind, _, timeline in self.entries:
+            if kind is effect:
+                return [(k + 1, timeline >> FIELD_BITS * k & FIELD_MASK) for k in range(effect.duration)
+                        if timeline >> FIELD_BITS * k & FIELD_MASK]
+        return []
+
+    def state(self):
+        """
+        Эффекты в виде [[эффект, оставшиеся тики], ...] - по записи на каждое наложение.
+        """
+        state = []
+        for effect, _, _ in self.entries:
+            for ticks, count in self.remaining(effect.name):
+                state.extend([effect.name, ticks] for _ in range(count))
+        state.extend([effect.name, left] for effect, left in self.held.items())
+        return state
+
+    def copy(self):
+        """
+        Копия эффектов (без привязки к планировщику боя).
+        """
+        effects = Effects()
+        effects.entries = [list(entry) for entry in self.entries]
+        effects.held = dict(self.held)
+        return effects
+
+    def clear(self):
+        if self.entries:
+            self.entries.clear()
+        if self.held:
+            self.held.clear()
+
+    def __repr__(self):
+        return f"Effects({self.state()!r})"
+
+
+def _tick(effects, character, emit, events):
+    # Тик эффектов одного персонажа; события дописываются в events. Возвращает True, если эффектов не осталось
+    entries = effects.entries
+    ended = False
+    for entry in entries:
+        effect, count, timeline = entry
+        damage = effect.damage * count
+        if damage >= 0:
+            character.health -= damage
+            events.append(emit(effect.tick_event, character, value=damage))
+        else:
+            healed = min(-damage, character.max_health - character.health)
+            character.health += healed
+            events.append(emit(effect.tick_event, character, value=healed))
+        entry[2] = timeline >> FIELD_BITS
+        gone = timeline & FIELD_MASK
+        if gone:
+            entry[1] = count - gone
+            ended |= count == gone
+    if ended:
+        for entry in entries:
+            if not entry[1]:
+                events.append(emit(entry[0].end_event, character))
+        entries[:] = [entry for entry in entries if entry[1]]
+    if character.health <= 0:
+        events.extend(character.death())
+    return not entries
+
+
+# Класс EffectScheduler (Планировщик статус-эффектов боя)
+class EffectScheduler:
+    """
+    Статус-эффекты всех участников боя. active - номера участников с тикающими эффектами:
+    наложение эффекта само добавляет персонажа (Effects.scheduler), а тик убирает тех,
+    у кого тикающих эффектов не осталось. Поэтому тик боя не просматривает персонажей без эффектов.
+    """
+
+    def __init__(self, characters):
+        """
+        - characters: Участники боя в порядке тиков (игрок, затем злодеи).
+        """
+        self.characters = characters
+        self.active = active = set()
+        slot = 0
+        for character in characters:
+            effects = character.status_effects
+            effects.scheduler = self
+            effects.slot = slot
+            if effects.entries:
+                active.add(slot)
+            slot += 1
+
+    def tick(self, emit):
+        """
+        Один тик эффектов всех участников по порядку. Возвращает список событий боя.
+        """
+        active = self.active
+        if not active:
+            return []
+        events = []
+        characters = self.characters
+        for slot in sorted(active):
+            character = characters[slot]
+            entries = character.status_effects.entries
+            if len(entries) == 1:  # Один вид эффекта - как _tick, без цикла и пересборки списка
+                entry = entries[0]
+                effect, count, timeline = entry
+                damage = effect.damage * count
+                if damage >= 0:
+                    character.health -= damage
+                    events.append(emit(effect.tick_event, character, value=damage))
+                else:
+                    healed = min(-damage, character.max_health - character.health)
+                    character.health += healed
+                    events.append(emit(effect.tick_event, character, value=healed))
+                gone = timeline & FIELD_MASK
+                if gone == count:
+                    events.append(emit(effect.end_event, character))
+                    entries.clear()
+                    active.discard(slot)
+                else:
+                    entry[1] = count - gone
+                    entry[2] = timeline >> FIELD_BITS
+                if character.health <= 0:
+                    events.extend(character.death())
+            elif _tick(character.status_effects, character, emit, events):
+                active.discard(slot)
+        return events
+
+    def close(self):
+        """
+        Отвязывает эффекты участников от планировщика (после боя).
+        """
+        for character in self.characters:
+            if character.status_effects.scheduler is self:
+                character.status_effects.scheduler = None
+        self.active.clear()
+
+
+def verify_rules():
+    """
+    Проверка правил наложения и тиков на одном персонаже без боя. Возвращает True, если всё сошлось.
+    """
+    from RPG import Villain, Weapon, Character
+    events = []
+
+    def emit(kind, actor, target=None, value=None, detail=None):
+        events.append((kind, value))
+        return kind
+
+    dummy = Villain("Манекен", Weapon("Палка", 1), 'neutral', 0, 100, 0, 0)
+    Character.alive_count -= 1
+    effects = dummy.status_effects
+    effects.add('burn')
+    effects.add('burn')
+    ok = effects.state() == [['burn', 3], ['burn', 3]]
+    health = dummy.health
+    effects.tick(dummy, emit)
+    effects.stack(BURN)
+    ok &= effects.state() == [['burn', 2], ['burn', 2], ['burn', 3]] and effects.remaining('burn') == [(2, 2), (3, 1)]
+    ok &= Effects(effects.state()).state() == effects.state() and effects.copy().state() == effects.state()
+    for _ in range(3):
+        effects.tick(dummy, emit)
+    ok &= not effects and dummy.health == health - 10 - 15 - 15 - 5
+    ok &= [value for kind, value in events if kind == 'burn_tick'] == [10, 15, 15, 5]
+    ok &= [kind for kind, _ in events if kind == 'burn_end'] == ['burn_end']
+
+    events.clear()
+    dummy.health -= 500  # Чтобы было что восстанавливать
+    for name in ('burn', 'burn', 'poison', 'poison', 'regen', 'regen', 'stun', 'stun', 'freeze'):
+        effects.add(name)
+    ok &= effects.state() == [['burn', 3], ['burn', 3], ['poison', 4], ['poison', 4], ['regen', 3],
+                              ['stun', 1], ['freeze', 2]]
+    ok &= Effects(effects.state()).state() == effects.state()
+    ok &= effects.hold(dummy, emit) and effects.hold(dummy, emit) and not effects.hold(dummy, emit)
+    for _ in range(6):
+        effects.add('poison')  # Не больше max_stacks, срок обновляется
+    ok &= effects.remaining('poison') == [(4, 5)]
+    health = dummy.health
+    effects.tick(dummy, emit)
+    ok &= dummy.health == health - 2 * 5 - 5 * 3 + 8
+    for _ in range(3):
+        effects.tick(dummy, emit)
+    ok &= not effects and dummy.health == health - 3 * (10 + 15 - 8) - 15
+    ok &= [kind for kind, _ in events if kind.endswith('_end')] == ['stun_end', 'freeze_end', 'burn_end',
+                                                                    'regen_end', 'poison_end']
+    return bool(ok)
+
+
+def _list_tick(character, effects, emit):
+    # Прежний Character.apply_status_effects: список ['burn', тики], событие на каждое наложение
+    events = []
+    expired = False
+    for effect in effects:
+        if effect[0] == 'burn':
+            character.health -= 5
+            events.append(emit('burn_tick', character, value=5))
+            effect[1] -= 1
+            if effect[1] <= 0:
+                events.append(emit('burn_end', character))
+                expired = True
+    if expired:
+        effects[:] = [effect for effect in effects if effect[0] != 'burn' or effect[1] > 0]
+    return events
+
+
+def tick_benchmark(characters=2000, burning=0.02, rounds=2000, seed=0):
+    """
+    Тики горения в групповом бою: прежний способ (список ['burn', тики] у каждого, множество горящих,
+    тик каждого по очереди) против EffectScheduler. Каждый ход доля burning участников загорается.
+    Возвращает {'list': секунд, 'scheduler': секунд, 'same': совпал ли итоговый урон}.
+    """
+    import random
+    import time
+    from RPG import Villain, Weapon, Character
+    from combat_log import CombatEvent
+
+    def emit(kind, actor, target=None, value=None, detail=None):
+        return CombatEvent(kind, actor, target, value, detail)  # Как RPG.emit без получателей
+
+    def crowd():
+        villains = [Villain("Гоблин", Weapon("Топор", 1), 'neutral', 0, 10 ** 6, 0, 0) for _ in range(characters)]
+        Character.alive_count -= characters
+        return villains
+
+    def ignite(rng):
+        return [rng.randrange(characters) for _ in range(max(1, int(characters * burning)))]
+
+    results = {}
+    villains = crowd()
+    lists = [[] for _ in villains]
+    on_fire = set()
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for i in ignite(rng):
+            lists[i].append(['burn', 3])
+            on_fire.add(i)
+        for i in sorted(on_fire):
+            _list_tick(villains[i], lists[i], emit)
+            if not lists[i]:
+                on_fire.discard(i)
+    results['list'] = time.perf_counter() - start
+    reference = [villain.health for villain in villains]
+
+    villains = crowd()
+    scheduler = EffectScheduler(villains)
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for i in ignite(rng):
+            villains[i].status_effects.stack(BURN)
+        scheduler.tick(emit)
+    results['scheduler'] = time.perf_counter() - start
+    results['same'] = [villain.health for villain in villains] == reference
+    return results
+
+
+if __name__ == "__main__":
+    import effects  # Те же виды эффектов, что у RPG (а не копии из __main__)
+    print("Правила наложения и тики эффектов:", "OK" if effects.verify_rules() else "ОШИБКА")
+    for share in (0.02, 0.1, 0.5, 2.0):
+        times = effects.tick_benchmark(burning=share, rounds=300)
+        print(f"2000 участников, наложений горения за ход: {share:.0%} от числа участников: списки {times['list']:.3f} с, "
+              f"планировщик {times['scheduler']:.3f} с ({times['list'] / times['scheduler']:.1f}x), "
+              f"урон совпал: {times['same']}")
@@ -0,0 +1,392 @@
+# loot.py - Таблицы лута и встреч
+#
+# Что выпадает из побеждённых злодеев и лежит в комнатах подземелья и какие злодеи встречаются на какой
+# глубине, задаётся в loot.json (как элементы - в elements.json), поэтому таблицы правятся без правки кода:
+#   {"max_level": ...,
+#    "rarities": {"ключ": {"growth": ...}},
+#    "loot": {"ключ": {"weapon": шанс оружия, "potion": шанс зелья, "damage_per_level": ...,
+#                      "items": [{"name": ..., "damage": урон или [от, до], "weight": ..., "rarity": ...}]}},
+#    "encounters": {"ключ": {"per_level": {"damage": ..., "potions": ..., "strength": ..., "dexterity": ..., "focus": ...},
+#                            "enemies": [{"name": ..., "weapon": ..., "damage": ..., "element": ..., "potions": ...,
+#                                         "strength": ..., "dexterity": ..., "focus": ...,
+#                                         "weight": ..., "rarity": ..., "min_depth": ...}]}},
+#    "weapon_effects": {"название оружия": [{"effect": статус-эффект, "chance": шанс при попадании,
+#                                            "self": накладывается ли на самого атакующего}]}}
+#
+# Редкость задаёт рост веса с уровнем: на уровне L вес предмета (или злодея) - weight * (1 + growth * L),
+# так что чем глубже, тем чаще редкие вещи и сильные злодеи. Урон оружия и характеристики злодеев
+# растут с уровнем на damage_per_level и per_level. Эффекты оружия (яд лука, оглушение меча и т.п.)
+# привязаны к названию оружия, а не к его урону, поэтому действуют на любом уровне.
+#
+# Выбор - по таблицам псевдонимов (метод Уолкера): одно число из генератора и два обращения к спискам
+# на бросок при любом размере таблицы. Таблица строится один раз на уровень (для встреч - на глубину и уровень)
+# и хранит готовые исходы: оружия интернированы, злодеи - кортежи в формате Room.enemies, поэтому бросок
+# ничего не создаёт.
+
+import json
+import os
+import random
+import time
+
+from effects import effect_type
+
+LOOT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'loot.json')
+MAX_LEVEL = 30  # Уровень таблиц по умолчанию не выше этого (в loot.json - max_level)
+VILLAIN_FIELDS = ('damage', 'potions', 'strength', 'dexterity', 'focus')  # Что растёт с уровнем злодея
+
+RARITIES = {}  # Редкость -> рост веса за уровень
+LOOT_TABLES = {}  # Ключ -> LootTable
+ENCOUNTER_TABLES = {}  # Ключ -> EncounterTable
+WEAPON_EFFECTS = {}  # Название оружия -> ((эффект, шанс, на себя), ...) - эффекты при попадании
+_ARMORY = {}  # Интернированные оружия: (название, урон) -> Weapon
+
+
+def weapon(name, damage):
+    """
+    Интернированное оружие: одна пара (name, damage) - один объект Weapon на все таблицы и игры.
+    """
+    key = (name, damage)
+    item = _ARMORY.get(key)
+    if item is None:
+        from RPG import Weapon  # RPG сам импортирует loot; оружия создаются при первом броске, когда оба модуля загружены
+        item = _ARMORY[key] = Weapon(name, damage)
+    return item
+
+
+# Класс AliasTable (Таблица псевдонимов для выбора с весами)
+class AliasTable:
+    """
+    Выбор исхода с весами за O(1): n ячеек, в каждой - свой исход и "псевдоним".
+    Число u = random() * n попадает в ячейку i = int(u) и выбирает её исход, если u < cut[i], иначе псевдоним.
+    """
+    __slots__ = ('size', 'first', 'second', 'cut')
+
+    def __init__(self, outcomes, weights):
+        """
+        - outcomes: Исходы.
+        - weights: Их веса (неотрицательные, сумма больше 0).
+        """
+        size = len(outcomes)
+        total = sum(weights)
+        if size != len(weights) or not size or total <= 0 or min(weights) < 0:
+            raise ValueError("нужны исходы и столько же неотрицательных весов с положительной суммой")
+        scaled = [w * size / total for w in weights]  # Средняя ячейка - 1
+        alias = list(range(size))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            alias[s] = l  # Недобор ячейки s покрывает исход l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        for i in small + large:  # Остатки - ошибки округления: ячейка целиком своя
+            scaled[i] = 1.0
+        self.size = size
+        self.first = list(outcomes)
+        self.second = [outcomes[a] for a in alias]
+        self.cut = [i + p for i, p in enumerate(scaled)]
+
+    def draw(self, rng):
+        """
+        Один исход (одно число из rng).
+        """
+        u = rng.random() * self.size
+        i = int(u)
+        return self.first[i] if u < self.cut[i] else self.second[i]
+
+    def draws(self, rng, count):
+        """
+        count исходов подряд - то же, что count вызовов draw, но без вызова метода на каждый.
+        """
+        random, size, first, second, cut = rng.random, self.size, self.first, self.second, self.cut
+        result = []
+        append = result.append
+        for _ in range(count):
+            u = random() * size
+            i = int(u)
+            append(first[i] if u < cut[i] else second[i])
+        return result
+
+    def probabilities(self):
+        """
+        Вероятности исходов, восстановленные из ячеек: {исход: вероятность} (для проверки).
+        """
+        result = {}
+        for i in range(self.size):
+            p = self.cut[i] - i
+            result[self.first[i]] = result.get(self.first[i], 0.0) + p / self.size
+            result[self.second[i]] = result.get(self.second[i], 0.0) + (1.0 - p) / self.size
+        return result
+
+
+def _growth(entry, where):
+    rarity = entry.get('rarity', 'common')
+    try:
+        return RARITIES[rarity]
+    except KeyError:
+        raise ValueError(f"{where}: неизвестная редкость {rarity!r}") from None
+
+
+# Класс LootTable (Лут: оружие и зелья)
+class LootTable:
+    """
+    Бросок лута: с шансом weapon - оружие из предметов (по весам с учётом редкости и уровня),
+    с шансом potion - зелье. Таблицы псевдонимов строятся при первом броске на уровне.
+    """
+
+    def __init__(self, data, where="лут", max_level=MAX_LEVEL):
+        """
+        - data: Описание таблицы из loot.json (см. заголовок модуля).
+        - where: Название таблицы для сообщений об ошибках.
+        - max_level: Уровни выше считаются этим уровнем.
+        """
+        self.weapon_chance = data.get('weapon', 0.0)
+        self.potion_chance = data.get('potion', 0.0)
+        self.damage_per_level = data.get('damage_per_level', 0)
+        self.max_level = max_level
+        self.items = []  # (название, урон от, урон до, вес, рост веса)
+        for item in data.get('items', []):
+            damage = item['damage']
+            low, high = damage if isinstance(damage, list) else (damage, damage)
+            if low > high:
+                raise ValueError(f"{where}: {item['name']}: урон от {low} больше, чем до {high}")
+            self.items.append((item['name'], low, high, item.get('weight', 1), _growth(item, f"{where}: {item['name']}")))
+        if self.weapon_chance and not self.items:
+            raise ValueError(f"{where}: шанс оружия без предметов")
+        self._levels = [None] * (max_level + 1)  # Уровень -> AliasTable
+
+    def weapons(self, level=0):
+        """
+        Таблица псевдонимов оружий уровня level. Каждый урон из диапазона предмета - отдельный исход.
+        """
+        level = min(max(level, 0), self.max_level)
+        table = self._levels[level]
+        if table is None:
+            outcomes, weights = [], []
+            bonus = self.damage_per_level * level
+            for name, low, high, weight, growth in self.items:
+                share = weight * (1.0 + growth * level) / (high - low + 1)
+                for damage in range(low, high + 1):
+                    outcomes.append(weapon(name, damage + bonus))
+                    weights.append(share)
+            table = self._levels[level] = AliasTable(outcomes, weights)
+        return table
+
+    def roll(self, rng, level=0):
+        """
+        Лут с одного злодея (или из одной комнаты) уровня level: (оружие или None, выпало ли зелье).
+        """
+        random = rng.random
+        item = None
+        if random() < self.weapon_chance:
+            table = self._levels[level] if 0 <= level <= self.max_level else None
+            if table is None:
+                table = self.weapons(level)
+            u = random() * table.size
+            i = int(u)
+            item = table.first[i] if u < table.cut[i] else table.second[i]
+        return item, random() < self.potion_chance
+
+    def roll_many(self, rng, count, level=0):
+        """
+        count бросков roll подряд (с теми же числами из rng) для симуляций:
+        (список выпавших оружий, число зелий).
+        """
+        random = rng.random
+        table = self.weapons(level)
+        size, first, second, cut = table.size, table.first, table.second, table.cut
+        weapon_chance, potion_chance = self.weapon_chance, self.potion_chance
+        weapons = []
+        potions = 0
+        for _ in range(count):
+            if random() < weapon_chance:
+                u = random() * size
+                i = int(u)
+                weapons.append(first[i] if u < cut[i] else second[i])
+            if random() < potion_chance:
+                potions += 1
+        return weapons, potions
+
+
+# Класс EncounterTable (Встречи: какие злодеи где встречаются)
+class EncounterTable:
+    """
+    Злодеи по весам с учётом редкости и уровня; злодей доступен с глубины min_depth.
+    Злодеи уровня level усилены на per_level за уровень и интернированы: (шаблон, уровень) - один кортеж.
+    """
+
+    def __init__(self, data, where="встречи", max_level=MAX_LEVEL):
+        """
+        - data: Описание таблицы из loot.json (см. заголовок модуля).
+        - where: Название таблицы для сообщений об ошибках.
+        - max_level: Уровни выше считаются этим уровнем.
+        """
+        self.per_level = [data.get('per_level', {}).get(field, 0) for field in VILLAIN_FIELDS]
+        self.max_level = max_level
+        self.enemies = []  # (имя, оружие, урон, элемент, зелья, сила, ловкость, фокус, вес, рост веса, глубина)
+        for enemy in data['enemies']:
+            self.enemies.append((enemy['name'], enemy['weapon'], enemy['damage'], enemy.get('element', 'neutral'),
+                                 enemy.get('potions', 0), enemy.get('strength', 5), enemy.get('dexterity', 5),
+                                 enemy.get('focus', 5), enemy.get('weight', 1),
+                                 _growth(enemy, f"{where}: {enemy['name']}"), enemy.get('min_depth', 0)))
+        if not self.enemies:
+            raise ValueError(f"{where}: нет злодеев")
+        self.deepest = max(enemy[-1] for enemy in self.enemies)  # Глубже состав уже не меняется
+        self._tables = {}  # (глубина, уровень) -> AliasTable или None (на этой глубине никого)
+        self._villains = {}  # (шаблон, уровень) -> кортеж в формате Room.enemies
+
+    def villain(self, template, level=0):
+        """
+        Злодей номер template, усиленный до уровня level, - кортеж в формате Room.enemies.
+        """
+        key = (template, level)
+        villain = self._villains.get(key)
+        if villain is None:
+            name, weapon_name, damage, element, *stats = self.enemies[template][:8]
+            damage, potions, strength, dexterity, focus = (int(value + per_level * level) for value, per_level
+                                                           in zip([damage] + stats, self.per_level))
+            title = f"{name} ур. {level + 1}" if level else name
+            villain = self._villains[key] = (title, weapon(weapon_name, damage), element, potions,
+                                             strength, dexterity, focus)
+        return villain
+
+    def table(self, depth=0, level=0):
+        """
+        Таблица псевдонимов злодеев глубины depth и уровня level (None, если на этой глубине никого нет).
+        """
+        key = (min(depth, self.deepest), min(max(level, 0), self.max_level))
+        if key not in self._tables:
+            depth, level = key
+            outcomes, weights = [], []
+            for template, enemy in enumerate(self.enemies):
+                if enemy[-1] <= depth:
+                    outcomes.append(self.villain(template, level))
+                    weights.append(enemy[-3] * (1.0 + enemy[-2] * level))
+            self._tables[key] = AliasTable(outcomes, weights) if outcomes else None
+        return self._tables[key]
+
+    def draws(self, rng, count, depth=0, level=0):
+        """
+        count злодеев для комнаты глубины depth и уровня level (список кортежей Room.enemies).
+        """
+        table = self.table(depth, level)
+        return table.draws(rng, count) if table is not None and count else []
+
+
+def _on_hit(row, where):
+    try:
+        effect = effect_type(row['effect']).name
+        chance = float(row['chance'])
+    except (KeyError, TypeError, ValueError) as error:
+        raise ValueError(f"{where}: {error}") from None
+    if not 0.0 <= chance <= 1.0:
+        raise ValueError(f"{where}: шанс {chance} вне [0, 1]")
+    return effect, chance, bool(row.get('self', False))
+
+
+def load_tables(path=LOOT_FILE):
+    """
+    Загружает редкости, таблицы лута и встреч и эффекты оружия из JSON-файла (формат - в заголовке модуля).
+    При ошибке в данных - ValueError с указанием места.
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    max_level = data.get('max_level', MAX_LEVEL)
+    RARITIES.clear()
+    for rarity, row in data.get('rarities', {'common': {}}).items():
+        RARITIES[rarity] = float(row.get('growth', 0.0))
+    LOOT_TABLES.clear()
+    for key, table in data.get('loot', {}).items():
+        LOOT_TABLES[key] = LootTable(table, f"лут {key}", max_level)
+    ENCOUNTER_TABLES.clear()
+    for key, table in data.get('encounters', {}).items():
+        ENCOUNTER_TABLES[key] = EncounterTable(table, f"встречи {key}", max_level)
+    WEAPON_EFFECTS.clear()
+    for name, rows in data.get('weapon_effects', {}).items():
+        WEAPON_EFFECTS[name] = tuple(_on_hit(row, f"эффекты оружия {name}") for row in rows)
+
+
+load_tables()
+
+
+# Проверка и замеры
+def verify_tables(draws=200000, seed=0):
+    """
+    Таблицы псевдонимов дают заданные вероятности (точно - по ячейкам, и по выборке - в пределах 5 стандартных ошибок),
+    roll_many совпадает с повторными roll, а одинаковые оружия - один объект.
+    Возвращает True, если всё сходится.
+    """
+    ok = True
+    for table in LOOT_TABLES.values():
+        for level in (0, table.max_level):
+            if not table.items:
+                continue
+            weights = {}
+            bonus = table.damage_per_level * level
+            for name, low, high, weight, growth in table.items:
+                for damage in range(low, high + 1):
+                    item = weapon(name, damage + bonus)
+                    weights[item] = weights.get(item, 0.0) + weight * (1.0 + growth * level) / (high - low + 1)
+            total = sum(weights.values())
+            alias = table.weapons(level)
+            exact = alias.probabilities()
+            ok &= all(abs(exact.get(item, 0.0) - w / total) < 1e-9 for item, w in weights.items())
+            counts = {}
+            for item in alias.draws(random.Random(seed), draws):
+                counts[item] = counts.get(item, 0) + 1
+            for item, w in weights.items():
+                p = w / total
+                ok &= abs(counts.get(item, 0) / draws - p) <= 5 * (p * (1 - p) / draws) ** 0.5 + 1e-12
+        one, many = random.Random(seed), random.Random(seed)
+        rolls = [table.roll(one, 3) for _ in range(1000)]
+        ok &= table.roll_many(many, 1000, 3) == ([w for w, _ in rolls if w is not None], sum(p for _, p in rolls))
+    for table in ENCOUNTER_TABLES.values():
+        villain = table.villain(0, 5)
+        ok &= villain is table.villain(0, 5) and villain[1] is weapon(villain[1].name, villain[1].damage)
+    return bool(ok)
+
+
+def drop_benchmark(drops=1000000, seed=0):
+    """
+    Лут с drops злодеев таблицей "battle": прежний код Battle.finish (random() < 0.25 - новый Weapon
+    со случайным названием и randint(10, 30), random() < 0.4 - зелье), roll в цикле и roll_many.
+    Возвращает {способ: секунды}.
+    """
+    from RPG import Weapon
+    table = LOOT_TABLES['battle']
+    results = {}
+
+    def inline():
+        rng = random.Random(seed)
+        weapons, potions = [], 0
+        for _ in range(drops):
+            if rng.random() < 0.25:
+                weapons.append(Weapon("Магический " + rng.choice(["меч", "топор", "кинжал"]), rng.randint(10, 30)))
+            if rng.random() < 0.4:
+                potions += 1
+        return weapons, potions
+
+    def rolls():
+        rng = random.Random(seed)
+        weapons, potions = [], 0
+        roll = table.roll
+        for _ in range(drops):
+            item, potion = roll(rng)
+            if item is not None:
+                weapons.append(item)
+            potions += potion
+        return weapons, potions
+
+    for name, run in (('inline', inline), ('roll', rolls), ('roll_many', lambda: table.roll_many(random.Random(seed), drops))):
+        start = time.perf_counter()
+        run()
+        results[name] = time.perf_counter() - start
+    return results
+
+
+if __name__ == "__main__":
+    print("Таблицы лута и встреч:", "OK" if verify_tables() else "ОШИБКА")
+    times = drop_benchmark()
+    print(f"1 000 000 бросков лута: прежний код {times['inline']:.2f} с, roll {times['roll']:.2f} с "
+          f"({times['inline'] / times['roll']:.1f}x), roll_many {times['roll_many']:.2f} с "
+          f"({times['inline'] / times['roll_many']:.1f}x)")
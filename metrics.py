@@ -0,0 +1,333 @@
+# metrics.py - Счётчики и замеры времени боевой системы и игровых сессий (по запросу)
+#
+# Выключено по умолчанию и тогда ничего не стоит: боевая система и игра не знают о замерах.
+# enable() подменяет RPG.emit и горячие методы (атака, урон, статус-эффекты, ходы, вход в комнату,
+# вывод в консоль...) обёртками, которые считают события и время вызовов; disable() возвращает оригиналы.
+#
+#   import metrics
+#   with metrics.instrumented() as m:
+#       play()
+#   print(metrics.report(m))
+#
+# Счётчики - по видам событий боя (attack, dodge, counter, combo, crit, burn_tick, heal, level_up,
+# battle_start...) и вызовам (room_enter). Время - гистограмма на функцию с корзинами по степеням двойки
+# в наносекундах. Время вложенных вызовов входит во время внешних (run_battle включает attack).
+# `python metrics.py` - сколько на самом деле стоят бой, print и паузы "анимации".
+
+import importlib
+import io
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import RPG
+from combat_log import ConsoleSink
+
+# Что замеряется: (модуль, класс или None - функция модуля, имя атрибута, счётчик вызовов или None).
+# Модули импортируются в enable(): import metrics не тянет за собой игру и сервер.
+TIMED = [
+    ('RPG', 'Character', 'attack', None),
+    ('RPG', 'Character', 'receive_damage', None),
+    ('RPG', 'EffectScheduler', 'tick', None),
+    ('RPG', 'Character', 'gain_experience', None),
+    ('RPG', 'Player', 'heal_self', None),
+    ('RPG', 'Villain', 'heal_self', None),
+    ('RPG', 'Battle', 'advance', None),
+    ('RPG', 'Battle', 'player_turn', None),
+    ('RPG', 'Battle', 'villain_turn', None),
+    ('RPG', None, 'run_battle', None),
+    ('text_adventure', 'Adventure', 'handle', None),
+    ('text_adventure', 'Adventure', 'enter_room', 'room_enter'),
+    ('combat_log', 'ConsoleSink', 'handle', None),
+    ('server', 'SessionSink', 'handle', None),
+    ('server', 'Session', 'handle', None),
+]
+
+current = None  # Включённые замеры (Metrics) или None
+
+
+# Класс Histogram (Гистограмма задержек)
+class Histogram:
+    """
+    Задержки одной функции. Корзина k - вызовы длительностью от 2**(k-1) до 2**k наносекунд:
+    номер корзины - bit_length() длительности, без поиска и сравнений.
+    """
+    __slots__ = ('buckets', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.buckets = [0] * 64
+        self.count = 0
+        self.total = 0  # Наносекунды
+        self.max = 0
+
+    def add(self, ns):
+        self.buckets[ns.bit_length()] += 1
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+
+    def percentile(self, p):
+        """
+        Верхняя граница корзины, в которую попадает p-й процентиль (в наносекундах).
+        """
+        rank = p / 100 * self.count
+        seen = 0
+        for k, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= rank:
+                return min(2 ** k, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            'calls': self.count,
+            'total_ms': self.total / 1e6,
+            'mean_us': self.total / self.count / 1e3 if self.count else 0.0,
+            'p50_us': self.percentile(50) / 1e3,
+            'p90_us': self.percentile(90) / 1e3,
+            'p99_us': self.percentile(99) / 1e3,
+            'max_us': self.max / 1e3,
+            'buckets': {2 ** k: n for k, n in enumerate(self.buckets) if n},  # Верхняя граница (нс) -> вызовов
+        }
+
+
+# Класс Metrics (Собранные счётчики и гистограммы)
+class Metrics:
+    def __init__(self):
+        self.counts = Counter()  # События и вызовы по видам
+        self.timers = {}  # Имя функции -> Histogram
+        self.started = time.time()
+
+    def timer(self, name):
+        histogram = self.timers.get(name)
+        if histogram is None:
+            histogram = self.timers[name] = Histogram()
+        return histogram
+
+    def reset(self):
+        self.counts.clear()
+        self.timers.clear()
+        self.started = time.time()
+
+    def snapshot(self):
+        """
+        Текущее состояние в виде словаря из простых типов (для JSON).
+        """
+        return {
+            'time': time.time(),
+            'uptime': time.time() - self.started,
+            'counters': dict(self.counts),
+            'timers': {name: histogram.summary() for name, histogram in sorted(self.timers.items())},
+        }
+
+
+def _count_event(counts, emit):
+    # Подмена RPG.emit: событие считается, затем передаётся получателям как обычно
+    def counted_emit(kind, actor, target=None, value=None, detail=None):
+        counts[kind] += 1
+        if kind == 'attack' and detail:
+            counts['crit'] += 1
+        return emit(kind, actor, target, value, detail)
+    return counted_emit
+
+
+def _timed(metrics, name, func, counter):
+    histogram = metrics.timer(name)
+    counts = metrics.counts
+    clock = time.perf_counter_ns
+
+    def timed(*args, **kwargs):
+        if counter:
+            counts[counter] += 1
+        start = clock()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            histogram.add(clock() - start)
+    timed.__name__ = func.__name__
+    timed.__doc__ = func.__doc__
+    timed.__wrapped__ = func
+    return timed
+
+
+_originals = []  # (владелец, имя, оригинал) - чтобы disable() вернул всё как было
+
+
+def enable(metrics=None):
+    """
+    Включает замеры. Повторный вызов без disable() возвращает уже включённые замеры.
+    - metrics: Куда собирать (по умолчанию - новый Metrics).
+    Возвращает Metrics.
+    """
+    global current
+    if current is not None:
+        return current
+    current = metrics or Metrics()
+    _originals.append((RPG, 'emit', RPG.emit))
+    RPG.emit = _count_event(current.counts, RPG.emit)
+    for module, cls, attr, counter in TIMED:
+        owner = importlib.import_module(module)
+        if cls is not None:
+            owner = getattr(owner, cls)
+        func = owner.__dict__[attr]
+        _originals.append((owner, attr, func))
+        name = f"{owner.__name__}.{attr}" if isinstance(owner, type) else attr
+        setattr(owner, attr, _timed(current, name, func, counter))
+    return current
+
+
+def disable():
+    """
+    Выключает замеры и возвращает оригинальные функции. Возвращает собранные Metrics (или None).
+    """
+    global current
+    while _originals:
+        owner, attr, func = _originals.pop()
+        setattr(owner, attr, func)
+    metrics, current = current, None
+    return metrics
+
+
+@contextmanager
+def instrumented(metrics=None):
+    """
+    Замеры на время блока with. Отдаёт Metrics.
+    """
+    metrics = enable(metrics)
+    try:
+        yield metrics
+    finally:
+        disable()
+
+
+def snapshot():
+    """
+    Состояние включённых замеров (см. Metrics.snapshot) или None, если замеры выключены.
+    """
+    return current.snapshot() if current is not None else None
+
+
+def report(metrics=None):
+    """
+    Текстовый отчёт: счётчики и таблица времени по функциям (по убыванию суммарного времени).
+    """
+    metrics = metrics or current
+    if metrics is None:
+        return "Замеры выключены."
+    lines = ["Счётчики:"]
+    for kind, n in metrics.counts.most_common():
+        lines.append(f"  {kind:>22}: {n}")
+    lines.append(f"{'Функция':>28} {'вызовов':>9} {'всего мс':>10} {'среднее мкс':>12} {'p50':>8} {'p99':>8} {'max':>10}")
+    timers = sorted(metrics.timers.items(), key=lambda item: item[1].total, reverse=True)
+    for name, histogram in timers:
+        if not histogram.count:
+            continue
+        s = histogram.summary()
+        lines.append(f"{name:>28} {s['calls']:>9} {s['total_ms']:>10.1f} {s['mean_us']:>12.2f} "
+                     f"{s['p50_us']:>8.1f} {s['p99_us']:>8.1f} {s['max_us']:>10.1f}")
+    return "\n".join(lines)
+
+
+# Класс Dumper (Периодическая выгрузка замеров)
+class Dumper:
+    """
+    Фоновый поток, который каждые interval секунд дописывает снимок замеров JSON-строкой в файл.
+    """
+
+    def __init__(self, file, interval=10.0, metrics=None):
+        """
+        - file: Путь к файлу или открытый текстовый файл.
+        - interval: Период выгрузки в секундах.
+        - metrics: Какие замеры выгружать (по умолчанию - включённые сейчас).
+        """
+        self._own = isinstance(file, str)
+        self.file = open(file, 'a', encoding='utf-8') if self._own else file
+        self.interval = interval
+        self.metrics = metrics
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-dump", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def dump(self):
+        metrics = self.metrics or current
+        if metrics is not None:
+            self.file.write(json.dumps(metrics.snapshot(), ensure_ascii=False) + '\n')
+            self.file.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.dump()
+
+    def stop(self):
+        """
+        Останавливает поток и делает последнюю выгрузку.
+        """
+        self._stop.set()
+        self._thread.join()
+        self.dump()
+        if self._own:
+            self.file.close()
+
+
+def _fights(n, sinks=()):
+    # n засеянных групповых боёв против трёх гоблинов с получателями событий sinks
+    from simulation import AggressivePolicy, default_player, headless
+    saved = RPG.rng
+    try:
+        with headless(sinks):
+            for i in range(n):
+                RPG.rng = random.Random(i)
+                player = default_player()
+                player.policy = AggressivePolicy()
+                goblins = [RPG.Villain("Гоблин", RPG.Weapon("Гоблинский топор", 15), 'neutral', 0, 3, 1, 5)
+                           for _ in range(3)]
+                RPG.simulate_group_battle(player, goblins)
+    finally:
+        RPG.rng = saved
+
+
+def overhead_benchmark(fights=300):
+    """
+    Цена замеров: одни и те же бои без замеров, после enable() и disable() (должно совпасть с первым)
+    и с включёнными замерами. Возвращает секунды {'off', 'disabled', 'on'}.
+    """
+    results = {}
+    for mode in ('off', 'disabled', 'on'):
+        if mode != 'off':
+            enable()
+        if mode == 'disabled':
+            disable()
+        start = time.perf_counter()
+        _fights(fights)
+        results[mode] = time.perf_counter() - start
+        disable()
+    return results
+
+
+def console_cost(fights=100, delay=0.0):
+    """
+    Сколько стоит вывод боя в консоль: бои с ConsoleSink(delay), пишущим в память, под замерами.
+    Возвращает Metrics (время ConsoleSink.handle - это форматирование, print и паузы "анимации").
+    """
+    with instrumented() as metrics:
+        _fights(fights, [ConsoleSink(delay=delay, stream=io.StringIO())])
+    return metrics
+
+
+if __name__ == "__main__":
+    fights = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    times = overhead_benchmark(fights)
+    print(f"{fights} групповых боёв: без замеров {times['off']:.3f} с, после disable() {times['disabled']:.3f} с, "
+          f"с замерами {times['on']:.3f} с")
+    print("\nБои с выводом в консоль (в память, без пауз):")
+    print(report(console_cost(fights // 3)))
+    print("\nТе же бои с паузой анимации 1 мс:")
+    print(report(console_cost(3, delay=0.001)))
@@ -0,0 +1,500 @@
+# odds.py - Точные шансы боя один на один (динамическое программирование вместо выборки)
+#
+# Бой simulate_battle - цепь Маркова: всё, что важно для исхода, - это здоровье, зелья и горение обеих
+# сторон плюс место в стеке атаки. Решатель переносит вероятностную массу по этим состояниям
+# (каждое считается один раз, сколько бы веток в него ни пришло) и складывает массу, дошедшую до победы
+# или поражения. Правила - те же, что в Character.attack / _take_hit / apply_status_effects и Battle:
+# крит, уклонение, контратака, комбо (включая цепочки контратак и комбо), элементы, горение,
+# 10% шанс злодея выпить зелье; игрок действует как simulation.AggressivePolicy (зелье ниже порога здоровья).
+# Из статус-эффектов решатель знает только горение: бой с оружием, у которого есть эффекты при попадании
+# (loot.WEAPON_EFFECTS), или с другими действующими эффектами он не берёт (ValueError) - room_odds считает его выборкой.
+# Состояния с вероятностью меньше epsilon отбрасываются; их суммарная масса (unresolved) - точная
+# граница погрешности: настоящая вероятность победы лежит между win и win + unresolved.
+#
+# Выигрыш в скорости зависит от боя и от точности. При epsilon 1e-8 (интервал шириной ~1e-3) выборке для той же
+# точности нужно больше времени: гоблин у входа - в тысячи раз, ловкий гоблин - в десятки, но Главный Босс -
+# лишь в ~8 раз, вода против огня - в ~4 (много состояний: долгие бои с зельями и горением). При грубой
+# точности подсказки "оценить" (несколько процентов) выборка из сотен боёв (~0.1 с) дешевле решателя, поэтому
+# room_odds ограничивает решатель (GAME_EPSILON, GAME_STATES) и, если интервал вышел широким, берёт выборку.
+#
+# `python odds.py [боёв] [epsilon]` - сверка с выборкой (simulation.run_batch) и сравнение скорости.
+
+import heapq
+import math
+import random
+import sys
+import time
+
+import RPG
+from RPG import ATTACK, FINISH, Player, Villain, Weapon, element_modifier
+from effects import BURN, Effects
+from loot import WEAPON_EFFECTS
+
+BURN_DAMAGE = 5  # Урон горения за тик
+BURN_TICKS = 3  # Тиков у нового горения
+BURN_CHANCE = 0.2  # Шанс поджечь цель
+VILLAIN_HEAL_CHANCE = 0.1  # Шанс злодея выпить зелье вместо атаки
+PRUNE = 0.01  # Переходы из класса с массой меньше epsilon * PRUNE не разбираются
+CLOSURE_CUTOFF = 1e-15  # Масса, которую уже не гоняют по шагам внутри класса
+# Подсказка "оценить" в игре: грубая точность и предел состояний, чтобы ответ был за доли секунды
+GAME_EPSILON = 1e-5
+GAME_STATES = 10000
+GAME_SPREAD = 0.1  # Интервал решателя шире - вместо него оценка по выборке из GAME_FIGHTS боёв
+GAME_FIGHTS = 500
+HINT_CACHE = 1024  # Сколько подсказок помнить (запрос -> строка)
+
+
+# Класс Odds (Шансы боя)
+class Odds:
+    def __init__(self, win, loss, turns, unresolved, states, sampled=False):
+        self.win = win  # Вероятность победы игрока
+        self.loss = loss  # Вероятность поражения
+        self.turns = turns  # Ожидаемое число ходов игрока
+        self.unresolved = unresolved  # Отброшенная масса вероятности: победа - от win до win + unresolved
+        self.states = states  # Сколько различных состояний (или боёв выборки) посчитано
+        self.sampled = sampled  # Оценка по выборке: unresolved - стандартная ошибка, а не граница
+
+    def __repr__(self):
+        return (f"Odds(win={self.win:.6f}, loss={self.loss:.6f}, turns={self.turns:.3f}, "
+                f"unresolved={self.unresolved:.1e})")
+
+
+TICK = 3  # Шаг решателя: начало полухода (горение, затем действие) - в дополнение к шагам атаки RPG.py
+
+# Состояние решателя - класс (здоровье, зелья и горение обеих сторон) и шаг внутри класса.
+# Класс упакован в одно целое (поля от младших битов): горение злодея 15, горение игрока 15, зелья злодея 8,
+# зелья игрока 8, здоровье злодея 13, здоровье игрока 13. Горение - по 5 бит на число эффектов с 1, 2 и 3
+# оставшимися тиками. Шаг - тоже целое: шаг (2 бита), чья очередь (1), глубина стека атаки (6).
+_B0, _P1, _P0, _H1, _H0, _KEY = 15, 30, 38, 46, 59, 72
+_STEP, _X = 7, 6
+_BURN_NEW = 1 << 10  # Новое горение - в поле эффектов с 3 тиками
+_BURNS = 1 << 15
+# Урон горения на ближайшем тике и весь будущий урон горения по упакованному полю
+_TICK_DAMAGE = [BURN_DAMAGE * ((b & 31) + (b >> 5 & 31) + (b >> 10)) for b in range(_BURNS)]
+_FUTURE_DAMAGE = [BURN_DAMAGE * ((b & 31) + 2 * (b >> 5 & 31) + 3 * (b >> 10)) for b in range(_BURNS)]
+
+
+def _pack_burns(character):
+    # Горение персонажа в упакованном виде: число эффектов по оставшимся тикам (1, 2, 3)
+    packed = 0
+    for ticks, stacks in character.status_effects.remaining('burn'):
+        if ticks > 0:
+            packed += stacks << 5 * (min(ticks, BURN_TICKS) - 1)
+    return packed
+
+
+def _order(code):
+    # Порядок шагов внутри класса: TICK, затем ATTACK по росту глубины стека, FINISH - по убыванию
+    step, depth = code >> _STEP, code & 63
+    return 0 if step == TICK else 1 + depth if step == ATTACK else 255 - depth
+
+
+_ORDER = [_order(code) for code in range(1 << 9)]
+
+
+# Класс FightSolver (Решатель боя игрок против злодея)
+class FightSolver:
+    """
+    Точный расчёт боя simulate_battle(player, villain) из текущего состояния персонажей
+    (здоровье, зелья, горение). Персонажи не изменяются. Индекс 0 - игрок, 1 - злодей.
+
+    Шаги - TICK (начало полухода) и шаги стека Character.attack (ATTACK, FINISH). Под шагом стороны x
+    в стеке атаки всегда лежат FINISH сторон по очереди, начиная с противоположной, поэтому стек
+    сворачивается в глубину (число этих FINISH). Бросок горения (BURN_EXP) сразу попадает в состояние:
+    до следующего тика горение ни на что не влияет. FINISH сразу после удара разбирается вместе с ним,
+    отдельным шагом остаётся только FINISH, к которому возвращается контратака.
+
+    Вероятностная масса переносится из класса в класс (здоровье, зелья, горение) по убыванию
+    зелий, затем здоровья за вычетом будущего урона горения, затем будущего горения: переход в другой
+    класс всегда уменьшает этот ключ, поэтому в класс приходит вся масса до того, как он будет разобран,
+    и одинаковые состояния разных веток считаются один раз (мемоизация). Внутри класса шаги могут
+    возвращаться друг к другу (уклонения, контратаки, комбо) - масса гоняется по ним, пока не выйдет
+    из класса. Классы с массой меньше epsilon отбрасываются (unresolved).
+    """
+
+    def __init__(self, player, villain, heal_threshold=0.3, epsilon=1e-8, max_states=None):
+        """
+        - heal_threshold: Порог лечения игрока (доля max_health), как в AggressivePolicy.
+        - epsilon: Классы состояний с меньшей вероятностью отбрасываются.
+        - max_states: Предел разобранных классов (None - без предела); неразобранная масса уходит в unresolved.
+        """
+        self.player = player
+        self.villain = villain
+        self.epsilon = epsilon
+        self.max_states = max_states
+        fighters = (player, villain)
+        self.max_health = tuple(c.max_health for c in fighters)
+        self.heal = tuple(int(c.max_health * 0.5) for c in fighters)
+        self.heal_below = player.max_health * heal_threshold
+        self.stats = tuple(c.combat_stats for c in fighters)  # (крит, комбо, уклонение, контратака)
+        # Урон атаки a по другой стороне: (обычный, крит) - как в Character.attack
+        self.damage = tuple(
+            tuple(int(c.base_damage * multiplier * element_modifier(c.element, fighters[1 - a].element))
+                  for multiplier in (1, 2))
+            for a, c in enumerate(fighters))
+        crit0, combo0, dodge0, counter0 = self.stats[0]
+        crit1, combo1, dodge1, counter1 = self.stats[1]
+        # Для шагов атаки стороны x: удары (вычесть из класса, урон, вероятность) - обычный и крит,
+        # уклонение цели без контратаки и с ней, комбо, горение цели (прибавить к классу)
+        self._hits = ([(d << _H1, d, c * (1 - dodge1)) for d, c in zip(self.damage[0], (1 - crit0, crit0)) if c],
+                      [(d << _H0, d, c * (1 - dodge0)) for d, c in zip(self.damage[1], (1 - crit1, crit1)) if c])
+        self._dodges = (dodge1 * (1 - counter1), dodge0 * (1 - counter0))
+        self._counters = (dodge1 * counter1, dodge0 * counter0)
+        self._combos = (combo0, combo1)
+        self._burns = (_BURN_NEW, _BURN_NEW << _B0)
+        if max(self.max_health) >= 1 << 13 or player.potions + villain.potions > 255:
+            raise ValueError("Слишком много здоровья или зелий для решателя")
+        for c in fighters:
+            effects = c.status_effects
+            if (c.weapon.name in WEAPON_EFFECTS or effects.held
+                    or any(entry[0] is not BURN for entry in effects.entries)):
+                raise ValueError(f"Решатель знает только горение: {c.name}")
+
+    def _closure(self, code):
+        """
+        Разбор шага code внутри класса: масса гоняется по шагам (уклонения, контратаки, комбо), пока
+        не выйдет из класса. Не зависит от здоровья, зелий и горения, поэтому считается один раз на шаг.
+        Возвращает выходы [(сдвиг класса, шаг, кто ранен, урон, вероятность)] по убыванию вероятности;
+        выход со сдвигом 0 - TICK в том же классе.
+        """
+        exits = {}
+        inner = {code: 1.0}
+        order = _ORDER.__getitem__
+
+        def finish(delta, side, damage, x, depth, q):
+            # FINISH стороны x: комбо (ещё один шаг ATTACK той же стороны) и бросок горения цели;
+            # без комбо шаг закончен - дальше FINISH противника ниже по стеку или следующий полуход
+            combo = self._combos[x]
+            after = FINISH << _STEP | (1 - x) << _X | depth - 1 if depth else TICK << _STEP | (1 - x) << _X
+            again = x << _X | depth  # ATTACK той же стороны
+            burned = delta + self._burns[x]
+            for shift, step, mass in ((delta, again, combo * (1 - BURN_CHANCE)), (burned, again, combo * BURN_CHANCE),
+                                      (delta, after, (1 - combo) * (1 - BURN_CHANCE)),
+                                      (burned, after, (1 - combo) * BURN_CHANCE)):
+                if mass:
+                    if shift or step >> _STEP == TICK:
+                        key = (shift, step, side, damage)
+                        exits[key] = exits.get(key, 0.0) + q * mass
+                    else:
+                        inner[step] = inner.get(step, 0.0) + q * mass
+
+        while inner:
+            step = min(inner, key=order)
+            q = inner.pop(step)
+            if q < CLOSURE_CUTOFF:
+                continue
+            x, depth = step >> _X & 1, step & 63
+            if step >> _STEP == ATTACK:
+                # Уклонение цели (с контратакой - шаг ATTACK цели глубже по стеку) или урон с критом
+                if self._counters[x] and depth < 63:  # Глубже - пренебрежимо редко
+                    deeper = (1 - x) << _X | depth + 1
+                    inner[deeper] = inner.get(deeper, 0.0) + q * self._counters[x]
+                if self._dodges[x]:
+                    finish(0, 0, 0, x, depth, q * self._dodges[x])
+                for shift, damage, chance in self._hits[x]:
+                    finish(-shift, 1 - x, damage, x, depth, q * chance)
+            else:
+                finish(0, 0, 0, x, depth, q)
+        return sorted(((shift, step, side, damage, q) for (shift, step, side, damage), q in exits.items()),
+                      key=lambda e: -e[4])
+
+    def solve(self):
+        """
+        Возвращает Odds.
+        """
+        epsilon = self.epsilon
+        max_states = self.max_states or math.inf
+        cutoff = epsilon * PRUNE  # Меньшие переходы из класса не разбираются
+        heal0, heal1 = self.heal
+        max0, max1 = self.max_health
+        heal_below = self.heal_below
+        tick_damage, future_damage = _TICK_DAMAGE, _FUTURE_DAMAGE
+        push, pop = heapq.heappush, heapq.heappop
+        closures = {}  # Шаг -> выходы из класса (_closure)
+        ended = [0.0, 0.0]  # [поражение, победа]
+        turns = 0.0
+        processed = 0
+        pending = {}  # Класс -> {шаг: накопленная вероятность}
+        heap = []  # Ключи классов в очереди: ключ порядка в старших битах, класс - в младших
+
+        def add(cls, code, p):
+            # Смерть проверяется до добавления: в классах оба живы
+            steps = pending.get(cls)
+            if steps is None:
+                pending[cls] = {code: p}
+                future = future_damage[cls >> _B0 & 32767] + future_damage[cls & 32767]
+                potential = future - (cls >> _H0) - (cls >> _H1 & 8191) + (1 << 16)
+                potions = (cls >> _P0 & 255) + (cls >> _P1 & 255)
+                push(heap, (((1023 - potions) << 17 | potential) << 16 | (1 << 16) - 1 - future) << _KEY | cls)
+            else:
+                steps[code] = steps.get(code, 0.0) + p
+
+        add(self.player.health << _H0 | self.villain.health << _H1 | self.player.potions << _P0
+            | self.villain.potions << _P1 | _pack_burns(self.player) << _B0 | _pack_burns(self.villain),
+            TICK << _STEP, 1.0)
+        while heap and processed < max_states:
+            cls = pop(heap) & ((1 << _KEY) - 1)
+            work = pending.pop(cls)
+            total = sum(work.values())
+            if total < epsilon:
+                continue
+            processed += 1
+            health = (cls >> _H0, cls >> _H1 & 8191)
+            h0, h1 = health
+            p0, p1 = cls >> _P0 & 255, cls >> _P1 & 255
+            b0, b1 = cls >> _B0 & 32767, cls & 32767
+            while work:
+                ticks = {}
+                for code, p in work.items():
+                    if code >> _STEP == TICK:
+                        ticks[code] = ticks.get(code, 0.0) + p
+                        continue
+                    exits = closures.get(code)
+                    if exits is None:
+                        exits = closures[code] = self._closure(code)
+                    limit = cutoff / p
+                    for shift, step, side, damage, q in exits:
+                        if q < limit:
+                            break
+                        if damage >= health[side]:
+                            ended[side] += p * q
+                        elif shift:
+                            steps = pending.get(cls + shift)
+                            if steps is None:
+                                add(cls + shift, step, p * q)
+                            else:
+                                steps[step] = steps.get(step, 0.0) + p * q
+                        else:
+                            ticks[step] = ticks.get(step, 0.0) + p * q
+                work = {}
+                for code, p in ticks.items():
+                    if p < total * CLOSURE_CUTOFF:
+                        continue
+                    # Горение обеих сторон (Battle.advance), затем действие x
+                    x = code >> _X & 1
+                    t0, t1 = h0 - tick_damage[b0], h1 - tick_damage[b1]
+                    if t0 <= 0 or t1 <= 0:
+                        ended[t0 > 0] += p
+                        continue
+                    ticked = t0 << _H0 | t1 << _H1 | p0 << _P0 | p1 << _P1 | b0 >> 5 << _B0 | b1 >> 5
+                    if x == 0:
+                        turns += p
+                        if p0 > 0 and t0 < heal_below:
+                            # Зелье игрока вместо атаки, ход переходит к злодею
+                            add(ticked + (min(t0 + heal0, max0) - t0 << _H0) - (1 << _P0), TICK << _STEP | 1 << _X, p)
+                            continue
+                    elif p1 > 0:
+                        add(ticked + (min(t1 + heal1, max1) - t1 << _H1) - (1 << _P1), TICK << _STEP,
+                            p * VILLAIN_HEAL_CHANCE)
+                        p *= 1.0 - VILLAIN_HEAL_CHANCE
+                    if ticked == cls:  # Горения нет - атака x в том же классе
+                        work[x << _X] = work.get(x << _X, 0.0) + p
+                    else:
+                        add(ticked, x << _X, p)
+        loss, win = ended
+        return Odds(win, loss, turns, max(1.0 - win - loss, 0.0), processed)
+
+
+def fight_odds(player, villain, heal_threshold=0.3, epsilon=1e-8, max_states=None):
+    """
+    Точные шансы боя simulate_battle(player, villain) из текущего состояния персонажей. Возвращает Odds:
+    настоящая вероятность победы - от win до win + unresolved.
+    - max_states: Предел числа разобранных классов состояний (ограничивает время; точность - в unresolved).
+    """
+    return FightSolver(player, villain, heal_threshold, epsilon, max_states).solve()
+
+
+DIFFICULTY = [(0.9, "легко"), (0.6, "терпимо"), (0.3, "опасно"), (0.0, "смертельно")]
+
+
+def difficulty(win):
+    """
+    Словесная оценка вероятности победы.
+    """
+    for threshold, label in DIFFICULTY:
+        if win >= threshold:
+            return label
+    return DIFFICULTY[-1][1]
+
+
+def copy_player(player):
+    """
+    Копия игрока для расчётов (характеристики, оружие, зелья, здоровье, горение).
+    """
+    clone = Player(player.name, player.weapon, player.element, player.potions,
+                   player.strength, player.dexterity, player.focus)
+    clone.max_health, clone.health = player.max_health, player.health
+    clone.level, clone.experience = player.level, player.experience
+    clone.status_effects = player.status_effects.copy()
+    clone.inventory['weapons'] = list(player.inventory['weapons'])
+    clone.update_derived_stats()
+    RPG.Character.alive_count -= 1  # Копия - не участник игры
+    return clone
+
+
+def room_odds(room, player, epsilon=GAME_EPSILON, fights=GAME_FIGHTS, seed=0, max_states=GAME_STATES):
+    """
+    Шансы игрока против врагов комнаты (Room из create_rooms и других миров) - для подсказки в игре,
+    поэтому работа ограничена. Один враг - fight_odds с точностью epsilon и не больше max_states классов;
+    если интервал (win, win + unresolved) вышел шире GAME_SPREAD, решатель такой бой не берёт (эффекты
+    кроме горения), а также для группы врагов - оценка по fights боям simulation.run_batch
+    (Odds с unresolved = стандартная ошибка). Без врагов - None.
+    """
+    if not room.enemies:
+        return None
+    if len(room.enemies) == 1:
+        villain = Villain(*room.enemies[0])
+        RPG.Character.alive_count -= 1  # Расчётный злодей - не участник игры
+        try:
+            odds = fight_odds(player, villain, epsilon=epsilon, max_states=max_states)
+        except ValueError:
+            odds = None
+        if odds is not None and odds.unresolved <= GAME_SPREAD:
+            return odds
+    from simulation import run_batch
+    saved = RPG.rng  # run_batch засевает RPG.rng заново для каждого боя
+    try:
+        batch = run_batch(room.enemies, fights, seed, make_player=lambda: copy_player(player))
+    finally:
+        RPG.rng = saved
+    win = batch.win_rate
+    return Odds(win, 1 - win, sum(batch.turns) / batch.fights,
+                math.sqrt(win * (1 - win) / batch.fights), batch.fights, sampled=True)
+
+
+_hints = {}  # Запрос hint_request -> подсказка
+
+
+def hint_request(room, player):
+    """
+    Запрос подсказки "оценить": враги комнаты и состояние игрока простыми значениями.
+    Годится и как ключ кэша (одинаковый запрос - одинаковый ответ), и для передачи в другой процесс
+    (см. server.py): персонажи и комната собираются заново в room_hint.
+    """
+    enemies = tuple((name, (weapon.name, weapon.damage)) + tuple(rest)
+                    for name, weapon, *rest in room.enemies)
+    stats = (player.name, (player.weapon.name, player.weapon.damage), player.element, player.potions,
+             player.strength, player.dexterity, player.focus, player.level, player.experience,
+             player.max_health, player.health,
+             tuple(tuple(effect) for effect in player.status_effects.state()),
+             tuple((weapon.name, weapon.damage) for weapon in player.inventory['weapons']))
+    return room.name, enemies, stats
+
+
+def room_hint(request):
+    """
+    Строка с оценкой опасности комнаты по запросу hint_request. Ответы кэшируются (HINT_CACHE запросов).
+    """
+    hint = _hints.get(request)
+    if hint is not None:
+        return hint
+    from text_adventure import Room
+    name, enemies, stats = request
+    room = Room(name, "", [(enemy, Weapon(*weapon), *rest) for enemy, weapon, *rest in enemies])
+    (player_name, weapon, element, potions, strength, dexterity, focus, level, experience,
+     max_health, health, effects, inventory) = stats
+    player = Player(player_name, Weapon(*weapon), element, potions, strength, dexterity, focus)
+    player.max_health, player.health = max_health, health
+    player.level, player.experience = level, experience
+    player.status_effects = Effects(effects)
+    player.inventory['weapons'] = [Weapon(*item) for item in inventory]
+    player.update_derived_stats()
+    RPG.Character.alive_count -= 1  # Расчётный игрок - не участник игры
+    hint = _describe(room, room_odds(room, player))
+    remember_hint(request, hint)
+    return hint
+
+
+def cached_hint(request):
+    """
+    Уже посчитанная подсказка по запросу или None.
+    """
+    return _hints.get(request)
+
+
+def remember_hint(request, hint):
+    """
+    Кладёт подсказку в кэш (в том числе посчитанную в другом процессе). Полный кэш очищается целиком.
+    """
+    if len(_hints) >= HINT_CACHE:
+        _hints.clear()
+    _hints[request] = hint
+
+
+def describe_room(room, player):
+    """
+    Строка с оценкой опасности комнаты для игрока (кэшируется, см. room_hint).
+    """
+    return room_hint(hint_request(room, player))
+
+
+def _describe(room, odds):
+    if odds is None:
+        return f"{room.name}: врагов нет."
+    if odds.sampled:
+        chance = f"{odds.win:.0%} (оценка по выборке)"
+    elif round(odds.win, 2) == round(odds.win + odds.unresolved, 2):
+        chance = f"{odds.win:.0%}"
+    else:
+        chance = f"{odds.win:.0%}-{odds.win + odds.unresolved:.0%}"
+    return f"{room.name}: {difficulty(odds.win)} - победа {chance}, около {odds.turns:.0f} ходов."
+
+
+# Проверочные бои: (название, характеристики игрока (оружие, элемент, зелья, сила, ловкость, фокус), враг)
+MATCHUPS = [
+    ("Гоблин у входа", (Weapon("Кулаки", 5), 'neutral', 3, 5, 5, 5),
+     ("Гоблин", Weapon("Гоблинский топор", 15), 'neutral', 0, 3, 1, 5)),
+    ("Главный Босс", (Weapon("Кулаки", 5), 'neutral', 3, 5, 5, 5),
+     ("Главный Босс", Weapon("Молот босса", 30), 'fire', 2, 8, 4, 7)),
+    ("Вода против огня", (Weapon("Легендарный меч", 35), 'water', 2, 6, 8, 8),
+     ("Главный Босс", Weapon("Молот босса", 30), 'fire', 2, 8, 4, 7)),
+    ("Ловкий гоблин", (Weapon("Ржавый меч", 10), 'neutral', 1, 4, 8, 2),
+     ("Гоблин", Weapon("Гоблинский топор", 15), 'neutral', 0, 2, 8, 6)),
+]
+
+
+def verify_against_sampling(fights=20000, seed=0, epsilon=1e-8):
+    """
+    Сверяет точные шансы с выборкой simulation.run_batch на MATCHUPS: вероятность победы и ожидаемые ходы
+    должны попасть в 4 стандартные ошибки выборки (плюс отброшенная решателем масса).
+    Для сравнения скорости - сколько боёв и времени нужно выборке для той же точности: чтобы её 95%
+    доверительный интервал (2 стандартные ошибки в каждую сторону) был не шире интервала решателя
+    (win, win + unresolved), в котором настоящая вероятность лежит наверняка.
+    Возвращает (строки отчёта, всё ли совпало).
+    """
+    from simulation import run_batch
+    lines = []
+    ok = True
+    for name, stats, enemy in MATCHUPS:
+        def make_player():
+            return Player("Авантюрист", *stats)
+        start = time.process_time()
+        odds = fight_odds(make_player(), Villain(*enemy), epsilon=epsilon)
+        exact_time = time.process_time() - start
+        start = time.process_time()
+        batch = run_batch([enemy], fights, seed, make_player=make_player)
+        sample_time = time.process_time() - start
+        sample_turns = sum(batch.turns) / fights
+        win = odds.win + odds.unresolved / 2
+        win_error = math.sqrt(win * (1 - win) / fights)
+        turns_error = math.sqrt(sum((t - sample_turns) ** 2 for t in batch.turns) / fights / fights)
+        # Отброшенная масса могла бы добавить к ходам не больше, чем самый долгий бой выборки
+        match = (abs(batch.win_rate - win) <= 4 * win_error + odds.unresolved / 2
+                 and abs(sample_turns - odds.turns) <= 4 * turns_error + odds.unresolved * max(batch.turns))
+        ok &= match
+        equivalent = win * (1 - win) / (odds.unresolved / 4) ** 2
+        lines.append(f"{name}: точно {odds.win:.5f}..{odds.win + odds.unresolved:.5f} ({odds.turns:.2f} хода) "
+                     f"за {exact_time:.1f} с, {odds.states} состояний; выборка {batch.win_rate:.4f} "
+                     f"({sample_turns:.2f}) за {sample_time:.1f} с {'- совпадает' if match else '- РАСХОДИТСЯ'}")
+        lines.append(f"{'':>4}для той же точности выборке нужно ~{equivalent:.1e} боёв, "
+                     f"~{equivalent * sample_time / fights:.0f} с - в {equivalent * sample_time / fights / exact_time:.0f} раз дольше")
+    return lines, ok
+
+
+if __name__ == "__main__":
+    fights = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    epsilon = float(sys.argv[2]) if len(sys.argv) > 2 else 1e-8
+    RPG.rng = random.Random(0)
+    lines, ok = verify_against_sampling(fights, epsilon=epsilon)
+    print("\n".join(lines))
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,93 @@
+# parallel.py - Многопроцессные прогоны симуляций боёв
+
+import os
+import sys
+import time
+
+from RPG import Weapon
+from simulation import BatchResult, default_player, run_range
+
+SHARD_SIZE = 1000  # Боёв в одной части (задание для одного процесса за раз)
+
+
+def make_shards(jobs, fights, shard_size=SHARD_SIZE):
+    """
+    Разбивает задания на части фиксированного размера.
+    - jobs: Словарь {название: состав врагов в формате Room.enemies}.
+    - fights: Боёв на каждое задание.
+    - shard_size: Размер части.
+
+    Границы частей зависят только от fights и shard_size, но не от числа процессов.
+    Возвращает список кортежей (название, состав врагов, start, stop).
+    """
+    shards = []
+    for key, enemies in jobs.items():
+        for start in range(0, fights, shard_size):
+            shards.append((key, enemies, start, min(start + shard_size, fights)))
+    return shards
+
+
+def _run_shard(shard, seed, policy, make_player, villain_policy=None):
+    # Каждый бой части засевается от (seed, номер боя в задании): независимый поток случайных
+    # чисел на каждый бой, одинаковый при любом распределении частей по процессам
+    key, enemies, start, stop = shard
+    return key, run_range(enemies, start, stop, seed, policy, make_player, villain_policy)
+
+
+def run_sweep(jobs, fights, seed=0, policy=None, make_player=default_player, workers=None, shard_size=SHARD_SIZE,
+              villain_policy=None):
+    """
+    Прогоняет несколько заданий параллельно на всех ядрах.
+    - jobs: Словарь {название: состав врагов в формате Room.enemies}.
+    - fights: Боёв на каждое задание.
+    - seed: Главное зерно.
+    - policy, make_player: Политика и фабрика игрока (должны сериализоваться pickle,
+      т.е. быть объектами/функциями уровня модуля).
+    - workers: Число процессов (по умолчанию - число ядер; 1 - без пула, в текущем процессе).
+    - villain_policy: Политика злодеев (см. ai.py), как в simulation.run_batch; тоже должна сериализоваться pickle.
+
+    Результаты частей склеиваются в исходном порядке боёв, поэтому итог
+    побитово совпадает с simulation.run_batch(enemies, fights, seed) при любом workers.
+    Возвращает словарь {название: BatchResult}.
+    """
+    shards = make_shards(jobs, fights, shard_size)
+    results = {key: BatchResult() for key in jobs}
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1:
+        for shard in shards:
+            key, batch = _run_shard(shard, seed, policy, make_player, villain_policy)
+            results[key].merge(batch)
+        return results
+
+    from concurrent.futures import ProcessPoolExecutor  # Пул (и multiprocessing) загружается, только когда нужен
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        n = len(shards)
+        for key, batch in pool.map(_run_shard, shards, [seed] * n, [policy] * n, [make_player] * n, [villain_policy] * n):
+            results[key].merge(batch)
+    return results
+
+
+def run_parallel(enemies, fights, seed=0, policy=None, make_player=default_player, workers=None, shard_size=SHARD_SIZE,
+                 villain_policy=None):
+    """
+    Параллельная версия simulation.run_batch для одного состава врагов.
+    Возвращает BatchResult.
+    """
+    return run_sweep({'бой': enemies}, fights, seed, policy, make_player, workers, shard_size, villain_policy)['бой']
+
+
+if __name__ == "__main__":
+    goblin_axe = Weapon("Гоблинский топор", 15)
+    jobs = {
+        'Гоблин': [("Гоблин", goblin_axe, 'neutral', 0, 3, 1, 5)],
+        'Три гоблина': [("Гоблин", goblin_axe, 'neutral', 0, 2, 6, 1)] * 3,
+        'Главный Босс': [("Главный Босс", Weapon("Молот босса", 30), 'fire', 2, 8, 4, 7)],
+    }
+    fights = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    start = time.perf_counter()
+    results = run_sweep(jobs, fights, seed=42)
+    elapsed = time.perf_counter() - start
+    for key, batch in results.items():
+        print(f"{key}: побед {batch.win_rate:.2%}, ходов в среднем {batch.summary()['turns']['mean']:.2f}")
+    print(f"{fights * len(jobs)} боёв за {elapsed:.2f} с на {os.cpu_count()} ядрах")
@@ -0,0 +1,374 @@
+# replay.py - Запись и повтор игровых сессий
+#
+# Игра детерминирована, если известны зерно генератора RPG.rng, мир и строки, которые вводил игрок.
+# Запись - только они и контрольная сумма всего вывода игры: сотни байт на сессию.
+# Повтор (Replay) прогоняет те же строки через Adventure без вывода и пауз "анимации" и может сверить
+# вывод с записанной контрольной суммой - так архив сессий становится регрессионным тестом.
+# Для перемотки к ходу N (ход - одна строка ввода) повтор держит снимки игры (snapshot.py) каждые
+# CHECKPOINT_EVERY ходов: seek(N) загружает ближайший снимок не позже N и доигрывает только остаток.
+# Снимки можно сохранить и в файл записи (index), тогда перемотка быстрая с первого раза.
+#
+#   python replay.py record game.rpgr [мир]       - сыграть с записью (мир: dungeon:42 или файл мира; по умолчанию - пещера)
+#   python replay.py show game.rpgr [с хода] [по ход] - вывод записанной игры без пауз
+#   python replay.py index game.rpgr               - добавить в запись снимки для перемотки
+#   python replay.py check файлы...                - повторить записи и сверить вывод (код 1 при расхождении)
+#   python replay.py [сессий]                      - замеры на архиве бот-сессий
+
+import hashlib
+import random
+import sys
+import time
+import zlib
+from contextlib import contextmanager
+
+import RPG
+import snapshot
+from combat_log import ConsoleSink, format_event
+from text_adventure import COMMAND_PROMPT, Adventure, create_rooms
+
+MAGIC = b'RPGR'
+VERSION = 2  # 2: версия правил подземелья в заголовке, лут боя в подземелье - по уровню комнаты
+CHECKPOINT_EVERY = 25  # Ходов между снимками для перемотки
+
+
+def open_world(spec):
+    """
+    Фабрика мира по его описанию в записи: '' - пещера create_rooms, 'dungeon:N' - подземелье
+    с зерном N (dungeon.py), иначе - путь к файлу мира (world.py).
+    """
+    if not spec:
+        return create_rooms
+    if spec.startswith('dungeon:'):
+        from dungeon import Dungeon
+        seed = spec[len('dungeon:'):]
+        return lambda: Dungeon(seed)
+    from world import load_world
+    return lambda: load_world(spec)
+
+
+def world_version(spec):
+    """
+    Версия правил мира spec (см. open_world): у подземелья - dungeon.VERSION, у остальных миров - 0
+    (файл мира проверяет свою версию сам). Запись подземелья другой версии - это уже другая игра.
+    """
+    if spec.startswith('dungeon:'):
+        from dungeon import VERSION as rules
+        return rules
+    return 0
+
+
+# Класс Digest (Контрольная сумма вывода игры)
+class Digest:
+    def __init__(self):
+        self.hash = hashlib.blake2b(digest_size=8)
+
+    def handle(self, event):
+        self.hash.update((format_event(event) + '\n').encode())
+
+    def digest(self):
+        return self.hash.digest()
+
+
+# Класс Recording (Запись сессии)
+class Recording:
+    """
+    Всё, что нужно, чтобы повторить сессию: зерно, мир и строки ввода. Плюс контрольная сумма
+    вывода (для сверки) и, по желанию, снимки игры для перемотки.
+    """
+
+    def __init__(self, seed, world='', inputs=None, digest=b'', checkpoints=None):
+        """
+        - seed: Зерно RPG.rng (целое >= 0).
+        - world: Описание мира (см. open_world).
+        - inputs: Строки ввода игрока по порядку.
+        - digest: Контрольная сумма всего вывода (Digest) или b'' - сверять не с чем.
+        - checkpoints: Словарь {ход: снимок snapshot.dumps с генератором} - состояние после стольких строк ввода.
+        """
+        self.seed = seed
+        self.world = world
+        self.inputs = inputs if inputs is not None else []
+        self.digest = digest
+        self.checkpoints = checkpoints if checkpoints is not None else {}
+
+    @property
+    def turns(self):
+        return len(self.inputs)
+
+    def dumps(self):
+        """
+        Двоичная запись (varint и строки, как в snapshot.py, сжатые zlib). Возвращает bytes.
+        """
+        w = snapshot._Writer()
+        w.uint(VERSION)
+        w.uint(self.seed)
+        w.str(self.world)
+        w.uint(world_version(self.world))
+        w.uint(len(self.digest))
+        w.buf += self.digest
+        w.uint(len(self.inputs))
+        for line in self.inputs:
+            w.str(line)
+        w.uint(len(self.checkpoints))
+        for turn, data in sorted(self.checkpoints.items()):
+            w.uint(turn)
+            w.uint(len(data))
+            w.buf += data
+        return MAGIC + zlib.compress(bytes(w.buf), 9)
+
+    @classmethod
+    def loads(cls, data):
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError("Это не запись игры")
+        r = snapshot._Reader(memoryview(zlib.decompress(data[len(MAGIC):])))
+        version = r.uint()
+        if version != VERSION:
+            raise ValueError(f"Неподдерживаемая версия записи: {version}")
+        seed = r.uint()
+        world = r.str()
+        rules = r.uint()
+        if rules != world_version(world):
+            raise ValueError(f"Запись сделана другой версией мира {world!r}: {rules}, сейчас {world_version(world)}")
+        digest = r.take(r.uint())
+        inputs = [r.str() for _ in range(r.uint())]
+        checkpoints = {}
+        for _ in range(r.uint()):
+            turn = r.uint()
+            checkpoints[turn] = r.take(r.uint())
+        return cls(seed, world, inputs, digest, checkpoints)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.dumps())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.loads(f.read())
+
+
+def record(path=None, world='', seed=None, read=input, sinks=None):
+    """
+    Игра с записью: как play_game, но генератор засеян известным зерном, а ввод запоминается.
+    Запись сохраняется в path (если задан) в конце игры и при обрыве (Ctrl+C, конец ввода) - с теми
+    ходами, что успели закончиться.
+    - world: Описание мира (см. open_world).
+    - seed: Зерно (по умолчанию - случайное).
+    - read: Источник строк ввода: функция "вопрос -> строка" (по умолчанию input).
+    - sinks: Получатели вывода (по умолчанию - текущие RPG.sinks, то есть консоль).
+    Возвращает Recording.
+    """
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(64)
+    recording = Recording(seed, world)
+    digest = Digest()
+    saved = RPG.rng, RPG.sinks
+    RPG.rng = random.Random(seed)
+    RPG.sinks = list(RPG.sinks if sinks is None else sinks) + [digest]
+    try:
+        adventure = Adventure(start_room=snapshot._open_world(open_world(world))[0])
+        adventure.start()
+        while not adventure.over:
+            line = read(adventure.prompt())
+            before = digest.hash.copy()
+            try:
+                adventure.handle(line)
+            except KeyboardInterrupt:
+                digest.hash = before  # Ход не закончен - в запись не попадает
+                raise
+            recording.inputs.append(line)
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        RPG.rng, RPG.sinks = saved
+        recording.digest = digest.digest()
+        if path:
+            recording.save(path)
+    return recording
+
+
+# Класс Replay (Повтор записи)
+class Replay:
+    """
+    Повтор записанной сессии: строки ввода идут в Adventure без консоли и пауз.
+    turn - сколько строк ввода уже обработано, adventure - игра в этот момент.
+    """
+
+    def __init__(self, recording, checkpoint_every=CHECKPOINT_EVERY, sinks=()):
+        """
+        - checkpoint_every: Через сколько ходов запоминать снимок для перемотки (0 - не запоминать).
+        - sinks: Получатели вывода повтора (по умолчанию - никого).
+        """
+        self.recording = recording
+        self.world = open_world(recording.world)
+        self.checkpoint_every = checkpoint_every
+        self.checkpoints = dict(recording.checkpoints)
+        self.sinks = list(sinks)
+        self.rng = random.Random()
+        self.adventure = None
+        self.turn = None
+
+    @contextmanager
+    def _active(self):
+        saved = RPG.rng, RPG.sinks
+        RPG.rng, RPG.sinks = self.rng, self.sinks
+        try:
+            yield
+        finally:
+            RPG.rng, RPG.sinks = saved
+
+    def seek(self, turn):
+        """
+        Перематывает к состоянию после turn строк ввода: от ближайшего снимка не позже turn
+        (или от текущего места, если оно ближе) доигрываются только оставшиеся ходы.
+        Получатели видят вывод только доигранных ходов. Возвращает Adventure.
+        """
+        inputs = self.recording.inputs
+        turn = min(turn, len(inputs))
+        with self._active():
+            base = max((t for t in self.checkpoints if t <= turn), default=0)
+            if self.turn is None or self.turn > turn or self.turn < base:
+                if base:
+                    self.adventure = snapshot.loads(self.checkpoints[base], world=self.world, rng=self.rng)
+                else:
+                    self.rng.seed(self.recording.seed)
+                    self.adventure = Adventure(start_room=snapshot._open_world(self.world)[0])
+                    self.adventure.start()
+                self.turn = base
+            every = self.checkpoint_every
+            while self.turn < turn and not self.adventure.over:
+                self.adventure.handle(inputs[self.turn])
+                self.turn += 1
+                if every and self.turn % every == 0 and self.turn not in self.checkpoints:
+                    self.checkpoints[self.turn] = snapshot.dumps(self.adventure, self.rng)
+        return self.adventure
+
+    def run(self):
+        """
+        Доигрывает запись до конца. Возвращает Adventure.
+        """
+        return self.seek(len(self.recording.inputs))
+
+
+def index(recording, checkpoint_every=CHECKPOINT_EVERY):
+    """
+    Добавляет в запись снимки каждые checkpoint_every ходов (один проход повтора). Возвращает запись.
+    """
+    replay = Replay(recording, checkpoint_every)
+    replay.run()
+    recording.checkpoints = replay.checkpoints
+    return recording
+
+
+def verify(recording):
+    """
+    Повторяет запись с начала и сверяет вывод с её контрольной суммой.
+    Возвращает True, если вывод совпал и все строки ввода пригодились.
+    """
+    digest = Digest()
+    replay = Replay(recording, checkpoint_every=0, sinks=[digest])
+    replay.checkpoints.clear()  # Контрольная сумма - по всему выводу с первого хода
+    replay.run()
+    return digest.digest() == recording.digest and replay.turn == recording.turns
+
+
+def check_archive(recordings):
+    """
+    Сверяет пачку записей (Recording или пути к файлам).
+    Возвращает (номера расходящихся записей, записей в минуту).
+    """
+    failed = []
+    start = time.perf_counter()
+    for i, recording in enumerate(recordings):
+        if isinstance(recording, str):
+            recording = Recording.load(recording)
+        if not verify(recording):
+            failed.append(i)
+    elapsed = time.perf_counter() - start
+    return failed, (i + 1) / elapsed * 60 if recordings else 0.0
+
+
+# Замеры
+def bot_sessions(count, turns=200, seed=0, world='', idle=0.0):
+    """
+    count записей игр бота (server.bot_answer) не длиннее turns строк ввода, без вывода.
+    - idle: Доля команд, на которых бот не идёт дальше, а смотрит инвентарь (дольше живёт - длиннее сессия).
+    """
+    from server import bot_answer
+    recordings = []
+    for i in range(count):
+        bot = random.Random(f"{seed}:{i}")
+        answered = 0
+
+        def read(prompt):
+            nonlocal answered
+            if answered >= turns:
+                raise EOFError
+            answered += 1
+            if prompt == COMMAND_PROMPT and bot.random() < idle:
+                return "инвентарь"
+            return bot_answer(prompt, bot)
+        recordings.append(record(world=world, seed=i, read=read, sinks=()))
+    return recordings
+
+
+def seek_benchmark(recordings, seeks=200, seed=0):
+    """
+    Перемотка к случайному ходу в свежем повторе: от начала и по снимкам из записи (index).
+    Возвращает секунды на одну перемотку {'from_start', 'checkpoints'}.
+    """
+    rng = random.Random(seed)
+    targets = [(recording, rng.randrange(recording.turns + 1))
+               for recording in rng.choices(recordings, k=seeks)]
+    results = {}
+    for name, every in (('from_start', 0), ('checkpoints', CHECKPOINT_EVERY)):
+        indexed = {}
+        for recording, _ in targets:
+            if id(recording) not in indexed:
+                indexed[id(recording)] = index(Recording(recording.seed, recording.world, recording.inputs,
+                                                         recording.digest), every) if every else recording
+        start = time.perf_counter()
+        for recording, turn in targets:
+            Replay(indexed[id(recording)], every).seek(turn)
+        results[name] = (time.perf_counter() - start) / seeks
+    return results
+
+
+def _show(path, first=0, last=None):
+    # Вывод записанной игры с хода first по last в консоль без пауз
+    replay = Replay(Recording.load(path))
+    replay.seek(first)
+    replay.sinks = [ConsoleSink(delay=0)]
+    replay.seek(replay.recording.turns if last is None else last)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == 'record':
+        recording = record(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else '')
+        print(f"Записано ходов: {recording.turns} (зерно {recording.seed}) -> {sys.argv[2]}")
+    elif command == 'show':
+        _show(sys.argv[2], *(int(arg) for arg in sys.argv[3:5]))
+    elif command == 'index':
+        Recording.save(index(Recording.load(sys.argv[2])), sys.argv[2])
+    elif command == 'check':
+        failed, per_minute = check_archive(sys.argv[2:])
+        for i in failed:
+            print(f"Расходится: {sys.argv[2 + i]}")
+        print(f"Сверено записей: {len(sys.argv) - 2}, расходится: {len(failed)} ({per_minute:.0f} записей в минуту)")
+        sys.exit(1 if failed else 0)
+    else:
+        count = int(command) if command else 1000
+        recordings = bot_sessions(count)
+        size = sum(len(recording.dumps()) for recording in recordings) / count
+        turns = sum(recording.turns for recording in recordings) / count
+        failed, per_minute = check_archive(recordings)
+        print(f"{count} бот-сессий (в среднем {turns:.0f} ходов): запись {size:.0f} байт, "
+              f"повтор со сверкой - {per_minute:.0f} сессий в минуту, расходится: {len(failed)}")
+        # Перемотка имеет смысл на длинных сессиях: осторожный бот живёт сотни ходов
+        recordings = bot_sessions(max(count // 20, 1), turns=2000, idle=0.97)
+        turns = sum(recording.turns for recording in recordings) / len(recordings)
+        times = seek_benchmark(recordings)
+        print(f"Перемотка к случайному ходу (сессии в среднем {turns:.0f} ходов): "
+              f"с начала {times['from_start'] * 1000:.2f} мс, по снимкам каждые {CHECKPOINT_EVERY} ходов "
+              f"{times['checkpoints'] * 1000:.2f} мс")
+        sys.exit(1 if failed else 0)
@@ -0,0 +1,331 @@
+# server.py - Асинхронный сервер игровых сессий
+#
+# Один процесс ведёт много независимых приключений. У каждой сессии свой игрок, свои комнаты
+# (create_rooms) и свой генератор случайных чисел. Паузы "анимации" - это await asyncio.sleep,
+# они не блокируют остальные сессии.
+#
+# Подсказку "оценить" (решатель odds.py, до секунды с лишним) сервер считает в отдельном процессе
+# (run_in_executor) и помнит ответы: пока она считается, остальные сессии не ждут.
+#
+# Протокол - строки UTF-8 по TCP. Сервер шлёт текст игры построчно; строка, начинающаяся с "? ",
+# - это вопрос (например "? > "), после которого сервер ждёт одну строку ответа.
+# Когда игра окончена, сервер закрывает соединение. Если ответ не читается (длиннее LINE_LIMIT байт
+# или не UTF-8), сервер шлёт строку ошибки, начинающуюся с "! ", и тоже закрывает соединение.
+
+import asyncio
+import random
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+
+import RPG
+import snapshot
+from combat_log import ANIMATED, format_event
+from text_adventure import Adventure
+
+PROMPT_MARK = "? "
+ERROR_MARK = "! "
+LINE_LIMIT = 2 ** 16  # Самая длинная строка ответа, байт
+HINT_WORKERS = 2  # Процессов для подсказок "оценить"
+
+
+# Класс SessionSink (Получатель событий одной сессии)
+class SessionSink:
+    def __init__(self, delay):
+        self.delay = delay
+        self.output = []  # Пары (текст, пауза после него)
+
+    def handle(self, event):
+        self.output.append((format_event(event), self.delay if event.kind in ANIMATED else 0))
+
+    def take(self):
+        output, self.output = self.output, []
+        return output
+
+
+# Класс Session (Игровая сессия)
+class Session:
+    def __init__(self, seed=None, delay=0.5, adventure=None):
+        """
+        - seed: Зерно генератора случайных чисел сессии.
+        - delay: Пауза "анимации" в секундах.
+        - adventure: Уже идущее приключение (см. load); по умолчанию - новая игра.
+        """
+        self.rng = random.Random(seed)
+        self.sink = SessionSink(delay)
+        with self.active():
+            self.adventure = adventure or Adventure()
+        self.adventure.defer_hints = True  # Подсказки "оценить" считает GameServer вне цикла событий
+
+    def save(self):
+        """
+        Снимок сессии (игра и генератор случайных чисел) в двоичном формате snapshot.py.
+        """
+        return snapshot.dumps(self.adventure, self.rng)
+
+    @classmethod
+    def load(cls, data, delay=0.5):
+        """
+        Сессия из снимка save(): продолжается с того же вопроса и с тем же генератором.
+        """
+        rng = random.Random()
+        session = cls(delay=delay, adventure=snapshot.loads(data, rng=rng))
+        session.rng = rng
+        return session
+
+    @contextmanager
+    def active(self):
+        """
+        Подключает генератор и получателя событий сессии к боевой системе на время одного шага.
+        Шаг выполняется без await, поэтому сессии не мешают друг другу.
+        """
+        saved = RPG.rng, RPG.sinks
+        RPG.rng, RPG.sinks = self.rng, [self.sink]
+        try:
+            yield
+        finally:
+            RPG.rng, RPG.sinks = saved
+
+    @property
+    def over(self):
+        return self.adventure.over
+
+    def prompt(self):
+        return self.adventure.prompt()
+
+    def start(self):
+        """
+        Начало игры. Возвращает вывод: список пар (текст, пауза).
+        """
+        with self.active():
+            self.adventure.start()
+        return self.sink.take()
+
+    def handle(self, line):
+        """
+        Ответ игрока. Возвращает вывод: список пар (текст, пауза).
+        """
+        with self.active():
+            self.adventure.handle(line)
+        return self.sink.take()
+
+    def take_hint(self):
+        """
+        Запрос подсказки "оценить" от последнего ответа (odds.hint_request) или None.
+        """
+        request, self.adventure.hint_request = self.adventure.hint_request, None
+        return request
+
+
+# Класс GameServer (Сервер сессий)
+class GameServer:
+    def __init__(self, host='127.0.0.1', port=8765, delay=0.5, seed=None, checkpoint=False):
+        """
+        - host, port: Адрес сервера (port=0 - любой свободный).
+        - delay: Пауза "анимации" для всех сессий.
+        - seed: Главное зерно (сессия номер n получает зерно (seed, n)); None - случайные сессии.
+        - checkpoint: Сохранять снимок каждой сессии после каждого ответа (в checkpoints).
+        """
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.seed = seed
+        self.sessions = 0  # Всего начато сессий
+        self.active_sessions = 0
+        self.checkpoints = {}  # Номер идущей сессии -> последний снимок (если checkpoint)
+        self.checkpoint = checkpoint
+        self.server = None
+        self.hint_pool = None  # Процессы для подсказок - создаются при первой подсказке
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.serve_client, self.host, self.port,
+                                                 limit=LINE_LIMIT, backlog=4096)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+        if self.hint_pool is not None:
+            self.hint_pool.shutdown()
+
+    async def serve_client(self, reader, writer):
+        number = self.sessions
+        seed = None if self.seed is None else f"{self.seed}:{number}"
+        self.sessions += 1
+        self.active_sessions += 1
+        session = Session(seed, self.delay)
+        try:
+            output = session.start()
+            while True:
+                await self._send(writer, output)
+                if session.over:
+                    break
+                writer.write((PROMPT_MARK + session.prompt() + "\n").encode())
+                await writer.drain()
+                line = await reader.readline()
+                if not line:
+                    break
+                output = session.handle(line.decode().rstrip("\r\n"))
+                request = session.take_hint()
+                if request is not None:
+                    output.insert(0, (await self._hint(request), 0))  # Сразу за командой, до описания комнаты
+                if self.checkpoint:
+                    self.checkpoints[number] = session.save()
+        except ConnectionError:
+            pass
+        except (ValueError, asyncio.LimitOverrunError, UnicodeDecodeError) as error:
+            # Строка длиннее LINE_LIMIT (readline - ValueError) или не UTF-8: сессию не продолжить
+            reason = "ответ не в UTF-8" if isinstance(error, UnicodeDecodeError) else "слишком длинная строка"
+            await self._error(writer, reason)
+        finally:
+            self.checkpoints.pop(number, None)
+            self.active_sessions -= 1
+            writer.close()
+
+    async def _hint(self, request):
+        # Подсказка считается в другом процессе, а не потоке: run_batch подменяет глобальные
+        # RPG.rng и RPG.sinks, которые в этом процессе подменяют и шаги сессий (Session.active)
+        import odds
+        hint = odds.cached_hint(request)
+        if hint is None:
+            if self.hint_pool is None:
+                # spawn, а не fork: копия процесса унаследовала бы сокеты клиентов, и закрытое сервером
+                # соединение оставалось бы открытым в процессе подсказок
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                self.hint_pool = ProcessPoolExecutor(max_workers=HINT_WORKERS,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            hint = await asyncio.get_running_loop().run_in_executor(self.hint_pool, odds.room_hint, request)
+            odds.remember_hint(request, hint)
+        return hint
+
+    async def _error(self, writer, reason):
+        # Строка ошибки перед закрытием соединения (клиент мог уже отключиться)
+        try:
+            writer.write((ERROR_MARK + reason + "\n").encode())
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def _send(self, writer, output):
+        for text, pause in output:
+            writer.write((text + "\n").encode())
+            if pause:
+                await writer.drain()
+                await asyncio.sleep(pause)
+        await writer.drain()
+
+
+# Нагрузочный тест
+BOT_ANSWERS = [
+    (RPG.ACTION_PROMPT, "1"),
+    (RPG.TARGET_PROMPT, "1"),
+    (RPG.SHIELD_TARGET_PROMPT, "1"),
+    (RPG.WEAPON_PROMPT, "1"),
+    ("Взять?", "да"),
+]
+BOT_MOVES = ["идти на север", "идти на юг", "идти на восток", "идти на запад", "инвентарь"]
+
+
+def bot_answer(prompt, rng):
+    """
+    Ответ простого бота на вопрос игры.
+    """
+    for start, answer in BOT_ANSWERS:
+        if prompt.startswith(start):
+            return answer
+    return rng.choice(BOT_MOVES)
+
+
+async def bot_client(host, port, commands, latencies, seed, think=0.0):
+    """
+    Клиент-бот: отвечает на вопросы, пока не отправит commands ответов или игра не закончится.
+    - think: Пауза "на раздумье" перед каждым ответом, как у живого игрока.
+    Задержки (от отправки ответа до следующего вопроса) добавляются в latencies.
+    """
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port, limit=2 ** 16)
+    sent = 0
+    sent_at = None
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            text = line.decode().rstrip("\n")
+            if not text.startswith(PROMPT_MARK):
+                continue
+            if sent_at is not None:
+                latencies.append(time.perf_counter() - sent_at)
+            answer = "выход" if sent >= commands else bot_answer(text[len(PROMPT_MARK):], rng)
+            if think:
+                await asyncio.sleep(think * rng.random() * 2)
+            writer.write((answer + "\n").encode())
+            await writer.drain()
+            sent_at = time.perf_counter()
+            sent += 1
+    finally:
+        writer.close()
+    return sent
+
+
+async def load_test(clients=2000, commands=50, delay=0.0, think=0.5, seed=0, checkpoint=False):
+    """
+    Поднимает сервер и clients одновременных ботов в этом же процессе.
+    - think: Средняя пауза бота перед ответом (0 - отвечать мгновенно, предельная нагрузка).
+    - checkpoint: Сохранять снимки сессий на каждом ходу.
+    Возвращает словарь со статистикой: сессии, команды, команды в секунду, задержки (медиана, p99, максимум).
+    """
+    server = await GameServer(port=0, delay=delay, seed=seed, checkpoint=checkpoint).start()
+    latencies = []
+    peak = 0
+
+    async def watch():
+        nonlocal peak
+        while True:
+            peak = max(peak, server.active_sessions)
+            await asyncio.sleep(0.01)
+
+    watcher = asyncio.create_task(watch())
+    start = time.perf_counter()
+    sent = await asyncio.gather(*(bot_client(server.host, server.port, commands, latencies, f"{seed}:{i}", think)
+                                  for i in range(clients)))
+    elapsed = time.perf_counter() - start
+    watcher.cancel()
+    await server.close()
+
+    latencies.sort()
+    return {
+        'sessions': clients,
+        'peak_concurrent': peak,
+        'commands': sum(sent),
+        'seconds': elapsed,
+        'commands_per_second': sum(sent) / elapsed,
+        'latency_median_ms': statistics.median(latencies) * 1000,
+        'latency_p99_ms': latencies[int(len(latencies) * 0.99)] * 1000,
+        'latency_max_ms': latencies[-1] * 1000,
+    }
+
+
+async def serve(port=8765, delay=0.5, host='127.0.0.1'):
+    """
+    Запускает сервер и обслуживает сессии до остановки.
+    - host: Адрес, на котором слушать. По умолчанию - только локальные подключения;
+      чтобы пустить игроков из сети, адрес ('0.0.0.0' или адрес интерфейса) задаётся явно.
+    """
+    server = await GameServer(host=host, port=port, delay=delay).start()
+    print(f"Сервер слушает {server.host}:{server.port}")
+    await server.server.serve_forever()
+
+
+if __name__ == "__main__":
+    # python server.py [порт] [адрес]   - запустить сервер (адрес по умолчанию 127.0.0.1; 0.0.0.0 - все интерфейсы)
+    # python server.py loadtest [боты] [checkpoint]  - нагрузочный тест (checkpoint - со снимками на каждом ходу)
+    if len(sys.argv) > 1 and sys.argv[1] == 'loadtest':
+        bots = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+        print(asyncio.run(load_test(clients=bots, checkpoint='checkpoint' in sys.argv[3:])))
+    else:
+        asyncio.run(serve(int(sys.argv[1]) if len(sys.argv) > 1 else 8765,
+                          host=sys.argv[2] if len(sys.argv) > 2 else '127.0.0.1'))
@@ -0,0 +1,238 @@
+# simulation.py - Безголовые (неинтерактивные) симуляции боёв для балансировки
+
+import random
+import time
+from contextlib import contextmanager
+
+import RPG
+from RPG import Weapon, Player, Villain, simulate_battle, simulate_group_battle
+
+
+@contextmanager
+def headless(sinks=()):
+    """
+    Контекст без вывода и без задержек: всё, что делает боевая система внутри, происходит мгновенно и молча.
+    - sinks: Получатели событий на время симуляции (по умолчанию - никого).
+    """
+    saved = RPG.sinks
+    RPG.sinks = list(sinks)
+    try:
+        yield
+    finally:
+        RPG.sinks = saved
+
+
+# Класс AggressivePolicy (Простая политика для симуляций)
+class AggressivePolicy:
+    """
+    Политика без участия пользователя: атакует самого раненого врага,
+    пьёт зелье, когда здоровье падает ниже порога, и берёт сильнейшее оружие.
+    """
+
+    def __init__(self, heal_threshold=0.3):
+        """
+        - heal_threshold: Доля max_health, ниже которой игрок использует зелье.
+        """
+        self.heal_threshold = heal_threshold
+
+    def choose_action(self, player, enemies):
+        if player.potions > 0 and player.health < player.max_health * self.heal_threshold:
+            return 'heal'
+        return 'attack'
+
+    def choose_target(self, player, enemies, shield=False):
+        # Один проход по врагам (enemies может быть RPG.AliveView, где доступ по номеру - O(log n))
+        return min(enumerate(enemies), key=lambda pair: pair[1].health)[0]
+
+    def choose_weapon(self, player):
+        weapons = player.inventory['weapons']
+        return max(range(len(weapons)), key=lambda i: weapons[i].damage)
+
+
+# Класс TurnCounter (Обёртка политики, считающая ходы игрока)
+class TurnCounter:
+    def __init__(self, policy):
+        self.policy = policy
+        self.turns = 0
+
+    def choose_action(self, player, enemies):
+        self.turns += 1
+        return self.policy.choose_action(player, enemies)
+
+    def choose_target(self, player, enemies, shield=False):
+        return self.policy.choose_target(player, enemies, shield)
+
+    def choose_weapon(self, player):
+        return self.policy.choose_weapon(player)
+
+
+def default_player():
+    """
+    Стартовый игрок, как в play_game(): кулаки, 3 зелья, все характеристики по 5.
+    """
+    return Player("Авантюрист", Weapon("Кулаки", 5), element='neutral', potions=3)
+
+
+def total_experience(character):
+    """
+    Весь накопленный опыт персонажа с учётом потраченного на уровни (порог уровня: level * 100).
+    """
+    return sum(level * 100 for level in range(1, character.level)) + character.experience
+
+
+# Класс FightResult (Итог одного боя)
+class FightResult:
+    def __init__(self, won, turns, damage_dealt, damage_taken, exp):
+        self.won = won  # Победил ли игрок
+        self.turns = turns  # Количество ходов игрока
+        self.damage_dealt = damage_dealt  # Урон, нанесённый злодеям (без учёта оверкилла)
+        self.damage_taken = damage_taken  # Потеря здоровья игрока (за вычетом лечения)
+        self.exp = exp  # Полученный опыт
+
+
+def simulate_fight(enemies, seed, policy=None, make_player=default_player, villain_policy=None):
+    """
+    Один безголовый бой.
+    - enemies: Список кортежей врагов в формате Room.enemies (имя, оружие, элемент, potions, strength, dexterity, focus).
+    - seed: Зерно генератора для этого боя.
+    - policy: Политика игрока (по умолчанию AggressivePolicy).
+    - make_player: Функция, создающая свежего игрока.
+    - villain_policy: Политика злодеев (см. ai.py; по умолчанию None - встроенное поведение Battle.villain_turn).
+
+    Генератор RPG.rng на время боя заменяется засеянным seed, после боя возвращается прежний.
+    Возвращает FightResult.
+    """
+    saved = RPG.rng
+    RPG.rng = random.Random(seed)
+    try:
+        player = make_player()
+        counter = TurnCounter(policy or AggressivePolicy())
+        player.policy = counter
+        villains = [Villain(*enemy) for enemy in enemies]
+        for villain in villains:
+            villain.policy = villain_policy
+        start_health = player.health
+        start_exp = total_experience(player)
+
+        with headless():
+            if len(villains) == 1:
+                won = simulate_battle(player, villains[0])
+            else:
+                won = simulate_group_battle(player, villains)
+    finally:
+        RPG.rng = saved
+
+    return FightResult(
+        won=won,
+        turns=counter.turns,
+        damage_dealt=sum(v.max_health - v.health for v in villains),
+        damage_taken=start_health - player.health,
+        exp=total_experience(player) - start_exp,
+    )
+
+
+# Класс BatchResult (Агрегированная статистика серии боёв)
+class BatchResult:
+    def __init__(self):
+        self.fights = 0
+        self.wins = 0
+        self.turns = []
+        self.damage_dealt = []
+        self.damage_taken = []
+        self.exp = []
+
+    def add(self, result):
+        """
+        Добавляет итог одного боя.
+        """
+        self.fights += 1
+        self.wins += result.won
+        self.turns.append(result.turns)
+        self.damage_dealt.append(result.damage_dealt)
+        self.damage_taken.append(result.damage_taken)
+        self.exp.append(result.exp)
+
+    def merge(self, other):
+        """
+        Добавляет результаты другой серии (например, части, посчитанной в другом процессе).
+        """
+        self.fights += other.fights
+        self.wins += other.wins
+        self.turns.extend(other.turns)
+        self.damage_dealt.extend(other.damage_dealt)
+        self.damage_taken.extend(other.damage_taken)
+        self.exp.extend(other.exp)
+        return self
+
+    @property
+    def win_rate(self):
+        return self.wins / self.fights if self.fights else 0.0
+
+    def summary(self):
+        """
+        Сводка: процент побед и распределения (среднее, медиана, 10-й и 90-й перцентили).
+        """
+        return {
+            'fights': self.fights,
+            'wins': self.wins,
+            'win_rate': self.win_rate,
+            'turns': distribution(self.turns),
+            'damage_dealt': distribution(self.damage_dealt),
+            'damage_taken': distribution(self.damage_taken),
+            'exp': distribution(self.exp),
+        }
+
+
+def distribution(values):
+    """
+    Краткое описание распределения списка чисел.
+    """
+    if not values:
+        return {}
+    if len(values) == 1:
+        return {'mean': values[0], 'median': values[0], 'p10': values[0], 'p90': values[0]}
+    import statistics  # Тянет fractions и decimal: загружается при первой сводке, а не при старте воркера
+    deciles = statistics.quantiles(values, n=10)
+    return {
+        'mean': statistics.fmean(values),
+        'median': statistics.median(values),
+        'p10': deciles[0],
+        'p90': deciles[-1],
+    }
+
+
+def run_batch(enemies, fights, seed=0, policy=None, make_player=default_player, villain_policy=None):
+    """
+    Серия из fights боёв против одного и того же состава врагов.
+    Бой номер i использует зерно (seed, i), поэтому результат воспроизводим
+    и не зависит от того, как бои разбиты на части.
+
+    Возвращает BatchResult.
+    """
+    return run_range(enemies, 0, fights, seed, policy, make_player, villain_policy)
+
+
+def run_range(enemies, start, stop, seed=0, policy=None, make_player=default_player, villain_policy=None):
+    """
+    Бои с номерами start..stop-1 серии с главным зерном seed (часть run_batch).
+    """
+    batch = BatchResult()
+    for i in range(start, stop):
+        batch.add(simulate_fight(enemies, fight_seed(seed, i), policy, make_player, villain_policy))
+    return batch
+
+
+def fight_seed(seed, index):
+    """
+    Зерно для боя номер index в серии с главным зерном seed.
+    """
+    return f"{seed}:{index}"
+
+
+if __name__ == "__main__":
+    goblin = ("Гоблин", Weapon("Гоблинский топор", 15), 'neutral', 0, 3, 1, 5)
+    start = time.perf_counter()
+    result = run_batch([goblin], 10000, seed=42)
+    elapsed = time.perf_counter() - start
+    print(result.summary())
+    print(f"{result.fights} боёв за {elapsed:.2f} с ({result.fights / elapsed * 60:.0f} боёв в минуту)")
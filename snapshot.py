@@ -0,0 +1,586 @@
+# snapshot.py - Сохранение и загрузка игры
+#
+# Снимок - всё состояние приключения (Adventure): игрок с инвентарём и статус-эффектами, текущий бой,
+# незавершённый выбор лута и изменившиеся комнаты (побеждённые враги, взятый лут). Комнаты мира из файла
+# (world.py) сохраняются под своими номерами (Room.key), комнаты create_rooms нумеруются обходом в ширину
+# от стартовой комнаты. При загрузке нужна та же фабрика мира.
+#
+# Два формата:
+# - двоичный (dumps/loads): компактный, с версией, для сохранения на каждом ходу;
+# - JSON (dumps_json/loads_json): для отладки, те же данные в читаемом виде.
+#
+# Загрузка ленивая: записи комнат остаются неразобранными (Room.saved) до первого входа в комнату.
+# Комнаты, в которые игрок не заходил, в снимок не попадают вовсе.
+
+import json
+import random
+import time
+from array import array
+
+import RPG
+from RPG import Character, Weapon, Player, Villain, Battle, NO_ANSWER, combat_stats
+from combat_log import format_event
+from effects import Effects
+from text_adventure import Adventure, Room, create_rooms
+
+MAGIC = b'RPGS'
+VERSION = 2  # 2: без списка живых злодеев боя (Battle.roster строится по статусам злодеев)
+READABLE = (1, 2)  # Версии, которые загружаются (в версии 1 список живых злодеев читается и пропускается)
+
+STATUSES = ["alive", "dead"]  # Код статуса персонажа - позиция в списке
+STATES = [None, 'action', 'target', 'shield_target', 'weapon', 'drop_weapon', 'loot', 'loot_weapon', 'command']
+ACTIONS = [None, 'attack', 'heal', 'shield', 'equip']
+
+FLAG_RNG = 1  # В снимке есть состояние генератора случайных чисел
+
+
+# Обход мира
+def room_order(start_room):
+    """
+    Все комнаты мира в порядке обхода в ширину от стартовой (номер комнаты - позиция в списке).
+    """
+    order = [start_room]
+    seen = {id(start_room)}
+    for room in order:
+        for next_room in room.exits.values():
+            if id(next_room) not in seen:
+                seen.add(id(next_room))
+                order.append(next_room)
+    return order
+
+
+def _room_id(adventure, room):
+    # Комнаты из файла знают свой номер. Остальные нумеруются обходом один раз на приключение:
+    # мир не меняет форму во время игры
+    if room.key is not None:
+        return room.key
+    ids = getattr(adventure, '_room_ids', None)
+    if ids is None:
+        ids = adventure._room_ids = {id(room): i for i, room in enumerate(room_order(adventure.start_room))}
+    return ids[id(room)]
+
+
+def _open_world(world):
+    # Фабрика мира возвращает стартовую комнату (create_rooms) или мир из файла (world.World).
+    # Возвращает стартовую комнату и функцию "номер -> комната"
+    made = world()
+    if isinstance(made, Room):
+        return made, room_order(made).__getitem__
+    return made.start_room(), made.room
+
+
+# Состояние в виде простых типов (словари, списки, строки, числа)
+def _weapon_state(weapon):
+    return [weapon.name, weapon.damage]
+
+
+def _character_state(character):
+    state = {
+        'name': character.name,
+        'weapon': _weapon_state(character.weapon),
+        'element': character.element,
+        'status': character.status,
+        'max_health': character.max_health,
+        'health': character.health,
+        'strength': character.strength,
+        'dexterity': character.dexterity,
+        'focus': character.focus,
+        'base_damage': character.base_damage,
+        'level': character.level,
+        'experience': character.experience,
+        'potions': character.potions,
+        'status_effects': character.status_effects.state(),
+    }
+    if isinstance(character, Player):
+        state['inventory'] = {'potions': character.inventory['potions'],
+                              'weapons': [_weapon_state(w) for w in character.inventory['weapons']]}
+    return state
+
+
+def _room_state(room):
+    return {
+        'enemies': [[name, _weapon_state(weapon), *rest] for name, weapon, *rest in room.enemies],
+        'loot': [_weapon_state(w) for w in room.loot],
+    }
+
+
+def capture(adventure, rng=None):
+    """
+    Состояние приключения в виде словаря из простых типов.
+    - rng: Генератор случайных чисел, состояние которого нужно сохранить (например, генератор сессии).
+    Отложенные записи комнат остаются как есть (см. RawRoom) - их разбирает только JSON-кодировщик.
+    """
+    battle = adventure.battle
+    rng_state = None
+    if rng is not None:
+        _, words, gauss = rng.getstate()
+        rng_state = list(words) + [gauss]
+    state = {
+        'version': VERSION,
+        'rng': rng_state,
+        'state': adventure.state,
+        'action': adventure.action,
+        'won': adventure.won,
+        'answer': None if adventure.answers.weapon is NO_ANSWER else adventure.answers.weapon,
+        'room': _room_id(adventure, adventure.room),
+        'pending_weapon': _weapon_state(adventure.pending_weapon) if adventure.pending_weapon else None,
+        'drops': [_weapon_state(w) for w in adventure.drops],
+        'player': _character_state(adventure.player),
+        'battle': None,
+        'rooms': {},
+    }
+    if battle is not None:
+        state['battle'] = {
+            'group': battle.group,
+            'turn': battle.turn,
+            'villains': [_character_state(v) for v in battle.villains],
+            'drops': [_weapon_state(w) for w in battle.drops],
+        }
+    for room in adventure.touched:
+        state['rooms'][_room_id(adventure, room)] = room.saved if room.saved is not None else _room_state(room)
+    return state
+
+
+# Восстановление объектов из простых типов
+class _Weapons:
+    # Одинаковые оружия (имя, урон) восстанавливаются одним объектом
+    def __init__(self):
+        self.known = {}
+
+    def get(self, state):
+        key = (state[0], state[1])
+        weapon = self.known.get(key)
+        if weapon is None:
+            weapon = self.known[key] = Weapon(*key)
+        return weapon
+
+
+def _restore_character(state, weapons):
+    weapon = weapons.get(state['weapon'])
+    if 'inventory' in state:
+        character = Player(state['name'], weapon, state['element'], state['potions'])
+        character.inventory = {'potions': state['inventory']['potions'],
+                               'weapons': [weapons.get(w) for w in state['inventory']['weapons']]}
+    else:
+        character = Villain(state['name'], weapon, state['element'], state['potions'])
+    character.status = state['status']
+    character.max_health = state['max_health']
+    character.health = state['health']
+    character.strength = state['strength']
+    character.dexterity = state['dexterity']
+    character.focus = state['focus']
+    character.base_damage = state['base_damage']
+    character.level = state['level']
+    character.experience = state['experience']
+    character.status_effects = Effects(state['status_effects'])
+    character.combat_stats = combat_stats(character.focus, character.dexterity)
+    if character.status == "dead":
+        Character.alive_count -= 1
+    return character
+
+
+# Класс SavedRoom (Разобранное, но ещё не применённое состояние комнаты)
+class SavedRoom:
+    def __init__(self, state, weapons):
+        self._state = state
+        self.weapons = weapons
+
+    def state(self):
+        return self._state
+
+    def apply(self, room):
+        weapons = self.weapons
+        room.enemies = [(name, weapons.get(weapon), *rest) for name, weapon, *rest in self._state['enemies']]
+        room.loot = [weapons.get(w) for w in self._state['loot']]
+
+
+# Класс RawRoom (Запись комнаты из двоичного снимка, ещё не разобранная)
+class RawRoom:
+    def __init__(self, data):
+        self.data = data  # bytes записи комнаты
+        self.weapons = None  # Общий реестр оружий загружаемого снимка (задаёт restore)
+
+    def state(self):
+        return _read_room(_Reader(self.data))
+
+    def apply(self, room):
+        SavedRoom(self.state(), self.weapons).apply(room)
+
+
+def restore(state, world=create_rooms, rng=None):
+    """
+    Восстанавливает приключение из словаря capture().
+    - world: Фабрика мира (та же, что при сохранении); возвращает стартовую комнату или world.World.
+    - rng: Генератор, в который загружается сохранённое состояние (если оно есть в снимке).
+    Состояние комнат применяется при первом входе в них (Room.enter); текущая комната - сразу.
+    """
+    if state['version'] not in READABLE:
+        raise ValueError(f"Неподдерживаемая версия снимка: {state['version']}")
+    weapons = _Weapons()
+    start_room, room_by_key = _open_world(world)
+    player = _restore_character(state['player'], weapons)
+    adventure = Adventure(player, start_room)
+    adventure.state = state['state']
+    adventure.action = state['action']
+    adventure.won = state['won']
+    adventure.answers.weapon = NO_ANSWER if state['answer'] is None else state['answer']
+    adventure.pending_weapon = weapons.get(state['pending_weapon']) if state['pending_weapon'] else None
+    adventure.drops = [weapons.get(w) for w in state['drops']]
+
+    for index, saved in state['rooms'].items():
+        saved_room = room_by_key(int(index))
+        if isinstance(saved, RawRoom):
+            saved.weapons = weapons
+        else:
+            saved = SavedRoom(saved, weapons)
+        saved_room.saved = saved
+        adventure.touched.add(saved_room)
+    adventure.room = room_by_key(state['room'])
+    adventure.room.enter()
+
+    if state['battle'] is not None:
+        b = state['battle']
+        villains = [_restore_character(v, weapons) for v in b['villains']]
+        battle = adventure.battle = Battle(player, villains, b['group'], level=adventure.room.level)
+        battle.turn = b['turn']  # Живые злодеи и эффекты участников (Battle.roster, Battle.effects) - по их состоянию
+        battle.drops = [weapons.get(w) for w in b['drops']]
+
+    if rng is not None and state['rng'] is not None:
+        rng.setstate((random.Random.VERSION, tuple(state['rng'][:-1]), state['rng'][-1]))
+    return adventure
+
+
+# JSON
+def dumps_json(adventure, rng=None):
+    """
+    Снимок в JSON (для отладки). Возвращает строку.
+    """
+    state = capture(adventure, rng)
+    state['rooms'] = {i: saved if isinstance(saved, dict) else saved.state() for i, saved in state['rooms'].items()}
+    return json.dumps(state, ensure_ascii=False, indent=1)
+
+
+def loads_json(text, world=create_rooms, rng=None):
+    """
+    Приключение из JSON-снимка.
+    """
+    return restore(json.loads(text), world, rng)
+
+
+# Двоичный формат: целые числа - varint (со знаком - zigzag), строки - длина и UTF-8
+class _Writer:
+    def __init__(self):
+        self.buf = bytearray()
+
+    def uint(self, n):
+        buf = self.buf
+        while n > 0x7f:
+            buf.append((n & 0x7f) | 0x80)
+            n >>= 7
+        buf.append(n)
+
+    def int(self, n):
+        self.uint(n * 2 if n >= 0 else -n * 2 - 1)
+
+    def str(self, s):
+        data = s.encode()
+        self.uint(len(data))
+        self.buf += data
+
+    def code(self, value, values):
+        self.uint(values.index(value))
+
+    def weapon(self, state):
+        self.str(state[0])
+        self.int(state[1])
+
+    def weapons(self, states):
+        self.uint(len(states))
+        for state in states:
+            self.weapon(state)
+
+
+class _Reader:
+    def __init__(self, data, pos=0):
+        self.data = data
+        self.pos = pos
+
+    def uint(self):
+        data = self.data
+        n = shift = 0
+        while True:
+            byte = data[self.pos]
+            self.pos += 1
+            n |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return n
+            shift += 7
+
+    def int(self):
+        n = self.uint()
+        return n >> 1 if not n & 1 else -(n >> 1) - 1
+
+    def str(self):
+        length = self.uint()
+        start = self.pos
+        self.pos += length
+        return bytes(self.data[start:self.pos]).decode()
+
+    def take(self, length):
+        start = self.pos
+        self.pos += length
+        return bytes(self.data[start:self.pos])
+
+    def weapon(self):
+        return [self.str(), self.int()]
+
+    def weapons(self):
+        return [self.weapon() for _ in range(self.uint())]
+
+
+def _write_character(w, state):
+    w.str(state['name'])
+    w.weapon(state['weapon'])
+    w.str(state['element'])
+    w.code(state['status'], STATUSES)
+    for key in ('max_health', 'health', 'strength', 'dexterity', 'focus', 'base_damage', 'level', 'experience',
+                'potions'):
+        w.int(state[key])
+    w.uint(len(state['status_effects']))
+    for effect, ticks in state['status_effects']:
+        w.str(effect)
+        w.int(ticks)
+    inventory = state.get('inventory')
+    w.uint(inventory is not None)
+    if inventory is not None:
+        w.int(inventory['potions'])
+        w.weapons(inventory['weapons'])
+
+
+def _read_character(r):
+    state = {'name': r.str(), 'weapon': r.weapon(), 'element': r.str(), 'status': STATUSES[r.uint()]}
+    for key in ('max_health', 'health', 'strength', 'dexterity', 'focus', 'base_damage', 'level', 'experience',
+                'potions'):
+        state[key] = r.int()
+    state['status_effects'] = [[r.str(), r.int()] for _ in range(r.uint())]
+    if r.uint():
+        state['inventory'] = {'potions': r.int(), 'weapons': r.weapons()}
+    return state
+
+
+def _write_room(w, state):
+    w.uint(len(state['enemies']))
+    for name, weapon, element, potions, strength, dexterity, focus in state['enemies']:
+        w.str(name)
+        w.weapon(weapon)
+        w.str(element)
+        for value in (potions, strength, dexterity, focus):
+            w.int(value)
+    w.weapons(state['loot'])
+
+
+def _read_room(r):
+    enemies = [[r.str(), r.weapon(), r.str(), r.int(), r.int(), r.int(), r.int()] for _ in range(r.uint())]
+    return {'enemies': enemies, 'loot': r.weapons()}
+
+
+def dumps(adventure, rng=None):
+    """
+    Двоичный снимок приключения. Возвращает bytes.
+    - rng: Генератор случайных чисел, состояние которого сохраняется вместе с игрой (2,5 КБ).
+    """
+    state = capture(adventure, rng)
+    w = _Writer()
+    w.buf += MAGIC
+    w.uint(VERSION)
+    w.uint(FLAG_RNG if state['rng'] is not None else 0)
+    if state['rng'] is not None:
+        w.buf += array('I', state['rng'][:-1]).tobytes()
+        gauss = state['rng'][-1]
+        w.uint(gauss is not None)
+        if gauss is not None:
+            w.buf += array('d', [gauss]).tobytes()
+
+    w.code(state['state'], STATES)
+    w.code(state['action'], ACTIONS)
+    w.uint(state['won'])
+    w.uint(state['answer'] is not None)
+    if state['answer'] is not None:
+        w.int(state['answer'])
+    w.uint(state['room'])
+    w.uint(state['pending_weapon'] is not None)
+    if state['pending_weapon'] is not None:
+        w.weapon(state['pending_weapon'])
+    w.weapons(state['drops'])
+    _write_character(w, state['player'])
+
+    battle = state['battle']
+    w.uint(battle is not None)
+    if battle is not None:
+        w.uint(battle['group'])
+        w.uint(battle['turn'])
+        w.uint(len(battle['villains']))
+        for villain in battle['villains']:
+            _write_character(w, villain)
+        w.weapons(battle['drops'])
+
+    # Комнаты: номер, длина записи и сама запись - при загрузке записи не разбираются
+    w.uint(len(state['rooms']))
+    for index, saved in state['rooms'].items():
+        if isinstance(saved, RawRoom):
+            data = saved.data
+        else:
+            room_writer = _Writer()
+            _write_room(room_writer, saved if isinstance(saved, dict) else saved.state())
+            data = room_writer.buf
+        w.uint(index)
+        w.uint(len(data))
+        w.buf += data
+    return bytes(w.buf)
+
+
+def loads(data, world=create_rooms, rng=None):
+    """
+    Приключение из двоичного снимка.
+    - world: Фабрика мира (та же, что при сохранении).
+    - rng: Генератор, в который загружается сохранённое состояние (если оно есть в снимке).
+    """
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError("Это не снимок игры")
+    data = memoryview(data)
+    r = _Reader(data, len(MAGIC))
+    version = r.uint()
+    if version not in READABLE:
+        raise ValueError(f"Неподдерживаемая версия снимка: {version}")
+    flags = r.uint()
+    state = {'version': version, 'rng': None}
+    if flags & FLAG_RNG:
+        words = array('I')
+        words.frombytes(r.take(625 * words.itemsize))
+        gauss = None
+        if r.uint():
+            gauss = array('d', r.take(8))[0]
+        state['rng'] = list(words) + [gauss]
+
+    state['state'] = STATES[r.uint()]
+    state['action'] = ACTIONS[r.uint()]
+    state['won'] = bool(r.uint())
+    state['answer'] = r.int() if r.uint() else None
+    state['room'] = r.uint()
+    state['pending_weapon'] = r.weapon() if r.uint() else None
+    state['drops'] = r.weapons()
+    state['player'] = _read_character(r)
+
+    state['battle'] = None
+    if r.uint():
+        state['battle'] = {
+            'group': bool(r.uint()),
+            'turn': r.uint(),
+            'villains': [_read_character(r) for _ in range(r.uint())],
+        }
+        if version == 1:
+            for _ in range(r.uint()):  # Живые злодеи (не нужны: их даёт статус каждого злодея)
+                r.uint()
+        state['battle']['drops'] = r.weapons()
+
+    rooms = state['rooms'] = {}
+    for _ in range(r.uint()):
+        index = r.uint()
+        rooms[index] = RawRoom(r.take(r.uint()))
+    return restore(state, world, rng)
+
+
+# Проверка и замеры
+def _bot_line(adventure, rng):
+    # Простой игрок: идёт в случайную сторону, атакует первую цель (лечится при малом здоровье), берёт весь лут
+    if adventure.state == 'command':
+        return rng.choice(["идти на север", "идти на юг", "идти на восток", "идти на запад"])
+    if adventure.state == 'loot':
+        return "да"
+    player = adventure.player
+    if adventure.state == 'action' and player.health < player.max_health * 0.4 and player.potions:
+        return "2"
+    return "1"
+
+
+class _Transcript:
+    def __init__(self):
+        self.lines = []
+
+    def handle(self, event):
+        self.lines.append(format_event(event))
+
+
+def _play(steps, seed, save=None, load=None, world=create_rooms):
+    # Играет steps ответов бота; если заданы save/load - сохраняет и загружает игру перед каждым ответом
+    transcript = _Transcript()
+    saved_rng, saved_sinks = RPG.rng, RPG.sinks
+    RPG.rng, RPG.sinks = random.Random(seed), [transcript]
+    bot = random.Random(f"{seed}:bot")
+    try:
+        adventure = Adventure(start_room=_open_world(world)[0])
+        adventure.start()
+        for _ in range(steps):
+            if adventure.over:
+                break
+            if save is not None:
+                adventure = load(save(adventure, RPG.rng), world=world, rng=RPG.rng)
+            adventure.handle(_bot_line(adventure, bot))
+    finally:
+        RPG.rng, RPG.sinks = saved_rng, saved_sinks
+    return transcript.lines
+
+
+def verify_roundtrip(steps=300, seeds=range(20), world=create_rooms):
+    """
+    Сверяет игру без перерывов с игрой, которая сохраняется и загружается перед каждым ходом
+    (в двоичном формате и в JSON). Возвращает True, если весь вывод совпал.
+    - world: Фабрика мира (create_rooms или, например, lambda: world.load_world('cave.json')).
+    """
+    for seed in seeds:
+        reference = _play(steps, seed, world=world)
+        if _play(steps, seed, dumps, loads, world) != reference:
+            return False
+        if _play(steps, seed, dumps_json, loads_json, world) != reference:
+            return False
+    return True
+
+
+def snapshot_benchmark(steps=300, seed=0):
+    """
+    Размер снимков и время сохранения/загрузки на каждом ходу одной игры.
+    Возвращает словарь {формат: {'bytes': средний размер, 'save_us': ..., 'load_us': ...}}.
+    """
+    formats = {
+        'binary': (lambda a, rng: dumps(a), loads),
+        'binary+rng': (dumps, loads),
+        'json': (lambda a, rng: dumps_json(a), loads_json),
+    }
+    totals = {name: [0, 0.0, 0.0] for name in formats}
+    count = 0
+
+    def measure(adventure, rng):
+        nonlocal count
+        count += 1
+        for name, (save, load) in formats.items():
+            start = time.perf_counter()
+            data = save(adventure, rng)
+            middle = time.perf_counter()
+            load(data, rng=random.Random())
+            end = time.perf_counter()
+            total = totals[name]
+            total[0] += len(data)
+            total[1] += middle - start
+            total[2] += end - middle
+        return adventure
+
+    _play(steps, seed, lambda adventure, rng: measure(adventure, rng), lambda adventure, world, rng: adventure)
+    return {name: {'bytes': size / count, 'save_us': save * 1e6 / count, 'load_us': load * 1e6 / count}
+            for name, (size, save, load) in totals.items()}
+
+
+if __name__ == "__main__":
+    print("Сохранение/загрузка на каждом ходу не меняет игру:", verify_roundtrip())
+    for name, result in snapshot_benchmark().items():
+        print(f"{name:>10}: {result['bytes']:7.0f} байт, сохранение {result['save_us']:6.1f} мкс, "
+              f"загрузка {result['load_us']:6.1f} мкс")
@@ -0,0 +1,9 @@
+# Общая настройка тестов: модули игры лежат в корне репозитория (RPG.py, batch_combat.py, ...),
+# поэтому корень добавляется в sys.path - тесты запускаются как python -m pytest из любого каталога.
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
@@ -0,0 +1,18 @@
+# Тесты batch_combat.py: пакетный движок против объектной боевой системы (simulation.run_batch)
+
+import pytest
+
+from RPG import Weapon
+from batch_combat import cross_check
+
+GOBLIN_AXE = Weapon("Гоблинский топор", 15)
+BOSS_HAMMER = Weapon("Молот босса", 30)
+GOBLIN = ("Гоблин", GOBLIN_AXE, 'neutral', 0, 3, 1, 5)
+GOBLIN_TRIO = [("Гоблин", GOBLIN_AXE, 'neutral', 0, 2, 6, 1)] * 3
+BOSS = ("Главный Босс", BOSS_HAMMER, 'fire', 2, 8, 4, 7)
+
+
+@pytest.mark.parametrize('enemies', [[GOBLIN], GOBLIN_TRIO, [BOSS]], ids=['goblin', 'goblin_trio', 'boss'])
+def test_cross_check(enemies):
+    result = cross_check(enemies, fights=2000, seed=1)
+    assert result['ok'], result
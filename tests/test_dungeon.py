@@ -0,0 +1,14 @@
+# Тесты dungeon.py: кэш комнат и проверочные построения не мешают друг другу
+
+from dungeon import Dungeon, room_coords
+
+
+def test_layout_of_cached_room_keeps_eviction_working():
+    dungeon = Dungeon(seed=3, cache_size=2)
+    start = dungeon.start_room()
+    dungeon.layout(*room_coords(start.key))  # Комната в кэше: её счётчик должен остаться
+    for direction in list(start.exits.targets)[:3]:
+        dungeon.room(start.exits.targets[direction])  # Вытесняет стартовую комнату из кэша
+    dungeon.layout(5, 5)  # Комнаты нет в памяти: счётчик не остаётся
+    assert start.key not in dungeon.cache
+    assert dungeon.room(start.key).name == start.name
@@ -0,0 +1,134 @@
+# Тесты effects.py: урон и лечение за тик, правила повторного наложения, пропуск хода скованного персонажа
+# и эффекты оружия при попадании (loot.json, weapon_effects)
+
+import random
+from types import SimpleNamespace
+
+import pytest
+
+import RPG
+import loot
+import odds
+from RPG import Battle, Player, Villain, Weapon
+from effects import BURN, Effects
+
+
+@pytest.fixture
+def events():
+    # Все события боя по порядку; генератор RPG засеян, чтобы бой не зависел от других тестов
+    log = []
+    saved = RPG.rng, RPG.sinks
+    RPG.rng, RPG.sinks = random.Random(0), [SimpleNamespace(handle=log.append)]
+    try:
+        yield log
+    finally:
+        RPG.rng, RPG.sinks = saved
+
+
+def _dummy(strength=100):
+    return Villain("Манекен", Weapon("Палка", 1), 'neutral', 0, strength, 0, 0)
+
+
+def _emit(kind, actor, target=None, value=None, detail=None):
+    return kind, value
+
+
+def test_tick_damage_and_heal():
+    dummy = _dummy()
+    effects = dummy.status_effects
+    effects.add('burn')
+    effects.add('poison')
+    effects.add('poison')
+    health = dummy.health
+    ticks = effects.tick(dummy, _emit)
+    assert ticks == [('burn_tick', 5), ('poison_tick', 2 * 3)]
+    assert dummy.health == health - 5 - 6
+
+    dummy.health = dummy.max_health - 3
+    effects.clear()
+    effects.add('regen')
+    assert effects.tick(dummy, _emit) == [('regen_tick', 3)]  # Не выше max_health
+    assert dummy.health == dummy.max_health
+
+
+def test_stack_keeps_independent_timers():
+    effects = Effects()
+    effects.stack(BURN)
+    effects.tick(_dummy(), _emit)
+    effects.add('burn')
+    assert effects.remaining('burn') == [(2, 1), (3, 1)]
+
+
+def test_intensify_caps_stacks_and_refreshes_timer():
+    dummy = _dummy()
+    effects = dummy.status_effects
+    effects.add('poison')
+    effects.tick(dummy, _emit)
+    for _ in range(10):
+        effects.add('poison')
+    assert effects.remaining('poison') == [(4, 5)]
+
+
+def test_refresh_keeps_one_stack():
+    dummy = _dummy()
+    effects = dummy.status_effects
+    effects.add('regen')
+    effects.tick(dummy, _emit)
+    effects.add('regen')
+    assert effects.remaining('regen') == [(3, 1)]
+    effects.add('freeze')
+    effects.hold(dummy, _emit)
+    effects.add('freeze')
+    assert effects.remaining('freeze') == [(2, 1)]
+
+
+def test_ignore_while_active():
+    dummy = _dummy()
+    effects = dummy.status_effects
+    assert effects.add('stun')
+    assert not effects.add('stun')
+    assert effects.state() == [['stun', 1]]
+    assert effects.hold(dummy, _emit)
+    assert effects.add('stun')
+
+
+def test_frozen_player_skips_turns(events):
+    player = Player("Герой", Weapon("Меч", 10), strength=20)
+    villain = Villain("Гоблин", Weapon("Палка", 1))
+    battle = Battle(player, [villain], group=False)
+    player.add_effect('freeze', villain)
+    assert battle.advance()
+    assert battle.turn == 4  # Два хода игрока пропущены, злодей походил дважды
+    kinds = [(e.kind, e.actor) for e in events]
+    assert kinds.count(('held', player)) == 2 and ('freeze_end', player) in kinds
+    assert not player.status_effects
+
+
+def test_stunned_villain_skips_turn(events):
+    player = Player("Герой", Weapon("Меч", 10), strength=20)
+    villain = Villain("Гоблин", Weapon("Палка", 1))
+    battle = Battle(player, [villain], group=True)
+    assert battle.advance()
+    villain.add_effect('stun', player)
+    events.clear()
+    battle.player_turn(None)
+    assert [(e.kind, e.actor) for e in events] == [('skip', player), ('held', villain), ('stun_end', villain)]
+
+
+def test_weapon_applies_effects_on_hit(events, monkeypatch):
+    assert ('poison', 0.3, False) in loot.WEAPON_EFFECTS["Короткий лук"]
+    monkeypatch.setitem(loot.WEAPON_EFFECTS, "Жезл", (('poison', 1.0, False), ('regen', 1.0, True)))
+    attacker = Player("Герой", Weapon("Жезл", 1), strength=20)
+    defender = _dummy()
+    attacker.attack(defender)
+    assert defender.status_effects.remaining('poison') == [(4, 1)]
+    assert attacker.status_effects.remaining('regen') == [(3, 1)]
+    assert [e.kind for e in events if e.kind in ('poison', 'regen')] == ['poison', 'regen']
+
+
+def test_room_odds_samples_fights_with_weapon_effects():
+    archer = ("Гоблин-лучник", Weapon("Короткий лук", 12), 'air', 0, 2, 6, 3)
+    player = Player("Авантюрист", Weapon("Меч", 20), strength=10)
+    with pytest.raises(ValueError):
+        odds.fight_odds(player, Villain(*archer))
+    assert odds.room_odds(SimpleNamespace(enemies=[archer]), player, fights=100).sampled
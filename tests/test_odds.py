@@ -0,0 +1,53 @@
+# Тесты odds.py: точные шансы решателя против выборки simulation.run_batch (как verify_against_sampling, но быстро)
+
+import math
+
+from RPG import Player, Villain
+from odds import MATCHUPS, fight_odds
+from simulation import run_batch
+
+FIGHTS = 2000
+SIGMAS = 4.0
+
+
+def test_exact_odds_match_sampling():
+    name, stats, enemy = MATCHUPS[0]  # Гоблин у входа: один слабый враг
+
+    def make_player():
+        return Player("Авантюрист", *stats)
+
+    odds = fight_odds(make_player(), Villain(*enemy), epsilon=1e-6)
+    batch = run_batch([enemy], FIGHTS, seed=0, make_player=make_player)
+
+    win = odds.win + odds.unresolved / 2
+    win_error = math.sqrt(win * (1 - win) / FIGHTS)
+    assert abs(batch.win_rate - win) <= SIGMAS * win_error + odds.unresolved / 2, (name, batch.win_rate, win)
+
+    sample_turns = sum(batch.turns) / FIGHTS
+    turns_error = math.sqrt(sum((t - sample_turns) ** 2 for t in batch.turns) / FIGHTS / FIGHTS)
+    assert (abs(sample_turns - odds.turns) <= SIGMAS * turns_error + odds.unresolved * max(batch.turns)), \
+        (name, sample_turns, odds.turns)
+
+
+def test_room_hint_is_cached_and_portable():
+    import pickle
+
+    import odds
+    from server import Session
+    from text_adventure import create_rooms
+
+    room = create_rooms().exits['север']  # Входная пещера: один гоблин
+    player = Player("Авантюрист", *MATCHUPS[0][1])
+    request = odds.hint_request(room, player)
+    assert pickle.loads(pickle.dumps(request)) == request  # Запрос уходит в процесс подсказок сервера
+
+    hint = odds.describe_room(room, player)
+    assert hint.startswith(room.name) and odds.cached_hint(request) == hint
+
+    # На сервере команда только оставляет запрос: подсказку считает GameServer вне цикла событий
+    session = Session(seed=0, delay=0)
+    session.start()
+    output = session.handle("оценить на север")
+    assert not any(text.startswith(room.name + ":") for text, _ in output)
+    assert session.take_hint() == odds.hint_request(room, session.adventure.player)
+    assert session.take_hint() is None
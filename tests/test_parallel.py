@@ -0,0 +1,15 @@
+# Тесты parallel.py: параллельный прогон побитово совпадает с simulation.run_batch
+
+from RPG import Weapon
+from ai import GreedyPolicy
+from parallel import run_parallel
+from simulation import run_batch
+
+GOBLIN_TRIO = [("Гоблин", Weapon("Гоблинский топор", 15), 'neutral', 0, 2, 6, 1)] * 3
+
+
+def test_villain_policy_reaches_workers():
+    reference = run_batch(GOBLIN_TRIO, 200, seed=5, villain_policy=GreedyPolicy())
+    batch = run_parallel(GOBLIN_TRIO, 200, seed=5, workers=2, shard_size=50, villain_policy=GreedyPolicy())
+    assert batch.summary() == reference.summary()
+    assert batch.summary() != run_batch(GOBLIN_TRIO, 200, seed=5).summary()  # Политика злодеев на что-то влияет
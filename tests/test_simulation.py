@@ -0,0 +1,23 @@
+# Тесты simulation.py: безголовые бои не портят общее состояние боевой системы
+
+import random
+
+import RPG
+from RPG import Weapon
+from simulation import simulate_fight
+
+GOBLIN = ("Гоблин", Weapon("Гоблинский топор", 15), 'neutral', 0, 3, 1, 5)
+
+
+def test_simulate_fight_restores_rng():
+    live = random.Random(42)
+    saved = RPG.rng
+    RPG.rng = live
+    try:
+        first = simulate_fight([GOBLIN], seed=7)
+        assert RPG.rng is live
+        assert live.getstate() == random.Random(42).getstate()  # Бой не тратил числа живого генератора
+    finally:
+        RPG.rng = saved
+    second = simulate_fight([GOBLIN], seed=7)
+    assert (first.won, first.turns, first.damage_dealt) == (second.won, second.turns, second.damage_dealt)
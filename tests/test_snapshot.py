@@ -0,0 +1,51 @@
+# Тесты snapshot.py: сохранение посреди группового боя и чтение снимков прежней версии
+
+import json
+import random
+
+import pytest
+
+import RPG
+import snapshot
+from text_adventure import Adventure
+
+
+@pytest.fixture
+def group_battle():
+    # Игра ботом до первого хода игрока в групповом бою
+    saved = RPG.rng, RPG.sinks
+    RPG.rng, RPG.sinks = random.Random(1), []
+    bot = random.Random("1:bot")
+    try:
+        for _ in range(20):
+            adventure = Adventure()
+            adventure.start()
+            for _ in range(300):
+                battle = adventure.battle
+                if battle is not None and battle.group and adventure.state == 'action':
+                    yield adventure
+                    return
+                if adventure.over:
+                    break
+                adventure.handle(snapshot._bot_line(adventure, bot))
+        pytest.fail("бот не дошёл до группового боя")
+    finally:
+        RPG.rng, RPG.sinks = saved
+
+
+def _alive(adventure):
+    return list(adventure.battle.roster.indices())
+
+
+def test_roundtrip_rebuilds_roster(group_battle):
+    state = snapshot.capture(group_battle)
+    assert 'alive' not in state['battle']
+    assert _alive(snapshot.loads(snapshot.dumps(group_battle))) == _alive(group_battle)
+    assert _alive(snapshot.loads_json(snapshot.dumps_json(group_battle))) == _alive(group_battle)
+
+
+def test_version_1_is_still_readable(group_battle):
+    state = json.loads(snapshot.dumps_json(group_battle))
+    state['version'] = 1
+    state['battle']['alive'] = _alive(group_battle)  # Поле версии 1: читается, но не нужно
+    assert _alive(snapshot.loads_json(json.dumps(state))) == _alive(group_battle)
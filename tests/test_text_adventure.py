@@ -0,0 +1,41 @@
+# Тесты text_adventure.py: построчное управление игрой
+
+import pytest
+
+import RPG
+from RPG import Weapon
+from combat_log import CounterSink
+from text_adventure import Adventure
+
+
+@pytest.fixture
+def events():
+    saved = RPG.sinks
+    counter = RPG.sinks = [CounterSink()]
+    try:
+        yield counter[0].counts
+    finally:
+        RPG.sinks = saved
+
+
+@pytest.mark.parametrize('line', ['abc', '', '7'])
+def test_invalid_weapon_choice_keeps_weapon(events, line):
+    adventure = Adventure()
+    adventure.start()
+    player = adventure.player
+    fists = player.weapon
+    adventure.pending_weapon = Weapon("Супер", 99)
+    adventure.state = 'drop_weapon'
+    adventure.handle(line)
+    assert player.weapon is fists
+    assert events['equip_failed'] == 1
+    assert [w.name for w in player.inventory['weapons']] == [fists.name, "Супер"]
+
+
+def test_weapon_choice_by_number(events):
+    adventure = Adventure()
+    adventure.start()
+    adventure.pending_weapon = Weapon("Супер", 99)
+    adventure.state = 'drop_weapon'
+    adventure.handle('2')
+    assert adventure.player.weapon.name == "Супер"
@@ -1,17 +1,27 @@
 # text_adventure.py - Сценарий текстовой консольной игры
 
-from RPG import Weapon, Player, Villain, simulate_battle, simulate_group_battle
-
-import random
+from RPG import (Weapon, Player, Villain, Battle, AnswerPolicy, emit, weapon_list, parse_choice,
+                 ACTIONS, ACTION_MENU, ACTION_PROMPT, TARGET_PROMPT, SHIELD_TARGET_PROMPT, WEAPON_PROMPT)
 
 # Класс Room для текстовой игры
 class Room:
-    def __init__(self, name, description, enemies=None, loot=None, exits=None):
+    def __init__(self, name, description, enemies=None, loot=None, exits=None, key=None, level=0):
         self.name = name
         self.description = description
         self.enemies = enemies or []  # Список кортежей (имя, оружие, элемент, potions, strength, dexterity, focus)
         self.loot = loot or []  # Список Weapon
         self.exits = exits or {}  # Словарь выходов: направление -> комната
+        self.key = key  # Номер комнаты в мире из файла (см. world.py) или None
+        self.level = level  # Уровень встречи: уровень лута с побеждённых здесь злодеев (см. Battle.finish)
+        self.saved = None  # Отложенное состояние из сохранения (см. snapshot.py)
+
+    def enter(self):
+        """
+        Вход в комнату: применяет отложенное сохранённое состояние, если оно есть.
+        """
+        if self.saved is not None:
+            saved, self.saved = self.saved, None
+            saved.apply(self)
 
 
 # Создание комнат
@@ -49,73 +59,234 @@ def create_rooms():
     return room0  # Стартовая комната
 
 
-# Основная игра
-def play_game():
-    # Начальное оружие игрока
-    fists = Weapon("Кулаки", 5)
-    player = Player("Авантюрист", fists, element='neutral', potions=3)
+COMMANDS_HELP = "Команды: идти на [направление], оценить [направление], инвентарь, выход."
+LOOT_PROMPT = "Взять? (да/нет): "
+COMMAND_PROMPT = "> "
 
-    current_room = create_rooms()
+# Вопрос, который игра задаёт в каждом состоянии
+PROMPTS = {
+    'action': ACTION_PROMPT,
+    'target': TARGET_PROMPT,
+    'shield_target': SHIELD_TARGET_PROMPT,
+    'weapon': WEAPON_PROMPT,
+    'drop_weapon': WEAPON_PROMPT,
+    'loot': LOOT_PROMPT,
+    'loot_weapon': WEAPON_PROMPT,
+    'command': COMMAND_PROMPT,
+}
 
-    print("Добро пожаловать в Текстовую RPG-Игру!")
-    print("Команды: идти на [направление], инвентарь, выход.")
 
-    while player.status == "alive":
-        print(f"\n{current_room.name}: {current_room.description}")
-        won = 0
-        # Враги: создаём Villain и сражаемся с использованием боевой системы
-        villains = []
-        for enemy_data in current_room.enemies:
-            name, weapon, element, potions, strength, dexterity, focus = enemy_data
-            villain = Villain(name, weapon, element, potions, strength, dexterity, focus)
-            villains.append(villain)
+def say(text):
+    # Текст игры идёт через те же получатели, что и события боя (консоль, сессия сервера...)
+    emit('text', None, detail=text)
+
+
+# Класс Adventure (Приключение, управляемое построчным вводом)
+class Adventure:
+    """
+    Состояние одной игры. Вместо того чтобы самой вызывать input(), игра ждёт следующую строку:
+    prompt() - текущий вопрос, handle(line) - ответ на него. Так одну и ту же игру ведут
+    консоль (play_game), сервер сессий и повтор записанных сессий.
+    """
+
+    def __init__(self, player=None, start_room=None):
+        """
+        - player: Объект Player (по умолчанию - стартовый авантюрист).
+        - start_room: Стартовая комната (по умолчанию - create_rooms()).
+        """
+        # Начальное оружие игрока
+        self.player = player or Player("Авантюрист", Weapon("Кулаки", 5), element='neutral', potions=3)
+        self.answers = AnswerPolicy()  # Ответы на вопросы боевой системы (выбор оружия)
+        self.player.policy = self.answers
+        self.room = start_room or create_rooms()
+        self.start_room = self.room  # Отсюда нумеруются комнаты при сохранении
+        self.touched = set()  # Комнаты, состояние которых изменилось (враги побеждены, лут взят)
+        self.state = None  # Текущий вопрос (ключ PROMPTS) или None - игра окончена
+        self.battle = None
+        self.action = None  # Выбранное действие, ждущее цели или оружия
+        self.won = False  # Был ли в текущей комнате выигран бой
+        self.pending_weapon = None  # Найденное оружие, ждущее выбора
+        self.drops = []  # Оружие, выпавшее в последнем бою и ещё не предложенное игроку
+        self.defer_hints = False  # Подсказку "оценить" считает тот, кто ведёт игру (сервер - вне цикла событий)
+        self.hint_request = None  # Отложенный запрос подсказки (odds.hint_request), если defer_hints
+
+    @property
+    def over(self):
+        return self.state is None
+
+    def prompt(self):
+        return PROMPTS[self.state]
+
+    def start(self):
+        say("Добро пожаловать в Текстовую RPG-Игру!")
+        say(COMMANDS_HELP)
+        self.enter_room()
 
+    def handle(self, line):
+        """
+        Ответ игрока на текущий вопрос.
+        """
+        handler = getattr(self, '_on_' + self.state)
+        handler(line.strip())
+
+    def _game_over(self):
+        say("Игра окончена.")
+        self.state = None
+
+    # Комната
+    def enter_room(self):
+        if self.player.status != "alive":
+            self._game_over()
+            return
+        room = self.room
+        room.enter()
+        say(f"\n{room.name}: {room.description}")
+        self.won = False
+        # Враги: создаём Villain и сражаемся с использованием боевой системы
+        villains = [Villain(*enemy_data) for enemy_data in room.enemies]
         if villains:
-            if len(villains) == 1:
-                won = simulate_battle(player, villains[0])
-            else:
-                won = simulate_group_battle(player, villains)
-            if not won:
-                print("Игра окончена.")
-                return
-            current_room.enemies = []  # Удаляем побеждённых
-
-        # Лут
-        for item in current_room.loot[:]:
-            print(f"Вы нашли {item.name}!")
-            take = input("Взять? (да/нет): ")
-            if take.lower() == 'да':
-                player.equip_weapon(item)
-            current_room.loot.remove(item)
-
-        if(won):
-            print(f"\n{current_room.name}: {current_room.description}")
-            print("Команды: идти на [направление], инвентарь, выход.")
-
-        # Команда
-        command = input("> ").lower().split()
+            self.battle = Battle(self.player, villains, group=len(villains) > 1, level=room.level)
+            self.battle.start()
+            self._continue_battle()
+        else:
+            self._offer_loot()
+
+    # Бой
+    def _continue_battle(self):
+        battle = self.battle
+        if battle.advance():
+            say(ACTION_MENU)
+            self.state = 'action'
+            return
+        if not battle.finish():
+            self._game_over()
+            return
+        self.room.enemies = []  # Удаляем побеждённых
+        self.touched.add(self.room)
+        self.won = True
+        self.battle = None
+        self.drops = list(battle.drops)
+        self._offer_drop()
+
+    def _on_action(self, line):
+        battle = self.battle
+        self.action = ACTIONS.get(line)
+        if battle.group and self.action in ('attack', 'shield') and battle.targets():
+            self.state = 'shield_target' if self.action == 'shield' else 'target'
+        elif self.action == 'equip' and len(self.player.inventory['weapons']) > 1:
+            say(weapon_list(self.player.inventory['weapons']))
+            self.state = 'weapon'
+        else:
+            battle.player_turn(self.action)
+            self._continue_battle()
+
+    def _on_target(self, line):
+        self.battle.player_turn(self.action, parse_choice(line))
+        self._continue_battle()
+
+    _on_shield_target = _on_target
+
+    def _on_weapon(self, line):
+        self.answers.weapon = parse_choice(line)
+        self.battle.player_turn('equip')
+        self._continue_battle()
+
+    # Лут
+    def _offer_drop(self):
+        # Оружие, выпавшее из злодеев: сразу предлагаем экипировать
+        if not self.drops:
+            self._offer_loot()
+            return
+        self.pending_weapon = self.drops.pop(0)
+        say(weapon_list(self.player.inventory['weapons'] + [self.pending_weapon]))
+        self.state = 'drop_weapon'
+
+    def _on_drop_weapon(self, line):
+        self.answers.weapon = parse_choice(line)
+        self.player.equip_weapon(self.pending_weapon)
+        self._offer_drop()
+
+    def _offer_loot(self):
+        if self.room.loot:
+            say(f"Вы нашли {self.room.loot[0].name}!")
+            self.state = 'loot'
+            return
+        if self.won:
+            say(f"\n{self.room.name}: {self.room.description}")
+            say(COMMANDS_HELP)
+        self.state = 'command'
+
+    def _on_loot(self, line):
+        item = self.room.loot[0]
+        if line.lower() == 'да':
+            say(weapon_list(self.player.inventory['weapons'] + [item]))
+            self.state = 'loot_weapon'
+            return
+        self.room.loot.remove(item)
+        self.touched.add(self.room)
+        self._offer_loot()
+
+    def _on_loot_weapon(self, line):
+        item = self.room.loot.pop(0)
+        self.touched.add(self.room)
+        self.answers.weapon = parse_choice(line)
+        self.player.equip_weapon(item)
+        self._offer_loot()
+
+    # Команды
+    def _on_command(self, line):
+        command = line.lower().split()
         if not command:
-            continue
+            self.enter_room()
+            return
         if command[0] == 'идти':
-            direction = command[2]
-            if direction in current_room.exits:
-                current_room = current_room.exits[direction]
+            direction = command[-1]
+            if len(command) > 1 and direction in self.room.exits:
+                self.room = self.room.exits[direction]
+            else:
+                say("Нельзя пойти туда.")
+        elif command[0] == 'оценить':
+            # Шансы против врагов соседней комнаты - до того, как в неё войти
+            direction = command[-1]
+            if len(command) > 1 and direction in self.room.exits:
+                import odds  # Решатель загружается только по этой команде, а не при старте игры
+                room = self.room.exits[direction]
+                room.enter()  # Отложенное состояние из сохранения - враги могли быть уже побеждены
+                if self.defer_hints:
+                    self.hint_request = odds.hint_request(room, self.player)
+                else:
+                    say(odds.describe_room(room, self.player))
             else:
-                print("Нельзя пойти туда.")
+                say("Нельзя пойти туда.")
         elif command[0] == 'инвентарь':
-            print("Инвентарь:")
-            for item in player.inventory['weapons']:
-                print(f"- {item.name} (урон: {item.damage})")
-            print(f"Зелий: {player.potions}")
+            say("Инвентарь:")
+            for item in self.player.inventory['weapons']:
+                say(f"- {item.name} (урон: {item.damage})")
+            say(f"Зелий: {self.player.potions}")
         elif command[0] == 'выход':
-            print("Выход из игры.")
+            say("Выход из игры.")
+            self.state = None
             return
         else:
-            print("Неверная команда.")
+            say("Неверная команда.")
+        self.enter_room()
 
-    print("Игра окончена.")
+
+# Основная игра
+def play_game(start_room=None):
+    adventure = Adventure(start_room=start_room)
+    adventure.start()
+    while not adventure.over:
+        adventure.handle(input(adventure.prompt()))
 
 
 # Запуск
 if __name__ == "__main__":
-    play_game()
\ No newline at end of file
+    # python text_adventure.py                  - играть
+    # python text_adventure.py --record FILE    - играть с записью сессии (см. replay.py)
+    import sys
+    if len(sys.argv) > 2 and sys.argv[1] == '--record':
+        from replay import record
+        record(sys.argv[2])
+    else:
+        play_game()
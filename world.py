@@ -0,0 +1,318 @@
+# world.py - Миры из файлов данных
+#
+# Исходный мир - JSON (пример - cave.json, та же пещера, что в create_rooms):
+#   {"start": "ключ стартовой комнаты",
+#    "weapons": {"ключ": {"name": ..., "damage": ...}},
+#    "enemies": {"ключ": {"name": ..., "weapon": "ключ оружия", "element": ..., "potions": ...,
+#                         "strength": ..., "dexterity": ..., "focus": ...}},
+#    "rooms": {"ключ": {"name": ..., "description": ..., "enemies": ["ключ врага", ...],
+#                       "loot": ["ключ оружия", ...], "exits": {"направление": "ключ комнаты"}}}}
+#
+# compile_world проверяет все ссылки и переводит мир в индексированный файл: заголовок с шаблонами
+# оружий и врагов, таблица смещений и по записи на комнату, где выходы - пары (направление, номер комнаты).
+# WorldData открывает такой файл через mmap и при старте читает только заголовок, поэтому время запуска
+# и память не зависят от размера мира. World - мир одной игры: объекты Room создаются при первом входе.
+
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+import tracemalloc
+from array import array
+
+from RPG import Weapon
+from text_adventure import Room
+
+MAGIC = b'RPGW'
+VERSION = 1
+ENEMY_FIELDS = ('weapon', 'element', 'potions', 'strength', 'dexterity', 'focus')
+ENEMY_DEFAULTS = {'element': 'neutral', 'potions': 0, 'strength': 5, 'dexterity': 5, 'focus': 5}
+
+
+# Компиляция исходного мира
+def compile_world(source):
+    """
+    Переводит исходный мир (словарь формата выше) в индексированный формат.
+    Все ссылки (оружия, враги, выходы, стартовая комната) проверяются по индексам ключей;
+    при ошибке - ValueError с указанием места.
+    Возвращает bytes.
+    """
+    weapon_index = {key: i for i, key in enumerate(source.get('weapons', {}))}
+    enemy_index = {key: i for i, key in enumerate(source.get('enemies', {}))}
+    room_index = {key: i for i, key in enumerate(source['rooms'])}
+    directions = {}
+
+    def lookup(index, key, what, where):
+        try:
+            return index[key]
+        except KeyError:
+            raise ValueError(f"{where}: неизвестный {what} {key!r}") from None
+
+    weapons = [[w['name'], w['damage']] for w in source.get('weapons', {}).values()]
+    enemies = []
+    for key, enemy in source.get('enemies', {}).items():
+        enemy = dict(ENEMY_DEFAULTS, **enemy)
+        enemies.append([enemy['name'], lookup(weapon_index, enemy['weapon'], "оружие", f"враг {key}")]
+                       + [enemy[field] for field in ENEMY_FIELDS[1:]])
+    start = lookup(room_index, source['start'], "ключ комнаты", "start")
+
+    records = []
+    for key, room in source['rooms'].items():
+        where = f"комната {key}"
+        exits = []
+        for direction, target in room.get('exits', {}).items():
+            exits += [directions.setdefault(direction, len(directions)), lookup(room_index, target, "выход", where)]
+        records.append(json.dumps([room['name'], room['description'],
+                                   [lookup(enemy_index, e, "враг", where) for e in room.get('enemies', [])],
+                                   [lookup(weapon_index, w, "лут", where) for w in room.get('loot', [])],
+                                   exits], ensure_ascii=False, separators=(',', ':')).encode())
+
+    header = json.dumps({'start': start, 'rooms': len(records), 'weapons': weapons, 'enemies': enemies,
+                         'directions': list(directions), 'byteorder': sys.byteorder},
+                        ensure_ascii=False, separators=(',', ':')).encode()
+    header += b' ' * (-(len(MAGIC) + 5 + len(header)) % 8)  # Таблица смещений выровнена по 8 байт
+    offsets = array('Q', [0])
+    for record in records:
+        offsets.append(offsets[-1] + len(record))
+    return b''.join([MAGIC, struct.pack('<BI', VERSION, len(header)), header, offsets.tobytes()] + records)
+
+
+def compile_file(source_path, world_path):
+    """
+    Компилирует JSON-файл мира в индексированный файл.
+    """
+    with open(source_path, encoding='utf-8') as f:
+        data = compile_world(json.load(f))
+    with open(world_path, 'wb') as f:
+        f.write(data)
+
+
+# Класс WorldData (Скомпилированный мир: общий и неизменяемый)
+class WorldData:
+    """
+    Шаблоны оружий и врагов интернируются: одинаковые враги во всех комнатах - один и тот же кортеж
+    в формате Room.enemies, оружия - одни и те же объекты Weapon. Один WorldData можно делить
+    между многими играми (например, сессиями сервера).
+    """
+
+    def __init__(self, source):
+        """
+        - source: Путь к скомпилированному файлу (открывается через mmap), путь к исходному JSON
+          или bytes от compile_world.
+        """
+        if isinstance(source, str):
+            with open(source, 'rb') as f:
+                if f.read(len(MAGIC)) == MAGIC:
+                    source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                else:
+                    f.seek(0)
+                    source = compile_world(json.loads(f.read().decode('utf-8')))
+        self.buffer = source
+        data = memoryview(source)
+        if bytes(data[:len(MAGIC)]) != MAGIC:
+            raise ValueError("Это не файл мира")
+        version, header_size = struct.unpack_from('<BI', data, len(MAGIC))
+        if version != VERSION:
+            raise ValueError(f"Неподдерживаемая версия мира: {version}")
+        start = len(MAGIC) + 5
+        header = json.loads(bytes(data[start:start + header_size]).decode('utf-8'))
+
+        self.start = header['start']
+        self.size = header['rooms']
+        self.directions = header['directions']
+        self.weapons = [Weapon(name, damage) for name, damage in header['weapons']]
+        self.enemies = [(name, self.weapons[weapon], *rest) for name, weapon, *rest in header['enemies']]
+
+        table = start + header_size
+        records = table + (self.size + 1) * 8
+        if header['byteorder'] == sys.byteorder:
+            self.offsets = data[table:records].cast('Q')
+        else:
+            self.offsets = array('Q', data[table:records])
+            self.offsets.byteswap()
+        self.records = data[records:]
+
+    def __len__(self):
+        return self.size
+
+    def record(self, key):
+        """
+        Запись комнаты номер key: (название, описание, номера врагов, номера оружий, выходы).
+        """
+        return json.loads(bytes(self.records[self.offsets[key]:self.offsets[key + 1]]).decode('utf-8'))
+
+
+# Класс Exits (Выходы комнаты: направление -> номер комнаты)
+class Exits:
+    """
+    Ведёт себя как словарь выходов Room.exits, но хранит номера комнат, а комнату
+    создаёт только при обращении к выходу (то есть когда игрок туда идёт).
+    """
+    __slots__ = ('world', 'targets')
+
+    def __init__(self, world, targets):
+        self.world = world
+        self.targets = targets  # Направление -> номер комнаты
+
+    def __contains__(self, direction):
+        return direction in self.targets
+
+    def __getitem__(self, direction):
+        return self.world.room(self.targets[direction])
+
+    def __iter__(self):
+        return iter(self.targets)
+
+    def __len__(self):
+        return len(self.targets)
+
+    def keys(self):
+        return self.targets.keys()
+
+    def values(self):
+        return [self.world.room(key) for key in self.targets.values()]
+
+    def items(self):
+        return [(direction, self.world.room(key)) for direction, key in self.targets.items()]
+
+
+# Класс World (Мир одной игры)
+class World:
+    def __init__(self, data):
+        """
+        - data: WorldData, путь к файлу мира или исходный JSON-словарь.
+        """
+        if isinstance(data, dict):
+            data = WorldData(compile_world(data))
+        elif not isinstance(data, WorldData):
+            data = WorldData(data)
+        self.data = data
+        self.rooms = {}  # Созданные комнаты: номер -> Room (их состояние меняется по ходу игры)
+
+    def __len__(self):
+        return len(self.data)
+
+    def start_room(self):
+        return self.room(self.data.start)
+
+    def room(self, key):
+        """
+        Комната номер key (создаётся при первом обращении).
+        """
+        room = self.rooms.get(key)
+        if room is None:
+            data = self.data
+            name, description, enemies, loot, exits = data.record(key)
+            targets = {data.directions[exits[i]]: exits[i + 1] for i in range(0, len(exits), 2)}
+            room = self.rooms[key] = Room(name, description, [data.enemies[i] for i in enemies],
+                                          [data.weapons[i] for i in loot], Exits(self, targets), key=key)
+        return room
+
+
+def load_world(path):
+    """
+    Мир одной игры из файла (скомпилированного или исходного JSON).
+    """
+    return World(WorldData(path))
+
+
+# Замеры
+def grid_world(size):
+    """
+    Исходный мир-лабиринт size комнат (квадратная сетка) с гоблинами и лутом - для замеров.
+    """
+    side = max(1, int(size ** 0.5))
+    rooms = {}
+    for i in range(size):
+        exits = {}
+        if i - side >= 0:
+            exits['север'] = str(i - side)
+        if i + side < size:
+            exits['юг'] = str(i + side)
+        if i % side and i - 1 >= 0:
+            exits['запад'] = str(i - 1)
+        if (i + 1) % side and i + 1 < size:
+            exits['восток'] = str(i + 1)
+        rooms[str(i)] = {'name': f"Зал {i}", 'description': "Сырой каменный зал.",
+                         'enemies': ['goblin'] * (i % 3), 'loot': ['rusty_sword'] if i % 7 == 0 else [],
+                         'exits': exits}
+    return {'start': '0', 'rooms': rooms,
+            'weapons': {'rusty_sword': {'name': "Ржавый меч", 'damage': 10},
+                        'goblin_axe': {'name': "Гоблинский топор", 'damage': 15}},
+            'enemies': {'goblin': {'name': "Гоблин", 'weapon': 'goblin_axe', 'strength': 3, 'dexterity': 1}}}
+
+
+def _eager_rooms(source):
+    # Все комнаты сразу, со ссылками на объекты в выходах - как create_rooms
+    weapons = {key: Weapon(w['name'], w['damage']) for key, w in source['weapons'].items()}
+    enemies = {key: (e['name'], weapons[e['weapon']], e.get('element', 'neutral'), e.get('potions', 0),
+                     e.get('strength', 5), e.get('dexterity', 5), e.get('focus', 5))
+               for key, e in source['enemies'].items()}
+    rooms = {key: Room(r['name'], r['description'], [enemies[e] for e in r.get('enemies', [])],
+                       [weapons[w] for w in r.get('loot', [])]) for key, r in source['rooms'].items()}
+    for key, r in source['rooms'].items():
+        rooms[key].exits = {direction: rooms[target] for direction, target in r.get('exits', {}).items()}
+    return rooms[source['start']]
+
+
+def _walk(start_room, steps, seed=0):
+    # Случайная прогулка по выходам; возвращает посещённые комнаты (чтобы их не собрал сборщик мусора до замера)
+    rng = random.Random(seed)
+    room = start_room
+    visited = [room]
+    for _ in range(steps):
+        room = room.exits[rng.choice(list(room.exits))]
+        visited.append(room)
+    return visited
+
+
+def world_benchmark(sizes=(10000, 100000), steps=1000, directory=None):
+    """
+    Запуск и память мира разного размера: скомпилированный файл (WorldData через mmap)
+    против загрузки исходного JSON и создания всех комнат сразу.
+    Замер: открыть мир и пройти steps комнат. Возвращает {размер: {способ: {'seconds', 'peak_kb'}}}.
+    """
+    import tempfile
+    directory = directory or tempfile.mkdtemp()
+    results = {}
+    for size in sizes:
+        source = grid_world(size)
+        source_path = os.path.join(directory, f"grid{size}.json")
+        world_path = os.path.join(directory, f"grid{size}.world")
+        with open(source_path, 'w', encoding='utf-8') as f:
+            json.dump(source, f, ensure_ascii=False)
+        compile_file(source_path, world_path)
+        del source
+
+        def eager():
+            with open(source_path, encoding='utf-8') as f:
+                return _walk(_eager_rooms(json.load(f)), steps)
+
+        results[size] = {}
+        for name, run in (('indexed', lambda: _walk(load_world(world_path).start_room(), steps)),
+                          ('eager', eager)):
+            tracemalloc.start()
+            start = time.perf_counter()
+            keep = run()
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            del keep
+            results[size][name] = {'seconds': elapsed, 'peak_kb': peak / 1024}
+    return results
+
+
+if __name__ == "__main__":
+    # python world.py              - замеры для 10 000 и 100 000 комнат
+    # python world.py мир.json     - сыграть в мир из файла
+    if len(sys.argv) > 1:
+        from text_adventure import play_game
+        play_game(load_world(sys.argv[1]).start_room())
+    else:
+        for size, runs in world_benchmark().items():
+            for name, result in runs.items():
+                print(f"{size:>7} комнат, {name:>7}: {result['seconds'] * 1000:8.1f} мс, "
+                      f"пик памяти {result['peak_kb']:9.0f} КБ")